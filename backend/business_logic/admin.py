@@ -1,3 +1,266 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.functional import cached_property
 
-# Register your models here.
+from business_logic.models import (
+    ArchivedOrder,
+    AuthUserRestaurant,
+    Delivery,
+    DeliveryTrackSegment,
+    EndUser,
+    Notification,
+    Order,
+    OrderAnswer,
+    OrderProduct,
+    OutboxEvent,
+    Preparation,
+    PreparationStep,
+    Product,
+    Restaurant,
+    RestaurantShard,
+)
+from business_logic.kitchen import refresh_queue
+from business_logic.order_status import forget
+
+# Below this many (estimated) rows an exact COUNT(*) is cheap enough
+EXACT_COUNT_THRESHOLD = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that asks the planner for the row count instead of running
+    COUNT(*), which has to scan the whole table on Postgres. Unfiltered lists
+    use pg_class.reltuples; filtered ones use the EXPLAIN row estimate. Small
+    results still get an exact count.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        try:
+            estimate = self._estimate(qs)
+        except Exception:
+            estimate = None
+        if estimate is None or estimate < EXACT_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+    def _estimate(self, qs):
+        connection = connections[qs.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cur:
+            if not qs.query.where:
+                cur.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [qs.model._meta.db_table])
+                row = cur.fetchone()
+                return row[0] if row and row[0] >= 0 else None
+            sql, params = qs.query.sql_with_params()
+            cur.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cur.fetchone()[0]
+            return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Defaults for tables that grow to millions of rows. Subclasses filter dates
+    with a created_at list_filter, not date_hierarchy, which runs a SELECT
+    DISTINCT date_trunc(...) over the whole table on every page load.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # skips the second, unfiltered COUNT(*)
+    list_per_page = 50
+    ordering = ("-id",)
+    search_fields = ("=id",)  # exact match only; no LIKE scans over big tables
+
+
+# Restaurants offered in a restaurant filter's sidebar; any other id still works as ?restaurant=<id>
+RESTAURANT_FILTER_CHOICES = 100
+
+
+class RestaurantFilter(admin.SimpleListFilter):
+    """Restaurant filter whose sidebar lists a bounded number of restaurants, not every one."""
+    title = "restaurant"
+    parameter_name = "restaurant"
+
+    def lookups(self, request, model_admin):
+        choices = list(Restaurant.objects.order_by("name").values_list("id", "name")[:RESTAURANT_FILTER_CHOICES])
+        selected = self.restaurant_id()
+        if selected is not None and selected not in {pk for pk, _ in choices}:
+            choices += list(Restaurant.objects.filter(id=selected).values_list("id", "name"))
+        return choices
+
+    def restaurant_id(self):
+        value = self.value()
+        return int(value) if value and value.isdigit() else None
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        return queryset.filter(restaurant_id=self.restaurant_id())
+
+
+class OrderRestaurantFilter(RestaurantFilter):
+    """Restaurant filter for Order, which only reaches its restaurant through its products."""
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        # EXISTS rather than a join so the changelist needs no DISTINCT
+        return queryset.filter(Exists(
+            OrderProduct.objects.filter(order=OuterRef("pk"), product__restaurant_id=self.restaurant_id())
+        ))
+
+
+@admin.register(Restaurant)
+class RestaurantAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "address", "kitchen_stations", "latitude", "longitude", "delivery_radius_m", "created_at")
+    search_fields = ("name", "address")
+
+
+@admin.register(AuthUserRestaurant)
+class AuthUserRestaurantAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "restaurant", "created_at")
+    list_select_related = ("user", "restaurant")
+    list_filter = (RestaurantFilter,)
+    autocomplete_fields = ("user", "restaurant")
+    search_fields = ("user__username", "restaurant__name")
+
+
+@admin.register(Product)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ("id", "name", "restaurant", "price_NOK", "preparation_minutes", "created_at")
+    list_select_related = ("restaurant",)
+    list_filter = (RestaurantFilter,)
+    autocomplete_fields = ("restaurant",)
+    search_fields = ("=id", "name")  # ILIKE on name is served by the trigram index
+
+
+@admin.register(EndUser)
+class EndUserAdmin(LargeTableAdmin):
+    list_display = ("id", "created_at")
+
+
+class OrderProductInline(admin.TabularInline):
+    model = OrderProduct
+    extra = 0
+    raw_id_fields = ("product",)
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = ("id", "end_user_id", "created_at", "is_cancelled")
+    list_filter = (OrderRestaurantFilter, "is_cancelled", "created_at")
+    raw_id_fields = ("end_user",)
+    inlines = [OrderProductInline]
+    actions = ["cancel_orders"]
+
+    @admin.action(description="Cancel selected orders")
+    def cancel_orders(self, request, queryset):
+        with transaction.atomic(using=queryset.db):
+            ids = list(queryset.filter(is_cancelled=False).select_for_update().values_list("id", flat=True))
+            n = Order.objects.using(queryset.db).filter(id__in=ids).update(is_cancelled=True)
+            forget(ids, queryset.db)  # update() sends no signals
+            # Same event as POST /api/order_cancelled/ (the worker notifies the restaurant), one INSERT for the page
+            OutboxEvent.objects.using(queryset.db).bulk_create(
+                [OutboxEvent(topic=OutboxEvent.Topic.ORDER_CANCELLED, payload={"order_id": order_id}) for order_id in ids]
+            )
+            restaurant_ids = (
+                OrderProduct.objects.using(queryset.db).filter(order_id__in=ids)
+                .values_list("product__restaurant_id", flat=True).distinct()
+            )
+            for restaurant_id in restaurant_ids:
+                refresh_queue(restaurant_id, queryset.db)
+        self.message_user(request, f"Cancelled {n} orders.", messages.SUCCESS)
+
+
+@admin.register(OrderProduct)
+class OrderProductAdmin(LargeTableAdmin):
+    list_display = ("id", "order_id", "product", "quantity", "unit_price_NOK", "created_at")
+    list_select_related = ("product",)
+    raw_id_fields = ("order", "product")
+
+
+@admin.register(OrderAnswer)
+class OrderAnswerAdmin(LargeTableAdmin):
+    list_display = ("id", "order_id", "status", "projected_preparation_time_minutes", "created_at")
+    list_filter = ("status", "created_at")
+    raw_id_fields = ("order",)
+
+
+@admin.register(Preparation)
+class PreparationAdmin(LargeTableAdmin):
+    list_display = ("id", "order_answer_id")
+    raw_id_fields = ("order_answer",)
+
+
+@admin.register(PreparationStep)
+class PreparationStepAdmin(LargeTableAdmin):
+    list_display = ("id", "preparation_id", "status", "delaytime_minutes", "created_at")
+    list_filter = ("status", "created_at")
+    raw_id_fields = ("preparation",)
+
+
+@admin.register(Delivery)
+class DeliveryAdmin(LargeTableAdmin):
+    list_display = ("id", "order_id", "estimated_pickup_time", "estimated_delivery_time", "created_at")
+    list_filter = ("created_at",)
+    raw_id_fields = ("order",)
+
+
+@admin.register(DeliveryTrackSegment)
+class DeliveryTrackSegmentAdmin(LargeTableAdmin):
+    list_display = ("id", "delivery_id", "started_at", "ended_at", "point_count")
+    raw_id_fields = ("delivery",)
+    exclude = ("points",)  # packed binary; decode with business_logic.telemetry.unpack_points
+
+
+@admin.register(Notification)
+class NotificationAdmin(LargeTableAdmin):
+    list_display = ("id", "restaurant", "message", "read", "created_at")
+    list_select_related = ("restaurant",)
+    list_filter = (RestaurantFilter, "read", "created_at")
+    autocomplete_fields = ("restaurant",)
+    actions = ["mark_read", "mark_unread"]
+
+    @admin.action(description="Mark selected notifications as read")
+    def mark_read(self, request, queryset):
+        n = queryset.filter(read=False).update(read=True)
+        self.message_user(request, f"Marked {n} notifications as read.", messages.SUCCESS)
+
+    @admin.action(description="Mark selected notifications as unread")
+    def mark_unread(self, request, queryset):
+        n = queryset.filter(read=True).update(read=False)
+        self.message_user(request, f"Marked {n} notifications as unread.", messages.SUCCESS)
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    list_display = ("order_id", "restaurant", "state", "created_at", "archived_at")
+    list_select_related = ("restaurant",)
+    list_filter = (RestaurantFilter, "state", "created_at")
+    search_fields = ("=order_id",)
+    readonly_fields = ("order_id", "end_user_id", "restaurant", "state", "created_at", "archived_at", "payload")
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(LargeTableAdmin):
+    list_display = ("id", "topic", "created_at", "processed_at", "attempts", "last_error")
+    list_filter = ("topic", ("processed_at", admin.EmptyFieldListFilter))
+    readonly_fields = ("topic", "payload", "created_at")
+    actions = ["retry"]
+
+    @admin.action(description="Retry selected events")
+    def retry(self, request, queryset):
+        n = queryset.update(processed_at=None, available_at=timezone.now(), attempts=0, last_error="")
+        self.message_user(request, f"Queued {n} events for another attempt.", messages.SUCCESS)
+
+
+@admin.register(RestaurantShard)
+class RestaurantShardAdmin(admin.ModelAdmin):
+    list_display = ("restaurant", "alias", "is_moving", "updated_at")
+    list_select_related = ("restaurant",)
+    # Changing the alias by hand would strand the data; use `manage.py move_restaurant`
+    readonly_fields = ("restaurant", "alias", "is_moving", "updated_at")
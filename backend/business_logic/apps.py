@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class BusinessLogicConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'business_logic'
+
+    def ready(self):
+        from business_logic import catalog_cache  # noqa: F401  (connects the product signals)
+        from business_logic import geo  # noqa: F401  (connects the restaurant signals)
+        from business_logic import order_status  # noqa: F401  (connects the order signals)
@@ -0,0 +1,222 @@
+"""
+Cold-storage archival of finished orders.
+
+Orders that reached a terminal state (delivered, rejected or cancelled) and are
+older than ORDER_ARCHIVE_AFTER_DAYS are copied into a single compact
+ArchivedOrder row and removed from the hot tables. Every batch runs in its own
+transaction (insert archive rows + delete hot rows), so the job can be stopped
+at any point and simply re-run to continue where it left off.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Prefetch
+from django.utils import timezone
+
+from business_logic.models import (
+    ArchivedOrder,
+    Delivery,
+    EndUser,
+    Order,
+    OrderAnswer,
+    OrderProduct,
+)
+from business_logic.order_status import forget
+from business_logic.sharding import current_shard
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_orders(cutoff):
+    """Orders created before `cutoff` that can no longer change."""
+    now = timezone.now()
+    return (
+        Order.objects
+        .filter(created_at__lt=cutoff)
+        .filter(
+            Q(is_cancelled=True)
+            | Q(order_answers__status=OrderAnswer.OrderAnswerStatus.REJECTED)
+            | Q(delivery__estimated_delivery_time__lte=now)
+        )
+        .distinct()
+    )
+
+
+def _delivery(order):
+    try:
+        return order.delivery
+    except Delivery.DoesNotExist:
+        return None
+
+
+def _is_finished(order, now):
+    if order.is_cancelled:
+        return True
+    if any(a.status == OrderAnswer.OrderAnswerStatus.REJECTED for a in order.order_answers.all()):
+        return True
+    d = _delivery(order)
+    return d is not None and d.estimated_delivery_time <= now
+
+
+def _terminal_state(order):
+    if order.is_cancelled:
+        return ArchivedOrder.TerminalState.CANCELLED
+    if any(a.status == OrderAnswer.OrderAnswerStatus.REJECTED for a in order.order_answers.all()):
+        return ArchivedOrder.TerminalState.REJECTED
+    return ArchivedOrder.TerminalState.DELIVERED
+
+
+def order_payload(order):
+    d = _delivery(order)
+    return {
+        "items": [
+            {
+                "product_id": op.product_id,
+                "product_name": op.product.name,
+                "quantity": op.quantity,
+                "unit_price_NOK": op.unit_price_NOK,
+            }
+            for op in order.order_products.all()
+        ],
+        "answers": [
+            {
+                "status": a.status,
+                "created_at": a.created_at.isoformat(),
+                "projected_preparation_time_minutes": a.projected_preparation_time_minutes,
+                "steps": [
+                    {
+                        "status": s.status,
+                        "delaytime_minutes": s.delaytime_minutes,
+                        "created_at": s.created_at.isoformat(),
+                    }
+                    for p in a.preparations.all()
+                    for s in p.steps.all()
+                ],
+            }
+            for a in order.order_answers.all()
+        ],
+        "delivery": {
+            "estimated_pickup_time": d.estimated_pickup_time.isoformat(),
+            "estimated_delivery_time": d.estimated_delivery_time.isoformat(),
+        } if d is not None else None,
+    }
+
+
+def _to_archive(order):
+    ops = list(order.order_products.all())
+    return ArchivedOrder(
+        order_id=order.id,
+        end_user_id=order.end_user_id,
+        restaurant_id=ops[0].product.restaurant_id if ops else None,
+        state=_terminal_state(order),
+        created_at=order.created_at,
+        payload=order_payload(order),
+    )
+
+
+def archive_batch(cutoff, batch_size=None):
+    """
+    Archive up to `batch_size` finished orders older than `cutoff`.
+    Returns the number of orders moved to cold storage (0 when done).
+    """
+    if batch_size is None:
+        batch_size = settings.ORDER_ARCHIVE_BATCH_SIZE
+
+    ids = list(archivable_orders(cutoff).order_by("id").values_list("id", flat=True)[:batch_size])
+    if not ids:
+        return 0
+
+    with transaction.atomic(using=current_shard()):
+        # Rows locked by a concurrent writer (or another archiver) are left for a later batch
+        orders = list(
+            Order.objects
+            .filter(id__in=ids)
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("delivery")
+            .prefetch_related(
+                Prefetch("order_products", queryset=OrderProduct.objects.select_related("product")),
+                "order_answers__preparations__steps",
+            )
+        )
+        if not orders:
+            return 0
+
+        # ignore_conflicts makes a re-run after a partial failure harmless
+        ArchivedOrder.objects.bulk_create([_to_archive(o) for o in orders], ignore_conflicts=True)
+
+        order_ids = [o.id for o in orders]
+        end_user_ids = {o.end_user_id for o in orders}
+        Order.objects.filter(id__in=order_ids).delete()
+        # Every order gets its own EndUser; drop the ones that no longer own anything
+        EndUser.objects.filter(id__in=end_user_ids, orders__isnull=True).delete()
+        forget(order_ids, current_shard())
+
+    return len(orders)
+
+
+def archived_order_to_dict(a):
+    """Serialize an ArchivedOrder in the same shape as the live orders API."""
+    data = {
+        "id": a.order_id,
+        "created_at": a.created_at.isoformat(),
+        "items": a.payload.get("items", []),
+        "state": a.state,
+        "archived": True,
+    }
+    if a.payload.get("delivery"):
+        data["delivery"] = a.payload["delivery"]
+    accepted = [x for x in a.payload.get("answers", []) if x["status"] == OrderAnswer.OrderAnswerStatus.ACCEPTED]
+    if accepted:
+        ans = max(accepted, key=lambda x: x["created_at"])
+        data["accepted_at"] = ans["created_at"]
+        data["projected_preparation_time_minutes"] = ans["projected_preparation_time_minutes"]
+        data["total_delay_minutes"] = sum(s["delaytime_minutes"] for s in ans["steps"])
+    return data
+
+
+def order_history(restaurant, before=None, before_id=None, limit=50):
+    """
+    Newest-first order history for a restaurant, spanning both the hot tables
+    and cold storage. Orders are sorted by (created_at, id); the keyset cursor
+    (`before`, `before_id`) is that of the last order of the previous page, so
+    orders sharing a timestamp are neither skipped nor repeated. Without
+    `before_id` every order created at `before` is skipped.
+    """
+    hot = (
+        Order.objects
+        .filter(order_products__product__restaurant=restaurant)
+        .distinct()
+        .select_related("delivery")
+        .prefetch_related(
+            Prefetch("order_products", queryset=OrderProduct.objects.select_related("product")),
+            "order_answers__preparations__steps",
+        )
+        .order_by("-created_at", "-id")
+    )
+    cold = ArchivedOrder.objects.filter(restaurant=restaurant).order_by("-created_at", "-order_id")
+    if before is not None:
+        if before_id is None:
+            hot = hot.filter(created_at__lt=before)
+            cold = cold.filter(created_at__lt=before)
+        else:
+            hot = hot.filter(Q(created_at__lt=before) | Q(created_at=before, id__lt=before_id))
+            cold = cold.filter(Q(created_at__lt=before) | Q(created_at=before, order_id__lt=before_id))
+
+    now = timezone.now()
+    rows = []
+    for o in hot[:limit]:
+        data = archived_order_to_dict(_to_archive(o))
+        data["archived"] = False
+        if not _is_finished(o, now):
+            data["state"] = None  # still open
+        rows.append(((o.created_at, o.id), data))
+    for a in cold[:limit]:
+        rows.append(((a.created_at, a.order_id), archived_order_to_dict(a)))
+
+    rows.sort(key=lambda r: r[0], reverse=True)
+    return [data for _, data in rows[:limit]]
@@ -0,0 +1,336 @@
+"""
+COPY-based bulk loading for seeding, backfills and data migrations (Postgres).
+
+Rows never go through model instances. BulkLoader buffers each table's rows
+in COPY text format, in a spooled temp file, and streams every buffer with
+`COPY ... FROM STDIN` in foreign-key order on flush(). Primary keys are taken
+up front from the tables' own id sequences (allocate_ids), so children can
+point at parents before any parent row exists. The ids come out of the
+current database's shard block (see sharding.init_sequences), so loaded rows
+can move between shards like any other.
+
+without_indexes() drops a table's secondary indexes for the duration of a load
+and recreates them from their saved definitions. Indexes that back primary key
+or unique constraints stay in place. DDL is transactional in Postgres, so run
+it inside the same transaction as the load: a failed load rolls the drop back
+as well.
+
+load_order_records() loads export_orders records (NDJSON lines) as complete
+order graphs: end user, order, lines, first answer, preparation steps,
+delivery, and a notification for cancelled orders. It is what the
+bulk_load_orders command runs. Loader code only touches `model._meta`, so
+data migrations can call it with historical models from `apps.get_model()`.
+"""
+import json
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from business_logic.models import (
+    Delivery,
+    EndUser,
+    Notification,
+    Order,
+    OrderAnswer,
+    OrderProduct,
+    Preparation,
+    PreparationStep,
+    Product,
+)
+
+LOAD_CHUNK_ORDERS = 20000
+SPOOL_BYTES = 64 * 1024 * 1024
+
+# Parents before children
+ORDER_GRAPH = [EndUser, Order, OrderProduct, OrderAnswer, Preparation, PreparationStep, Delivery, Notification]
+
+_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def copy_value(value):
+    """One value in COPY text format."""
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\\\x" + bytes(value).hex()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, separators=(",", ":"))
+    return str(value).translate(_ESCAPES)
+
+
+def copy_line(values):
+    return "\t".join(map(copy_value, values)) + "\n"
+
+
+def allocate_ids(model, n, using):
+    """Reserve `n` primary keys from the table's id sequence (not necessarily contiguous)."""
+    if n <= 0:
+        return []
+    with connections[using].cursor() as cur:
+        cur.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+            [model._meta.db_table, model._meta.pk.column, n],
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+class _Table:
+    def __init__(self, model, fields, using):
+        by_name = {f.name: f for f in model._meta.concrete_fields}
+        by_name.update({f.attname: f for f in model._meta.concrete_fields})
+        quote = connections[using].ops.quote_name
+        self.model = model
+        self.columns = ", ".join(quote(by_name[name].column) for name in fields)
+        self.buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES, mode="w+", encoding="utf-8")
+        self.rows = 0
+
+    def add(self, values):
+        self.buffer.write(copy_line(values))
+        self.rows += 1
+
+
+class BulkLoader:
+    """
+    Buffer rows per table and COPY them in registration order on flush():
+
+        loader = BulkLoader("default")
+        loader.table(Order, ["id", "end_user_id", "created_at", "is_cancelled"])
+        loader.add(Order, (order_id, end_user_id, created_at, False))
+        loader.flush()
+
+    Every NOT NULL column must be listed: COPY does not apply Django field
+    defaults (auto_now_add included). flush() does not open a transaction of
+    its own.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.tables = {}
+        self.loaded = Counter()
+
+    def table(self, model, fields):
+        self.tables[model] = _Table(model, fields, self.using)
+
+    def add(self, model, values):
+        self.tables[model].add(values)
+
+    def flush(self):
+        with connections[self.using].cursor() as cur:
+            for model, t in self.tables.items():
+                if not t.rows:
+                    continue
+                t.buffer.seek(0)
+                cur.copy_expert(f'COPY "{model._meta.db_table}" ({t.columns}) FROM STDIN', t.buffer)
+                self.loaded[model._meta.label] += t.rows
+                t.buffer.seek(0)
+                t.buffer.truncate()
+                t.rows = 0
+
+    def close(self):
+        for t in self.tables.values():
+            t.buffer.close()
+
+
+def secondary_indexes(model, using):
+    """(name, definition) of a table's indexes that do not back a constraint."""
+    with connections[using].cursor() as cur:
+        cur.execute(
+            """
+            SELECT i.relname, pg_get_indexdef(x.indexrelid)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = %s::regclass
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+            ORDER BY i.relname
+            """,
+            [model._meta.db_table],
+        )
+        return cur.fetchall()
+
+
+@contextmanager
+def without_indexes(models, using, log=None):
+    """
+    Drop the models' secondary indexes, then rebuild them (and ANALYZE) after
+    the block. Must run inside transaction.atomic(using=using): if the block
+    raises, the rollback restores the dropped indexes.
+    """
+    assert connections[using].in_atomic_block, "without_indexes() needs an open transaction"
+    dropped = []
+    with connections[using].cursor() as cur:
+        for model in models:
+            for name, definition in secondary_indexes(model, using):
+                cur.execute(f'DROP INDEX "{name}"')
+                dropped.append((name, definition))
+    if log:
+        log(f"Dropped {len(dropped)} indexes")
+    yield dropped
+    with connections[using].cursor() as cur:
+        for name, definition in dropped:
+            cur.execute(definition)
+        for model in models:
+            cur.execute(f'ANALYZE "{model._meta.db_table}"')
+    if log:
+        log(f"Rebuilt {len(dropped)} indexes")
+
+
+# --- Order graphs ---------------------------------------------------------------
+
+def _order_loader(using):
+    # Registered in ORDER_GRAPH order
+    loader = BulkLoader(using)
+    loader.table(EndUser, ["id", "created_at"])
+    loader.table(Order, ["id", "end_user_id", "created_at", "is_cancelled"])
+    loader.table(OrderProduct, ["id", "order_id", "product_id", "quantity", "unit_price_NOK", "created_at"])
+    loader.table(OrderAnswer, ["id", "order_id", "status", "created_at", "projected_preparation_time_minutes"])
+    loader.table(Preparation, ["id", "order_answer_id"])
+    loader.table(PreparationStep, ["id", "preparation_id", "status", "delaytime_minutes", "created_at"])
+    loader.table(Delivery, ["id", "order_id", "estimated_pickup_time", "estimated_delivery_time", "created_at"])
+    loader.table(Notification, ["id", "restaurant_id", "created_at", "read", "message"])
+    return loader
+
+
+def _merged_items(record, product_ids):
+    # One line per product (uniq_order_product_once); lines for unknown products are dropped
+    items = {}
+    for item in record["items"]:
+        pid = product_ids.get(item["product_id"])
+        if pid is None:
+            continue
+        if pid in items:
+            items[pid]["quantity"] += item["quantity"]
+        else:
+            items[pid] = {**item, "product_id": pid}
+    return list(items.values())
+
+
+def _load_chunk(loader, records, product_ids, shift):
+    """Allocate ids for one chunk of records and buffer their rows."""
+    orders = []
+    for r in records:
+        items = _merged_items(r, product_ids)
+        if items:
+            orders.append((r, items, r["answers"][:1]))  # one answer per order (uniq_answer_per_order)
+
+    need = Counter()
+    for r, items, answers in orders:
+        need[OrderProduct] += len(items)
+        need[OrderAnswer] += len(answers)
+        steps = sum(len(a["steps"]) for a in answers)
+        need[Preparation] += 1 if steps else 0
+        need[PreparationStep] += steps
+        need[Delivery] += 1 if r.get("delivery") else 0
+        need[Notification] += 1 if r["is_cancelled"] else 0
+    ids = {model: iter(allocate_ids(model, need[model], loader.using)) for model in need}
+    end_user_ids = iter(allocate_ids(EndUser, len(orders), loader.using))
+    order_ids = iter(allocate_ids(Order, len(orders), loader.using))
+
+    def at(value):
+        return parse_datetime(value) + shift
+
+    for r, items, answers in orders:
+        created_at = at(r["created_at"])
+        end_user_id, order_id = next(end_user_ids), next(order_ids)
+        loader.add(EndUser, (end_user_id, created_at))
+        loader.add(Order, (order_id, end_user_id, created_at, r["is_cancelled"]))
+        for item in items:
+            loader.add(OrderProduct, (
+                next(ids[OrderProduct]), order_id, item["product_id"], item["quantity"], item["unit_price_NOK"], created_at,
+            ))
+        for a in answers:
+            answer_id = next(ids[OrderAnswer])
+            loader.add(OrderAnswer, (answer_id, order_id, a["status"], at(a["created_at"]), a["projected_preparation_time_minutes"]))
+            if a["steps"]:
+                preparation_id = next(ids[Preparation])
+                loader.add(Preparation, (preparation_id, answer_id))
+                for s in a["steps"]:
+                    loader.add(PreparationStep, (
+                        next(ids[PreparationStep]), preparation_id, s["status"], s["delaytime_minutes"], at(s["created_at"]),
+                    ))
+        if r.get("delivery"):
+            d = r["delivery"]
+            loader.add(Delivery, (
+                next(ids[Delivery]), order_id, at(d["estimated_pickup_time"]), at(d["estimated_delivery_time"]), created_at,
+            ))
+        if r["is_cancelled"]:
+            items_str = ", ".join(f"{i['quantity']}× {i['product_name']}" for i in items)
+            loader.add(Notification, (
+                next(ids[Notification]), r["restaurant_id"], created_at, True, f"Order #{order_id} canceled for {items_str}",
+            ))
+    return len(records) - len(orders)
+
+
+def _product_ids(records, using, restaurant_id):
+    """
+    Map the records' product ids to products in the target database: the same
+    id, or with `restaurant_id` the product of that name in that restaurant
+    (created on first use with the record's price).
+    """
+    if restaurant_id is None:
+        wanted = {i["product_id"] for r in records for i in r["items"]}
+        found = Product.objects.using(using).filter(id__in=wanted).values_list("id", flat=True)
+        return {pid: pid for pid in found}
+
+    names = {i["product_name"]: i for r in records for i in r["items"]}
+    existing = dict(
+        Product.objects.using(using)
+        .filter(restaurant_id=restaurant_id, name__in=names)
+        .values_list("name", "id")
+    )
+    missing = [
+        Product(restaurant_id=restaurant_id, name=name, price_NOK=i["unit_price_NOK"])
+        for name, i in names.items() if name not in existing
+    ]
+    for p in Product.objects.using(using).bulk_create(missing):
+        existing[p.name] = p.id
+    return {i["product_id"]: existing[i["product_name"]] for r in records for i in r["items"]}
+
+
+def load_order_records(records, using, restaurant_id=None, shift=timedelta(0), chunk_size=LOAD_CHUNK_ORDERS, log=None):
+    """
+    COPY export_orders records into `using` as new orders with fresh ids. Each
+    chunk commits on its own; wrap the call in transaction.atomic(using=...)
+    to make the whole load one transaction. With `restaurant_id`, every
+    order goes to that restaurant, matched by product name; otherwise orders
+    whose products do not exist in `using` are skipped. Timestamps are moved
+    by `shift`. Returns (rows loaded per model, orders skipped).
+    """
+    loader = _order_loader(using)
+    skipped = 0
+    try:
+        chunk = []
+        for record in records:
+            if restaurant_id is not None:
+                record["restaurant_id"] = restaurant_id
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                skipped += _flush_chunk(loader, chunk, restaurant_id, shift)
+                chunk = []
+                if log:
+                    log(f"  {loader.loaded[Order._meta.label]} orders")
+        if chunk:
+            skipped += _flush_chunk(loader, chunk, restaurant_id, shift)
+    finally:
+        loader.close()
+    return dict(loader.loaded), skipped
+
+
+def _flush_chunk(loader, chunk, restaurant_id, shift):
+    with transaction.atomic(using=loader.using):
+        with connections[loader.using].cursor() as cur:
+            cur.execute("SET LOCAL synchronous_commit = off")  # a lost tail after a crash is just reloaded
+        skipped = _load_chunk(loader, chunk, _product_ids(chunk, loader.using, restaurant_id), shift)
+        loader.flush()
+    return skipped
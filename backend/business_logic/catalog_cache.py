@@ -0,0 +1,184 @@
+"""
+In-process product catalog cache for order ingestion.
+
+order_created needs each product's name, price and restaurant. Menus change
+rarely (product_create, import, admin), so every worker keeps a size-bounded
+LRU of ProductInfo tuples keyed by product id.
+
+Invalidation is version-stamped per restaurant. The shared Django cache holds
+one "catalog:v:<restaurant_id>" value per restaurant, which is replaced on
+every product write (after commit). A cached entry is only used while its
+stamp still matches, so a lookup costs one shared-cache round trip for the
+versions of the restaurants involved and no database query. The cache must be
+shared between workers for that to hold, so the catalog cache is off unless
+REDIS_URL is set (CATALOG_CACHE_ENABLED).
+"""
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from business_logic.models import OrderProduct, Product
+from business_logic.sharding import shard_aliases, use_shard
+
+logger = logging.getLogger(__name__)
+
+ProductInfo = namedtuple("ProductInfo", ["id", "restaurant_id", "name", "price_NOK"])
+
+VERSION_KEY = "catalog:v:{}"
+
+
+def _version_key(restaurant_id):
+    return VERSION_KEY.format(restaurant_id)
+
+
+def bump_version(restaurant_id):
+    cache.set(_version_key(restaurant_id), time.time_ns(), timeout=None)
+
+
+def bump_version_on_commit(restaurant_id, using):
+    # After commit, so no worker can stamp the old rows with the new version
+    transaction.on_commit(lambda: bump_version(restaurant_id), using=using)
+
+
+def _versions(restaurant_ids):
+    keys = {_version_key(rid): rid for rid in restaurant_ids}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    for key, version in missing.items():
+        # Another worker may have set it in the meantime; theirs wins
+        if not cache.add(key, version, timeout=None):
+            found[key] = cache.get(key)
+        else:
+            found[key] = version
+    return {rid: found[key] for key, rid in keys.items()}
+
+
+def _entry_size(info):
+    return sys.getsizeof(info) + sys.getsizeof(info.name) + 3 * 32  # ints and the version stamp
+
+
+class CatalogCache:
+    """LRU of product id -> (ProductInfo, restaurant version); safe to share between threads."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.stale = self.evictions = 0
+
+    def _put(self, info, version):
+        old = self._entries.pop(info.id, None)
+        if old is not None:
+            self.bytes -= _entry_size(old[0])
+        self._entries[info.id] = (info, version)
+        self.bytes += _entry_size(info)
+        while len(self._entries) > self.max_entries:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self.bytes -= _entry_size(evicted)
+            self.evictions += 1
+
+    def get_many(self, product_ids):
+        """Return {product_id: ProductInfo} for the ids that exist (on the current shard)."""
+        product_ids = set(product_ids)
+        with self._lock:
+            cached = {pid: self._entries[pid] for pid in product_ids if pid in self._entries}
+        versions = _versions({info.restaurant_id for info, _ in cached.values()})
+
+        result = {}
+        with self._lock:
+            for pid, (info, version) in cached.items():
+                if versions[info.restaurant_id] == version:
+                    result[pid] = info
+                    self._entries.move_to_end(pid)
+                else:
+                    self.stale += 1
+            self.hits += len(result)
+            self.misses += len(product_ids) - len(result)
+
+        missing = product_ids - result.keys()
+        if missing:
+            result.update(self._load(Product.objects.filter(id__in=missing)))
+        return result
+
+    def _load(self, queryset):
+        # Versions are read before the rows: a write committed in between bumps
+        # the version, so these entries come out stale rather than wrong.
+        versions = _versions(set(queryset.order_by().values_list("restaurant_id", flat=True).distinct()))
+        rows = [ProductInfo(*row) for row in queryset.values_list("id", "restaurant_id", "name", "price_NOK")]
+        with self._lock:
+            for info in rows:
+                if info.restaurant_id in versions:
+                    self._put(info, versions[info.restaurant_id])
+        return {info.id: info for info in rows}
+
+    def warm_up(self, queryset):
+        ids = list(queryset.values_list("id", flat=True)[:self.max_entries])
+        return len(self._load(Product.objects.filter(id__in=ids)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "approx_bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+        }
+
+
+catalog = CatalogCache(settings.CATALOG_CACHE_MAX_ENTRIES)
+
+
+def get_products(product_ids):
+    """{product_id: ProductInfo} for the ids that exist, through the catalog cache when enabled."""
+    if settings.CATALOG_CACHE_ENABLED:
+        return catalog.get_many(product_ids)
+    rows = Product.objects.filter(id__in=set(product_ids)).values_list("id", "restaurant_id", "name", "price_NOK")
+    return {row[0]: ProductInfo(*row) for row in rows}
+
+
+def active_menus(days):
+    """Products of restaurants that received orders in the last `days` days."""
+    since = timezone.now() - timedelta(days=days)
+    recent = OrderProduct.objects.filter(order__created_at__gte=since).values("product__restaurant_id")
+    return Product.objects.filter(restaurant_id__in=recent).order_by("restaurant_id", "id")
+
+
+def warm_up():
+    """Preload active restaurants' menus on every shard; called when a worker boots."""
+    if not settings.CATALOG_CACHE_ENABLED:
+        return 0
+    t0 = time.perf_counter()
+    loaded = 0
+    for alias in shard_aliases():
+        with use_shard(alias):
+            loaded += catalog.warm_up(active_menus(settings.CATALOG_WARMUP_DAYS))
+    stats = catalog.stats()
+    logger.info(
+        "Catalog cache warmed: %d products in %.0fms, ~%d KiB",
+        loaded, (time.perf_counter() - t0) * 1000, stats["approx_bytes"] // 1024,
+    )
+    return loaded
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def _product_changed(sender, instance, using, **kwargs):
+    bump_version_on_commit(instance.restaurant_id, using)
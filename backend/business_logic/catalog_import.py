@@ -0,0 +1,115 @@
+"""
+Bulk menu import: validate every row up front, then upsert by (restaurant, name)
+in a handful of INSERT ... ON CONFLICT DO UPDATE statements.
+"""
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from business_logic.catalog_cache import bump_version_on_commit
+from business_logic.models import Product
+from business_logic.sharding import current_shard
+
+IMPORT_BATCH_SIZE = 2000
+NAME_MAX_LENGTH = Product._meta.get_field("name").max_length
+DESCRIPTION_MAX_LENGTH = Product._meta.get_field("description").max_length
+
+
+def parse_rows(data, fmt):
+    """
+    Turn an uploaded menu into a list of dicts.
+    JSON: a list of objects, or {"products": [...]}. CSV: header row with
+    name, price_NOK and optionally description.
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    if fmt == "csv":
+        return list(csv.DictReader(io.StringIO(data)))
+    try:
+        body = json.loads(data)
+    except ValueError:
+        raise ValueError("Invalid JSON")
+    if isinstance(body, dict):
+        body = body.get("products")
+    if not isinstance(body, list):
+        raise ValueError("Expected a list of products")
+    return body
+
+
+def _validate_row(row):
+    if not isinstance(row, dict):
+        return None, "row must be an object"
+    name = row.get("name")
+    if not isinstance(name, str) or not name.strip():
+        return None, "name is required"
+    name = name.strip()
+    if len(name) > NAME_MAX_LENGTH:
+        return None, f"name is longer than {NAME_MAX_LENGTH} characters"
+
+    price = row.get("price_NOK")
+    if isinstance(price, str):
+        # CSV cells are always strings
+        try:
+            price = int(price.strip())
+        except ValueError:
+            return None, "price_NOK must be an integer"
+    if not isinstance(price, int) or isinstance(price, bool):
+        return None, "price_NOK must be an integer"
+    if price < 0:
+        return None, "price_NOK must be >= 0"
+
+    description = row.get("description") or ""
+    if not isinstance(description, str):
+        return None, "description must be a string"
+    if len(description) > DESCRIPTION_MAX_LENGTH:
+        return None, f"description is longer than {DESCRIPTION_MAX_LENGTH} characters"
+
+    return {"name": name, "price_NOK": price, "description": description}, None
+
+
+def validate_rows(rows):
+    """Returns (clean_rows, errors). Row numbers in errors are 1-based."""
+    clean = []
+    errors = []
+    first_seen = {}
+    for i, row in enumerate(rows, start=1):
+        data, err = _validate_row(row)
+        if err is None and data["name"] in first_seen:
+            # Postgres refuses to update the same row twice in one ON CONFLICT statement
+            err = f"duplicate name (also on row {first_seen[data['name']]})"
+        if err is not None:
+            errors.append({"row": i, "error": err})
+            continue
+        first_seen[data["name"]] = i
+        clean.append(data)
+    return clean, errors
+
+
+def import_products(restaurant, rows):
+    """
+    Validate and upsert `rows` for `restaurant`. Nothing is written if any row is invalid.
+    Returns {"created": n, "updated": n, "errors": [...]}.
+    """
+    clean, errors = validate_rows(rows)
+    if errors:
+        return {"created": 0, "updated": 0, "errors": errors}
+
+    existing = set(Product.objects.filter(restaurant=restaurant).values_list("name", flat=True))
+    objs = [
+        Product(restaurant=restaurant, name=r["name"], description=r["description"], price_NOK=r["price_NOK"])
+        for r in clean
+    ]
+    with transaction.atomic(using=current_shard()):
+        Product.objects.bulk_create(
+            objs,
+            batch_size=IMPORT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["restaurant", "name"],
+            update_fields=["description", "price_NOK"],
+        )
+        # bulk_create sends no post_save signals
+        bump_version_on_commit(restaurant.id, current_shard())
+    updated = sum(1 for r in clean if r["name"] in existing)
+    return {"created": len(clean) - updated, "updated": updated, "errors": []}
@@ -0,0 +1,217 @@
+"""
+Constant-memory order export (NDJSON or CSV, optionally gzipped).
+
+Orders are read with QuerySet.iterator(chunk_size=...), which uses a
+server-side cursor on Postgres, and prefetching happens per chunk, so memory
+stays flat no matter how many orders are exported. Archived and live orders
+are read as two streams sorted by (created_at, id) and merged, so the export
+is in creation order even where the two overlap (an old order that was never
+archived, or a new one archived early because it was cancelled).
+"""
+import csv
+import gzip
+import heapq
+import json
+import zlib
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.db.models import Exists, OuterRef, Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from business_logic.archive import order_payload
+from business_logic.models import ArchivedOrder, Order, OrderAnswer, OrderProduct
+
+EXPORT_CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+
+CSV_HEADER = [
+    "order_id",
+    "order_created_at",
+    "restaurant_id",
+    "end_user_id",
+    "state",
+    "is_cancelled",
+    "archived",
+    "product_id",
+    "product_name",
+    "quantity",
+    "unit_price_NOK",
+    "line_total_NOK",
+    "accepted_at",
+    "projected_preparation_time_minutes",
+    "total_delay_minutes",
+    "estimated_pickup_time",
+    "estimated_delivery_time",
+]
+
+
+def parse_bound(value):
+    """Parse an ISO date or datetime for since/until; naive values are taken as UTC."""
+    dt = parse_datetime(value)
+    if dt is None:
+        d = parse_date(value)
+        if d is None:
+            raise ValueError(f"Invalid date: {value}")
+        dt = datetime.combine(d, time.min)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt, dt_timezone.utc)
+    return dt
+
+
+def _date_filters(qs, since, until):
+    if since is not None:
+        qs = qs.filter(created_at__gte=since)
+    if until is not None:
+        qs = qs.filter(created_at__lt=until)
+    return qs
+
+
+def iter_order_records(restaurant_id=None, since=None, until=None, include_archived=True, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one dict per order, oldest first: header fields plus items, answers (with steps) and delivery."""
+    streams = [_live_records(restaurant_id, since, until, chunk_size)]
+    if include_archived:
+        streams.insert(0, _archived_records(restaurant_id, since, until, chunk_size))
+    for _, record in heapq.merge(*streams, key=lambda item: item[0]):
+        yield record
+
+
+def _archived_records(restaurant_id, since, until, chunk_size):
+    """(sort key, record) for archived orders, in (created_at, id) order."""
+    archived = ArchivedOrder.objects.order_by("created_at", "order_id")
+    if restaurant_id is not None:
+        archived = archived.filter(restaurant_id=restaurant_id)
+    for a in _date_filters(archived, since, until).iterator(chunk_size=chunk_size):
+        yield (a.created_at, a.order_id), {
+            "id": a.order_id,
+            "created_at": a.created_at.isoformat(),
+            "restaurant_id": a.restaurant_id,
+            "end_user_id": a.end_user_id,
+            "state": a.state,
+            "is_cancelled": a.state == ArchivedOrder.TerminalState.CANCELLED,
+            "archived": True,
+            **a.payload,
+        }
+
+
+def _live_records(restaurant_id, since, until, chunk_size):
+    """(sort key, record) for orders still in the hot tables, in (created_at, id) order."""
+    orders = Order.objects.order_by("created_at", "id")
+    if restaurant_id is not None:
+        # EXISTS instead of a join + DISTINCT so Postgres can stream rows straight off the cursor
+        orders = orders.filter(Exists(
+            OrderProduct.objects.filter(order=OuterRef("pk"), product__restaurant_id=restaurant_id)
+        ))
+    orders = (
+        _date_filters(orders, since, until)
+        .select_related("delivery")
+        .prefetch_related(
+            Prefetch("order_products", queryset=OrderProduct.objects.select_related("product")),
+            "order_answers__preparations__steps",
+        )
+    )
+    for o in orders.iterator(chunk_size=chunk_size):
+        payload = order_payload(o)
+        ops = o.order_products.all()
+        yield (o.created_at, o.id), {
+            "id": o.id,
+            "created_at": o.created_at.isoformat(),
+            "restaurant_id": ops[0].product.restaurant_id if ops else None,
+            "end_user_id": o.end_user_id,
+            "state": None,
+            "is_cancelled": o.is_cancelled,
+            "archived": False,
+            **payload,
+        }
+
+
+def read_ndjson(path):
+    """Records from an export_orders NDJSON file (gzipped if the name ends in .gz)."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_ndjson(records):
+    for r in records:
+        yield json.dumps(r, separators=(",", ":")) + "\n"
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back to the caller."""
+    def write(self, value):
+        return value
+
+
+def _csv_rows(record):
+    accepted = [a for a in record["answers"] if a["status"] == OrderAnswer.OrderAnswerStatus.ACCEPTED]
+    ans = max(accepted, key=lambda a: a["created_at"]) if accepted else None
+    delivery = record.get("delivery") or {}
+    common = [
+        record["id"],
+        record["created_at"],
+        record["restaurant_id"],
+        record["end_user_id"],
+        record["state"] or "",
+        int(record["is_cancelled"]),
+        int(record["archived"]),
+    ]
+    tail = [
+        ans["created_at"] if ans else "",
+        ans["projected_preparation_time_minutes"] if ans else "",
+        sum(s["delaytime_minutes"] for s in ans["steps"]) if ans else "",
+        delivery.get("estimated_pickup_time", ""),
+        delivery.get("estimated_delivery_time", ""),
+    ]
+    # One row per order line; orders without lines still get a row
+    for item in record["items"] or [None]:
+        if item is None:
+            yield common + ["", "", "", "", ""] + tail
+        else:
+            yield common + [
+                item["product_id"],
+                item["product_name"],
+                item["quantity"],
+                item["unit_price_NOK"],
+                item["quantity"] * item["unit_price_NOK"],
+            ] + tail
+
+
+def iter_csv(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for r in records:
+        for row in _csv_rows(r):
+            yield writer.writerow(row)
+
+
+def iter_encoded(lines, gzip=False):
+    """Encode text lines to bytes, coalescing into ~64 KiB chunks (gzip-compressed if asked)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None  # wbits=31 -> gzip container
+    buf = []
+    size = 0
+    for line in lines:
+        b = line.encode("utf-8")
+        buf.append(b)
+        size += len(b)
+        if size >= FLUSH_BYTES:
+            chunk = b"".join(buf)
+            buf, size = [], 0
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    chunk = b"".join(buf)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_stream(fmt, gzip=False, **filters):
+    """Byte stream for the given format ("ndjson" or "csv")."""
+    records = iter_order_records(**filters)
+    lines = iter_csv(records) if fmt == "csv" else iter_ndjson(records)
+    return iter_encoded(lines, gzip=gzip)
@@ -0,0 +1,262 @@
+"""
+Delivery zones and nearest-restaurant lookup.
+
+A restaurant with coordinates delivers inside its `delivery_zone` polygon
+([[lat, lon], ...], at least three vertices), or within `delivery_radius_m`
+of itself when it has no polygon. Restaurants without coordinates are not
+indexed and accept any drop-off point.
+
+Every worker keeps a SpatialIndex of all zones. It is a uniform lat/lon grid
+(GEO_GRID_CELL_DEGREES), with each zone listed in every cell its bounding box
+touches. "Which restaurants can serve this point" is then one dict lookup
+plus a flat-earth radius test (or a bounding-box and point-in-polygon test)
+per candidate in that cell. That takes microseconds, with no database or
+cache access.
+
+Restaurant writes replace a "geo:v" version stamp in the shared cache after
+commit. A worker compares its stamp at most every GEO_INDEX_CHECK_SECONDS
+and rebuilds the whole index when it has changed. A rebuild takes a single
+query plus several seconds per 100k restaurants (7.6 s in bench_geo) and is
+rare, because zones change rarely. parse_radius() and parse_zone() bound the
+size of a zone, and the index clips any zone that would still fill more than
+GEO_MAX_ZONE_CELLS cells, so a single restaurant cannot make a rebuild slow. Without a shared cache (no REDIS_URL) a stamp only sees this
+process's own writes, so the index is also rebuilt once it is older than
+GEO_INDEX_MAX_AGE_SECONDS.
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from business_logic.models import Restaurant
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371000
+METRES_PER_DEGREE = 111320
+VERSION_KEY = "geo:v"
+
+# metres_per_lon_degree and radius_sq feed the flat-earth distance used for zone
+# tests, which is within 0.1% of the great-circle distance at delivery ranges
+Zone = namedtuple("Zone", ["restaurant_id", "name", "lat", "lon", "metres_per_lon_degree", "radius_sq", "polygon", "bbox"])
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance in metres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def flight_minutes(distance):
+    return distance / settings.GEO_DRONE_SPEED_MPS / 60
+
+
+def point_in_polygon(lat, lon, polygon):
+    """Even-odd ray casting; `polygon` is a sequence of (lat, lon) vertices."""
+    inside = False
+    lat_j, lon_j = polygon[-1]
+    for lat_i, lon_i in polygon:
+        if (lat_i > lat) != (lat_j > lat) and lon < (lon_j - lon_i) * (lat - lat_i) / (lat_j - lat_i) + lon_i:
+            inside = not inside
+        lat_j, lon_j = lat_i, lon_i
+    return inside
+
+
+def parse_point(lat, lon):
+    """Validated (lat, lon) floats; raises ValueError."""
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        raise ValueError("lat and lon must be numbers")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("lat/lon out of range")
+    return lat, lon
+
+
+def parse_radius(value):
+    """Validated delivery radius in metres; raises ValueError."""
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= settings.GEO_MAX_RADIUS_M:
+        raise ValueError(f"delivery_radius_m must be an integer between 1 and {settings.GEO_MAX_RADIUS_M}")
+    return value
+
+
+def parse_zone(value):
+    """Validated polygon as a list of [lat, lon]; [] clears it. Raises ValueError."""
+    if not isinstance(value, list):
+        raise ValueError("delivery_zone must be a list of [lat, lon] points")
+    if not value:
+        return []
+    if len(value) < 3:
+        raise ValueError("delivery_zone needs at least 3 points")
+    points = []
+    for p in value:
+        if not isinstance(p, (list, tuple)) or len(p) != 2:
+            raise ValueError("delivery_zone must be a list of [lat, lon] points")
+        points.append(list(parse_point(*p)))
+    span = settings.GEO_MAX_ZONE_DEGREES
+    if max(p[0] for p in points) - min(p[0] for p in points) > span or max(p[1] for p in points) - min(p[1] for p in points) > span:
+        raise ValueError(f"delivery_zone must fit within {span}° of latitude and longitude")
+    return points
+
+
+def make_zone(restaurant_id, name, lat, lon, radius_m, polygon=None):
+    metres_per_lon_degree = METRES_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+    if polygon:
+        polygon = tuple((p[0], p[1]) for p in polygon)
+        lats, lons = [p[0] for p in polygon], [p[1] for p in polygon]
+        bbox = (min(lats), max(lats), min(lons), max(lons))
+    else:
+        polygon = None
+        dlat, dlon = radius_m / METRES_PER_DEGREE, radius_m / metres_per_lon_degree
+        bbox = (lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+    return Zone(restaurant_id, name, lat, lon, metres_per_lon_degree, radius_m ** 2, polygon, bbox)
+
+
+class SpatialIndex:
+    """Grid of delivery zones; built once, then read-only (safe to share between threads)."""
+
+    def __init__(self, zones, cell_degrees, max_cells=None):
+        self.cell = cell_degrees
+        self.max_cells = max_cells or settings.GEO_MAX_ZONE_CELLS
+        self.zones = {}
+        self.grid = {}
+        for zone in zones:
+            self.zones[zone.restaurant_id] = zone
+            rows, cols = self._cells(zone)
+            for row in rows:
+                for col in cols:
+                    self.grid.setdefault((row, col), []).append(zone)
+
+    def _cells(self, zone):
+        """Row and column ranges of the cells a zone is listed in, clipped to the world and max_cells."""
+        min_lat, max_lat, min_lon, max_lon = zone.bbox
+        rows = range(self._cell(max(min_lat, -90)), self._cell(min(max_lat, 90)) + 1)
+        cols = range(self._cell(max(min_lon, -180)), self._cell(min(max_lon, 180)) + 1)
+        if len(rows) * len(cols) > self.max_cells:
+            # Zones from before the limits were enforced: keep the cells around the restaurant.
+            # can_serve() stays exact; serving() misses the clipped-off part.
+            half = max(int(math.sqrt(self.max_cells)) // 2, 1)
+            row, col = self._cell(zone.lat), self._cell(zone.lon)
+            rows = range(max(rows.start, row - half), min(rows.stop, row + half + 1))
+            cols = range(max(cols.start, col - half), min(cols.stop, col + half + 1))
+            logger.warning("Delivery zone of restaurant %s clipped to %d grid cells", zone.restaurant_id, len(rows) * len(cols))
+        return rows, cols
+
+    def _cell(self, degrees):
+        return math.floor(degrees / self.cell)
+
+    @staticmethod
+    def _match(zone, lat, lon):
+        """Squared distance to the restaurant if its zone covers the point, else None."""
+        _, _, zone_lat, zone_lon, metres_per_lon_degree, radius_sq, polygon, bbox = zone
+        dy = (lat - zone_lat) * METRES_PER_DEGREE
+        dx = (lon - zone_lon) * metres_per_lon_degree
+        d_sq = dx * dx + dy * dy
+        if polygon is None:
+            return d_sq if d_sq <= radius_sq else None
+        if bbox[0] <= lat <= bbox[1] and bbox[2] <= lon <= bbox[3] and point_in_polygon(lat, lon, polygon):
+            return d_sq
+        return None
+
+    def serving(self, lat, lon, limit=None):
+        """[(distance_m, Zone)] of the restaurants that deliver to (lat, lon), nearest first."""
+        found = []
+        for zone in self.grid.get((math.floor(lat / self.cell), math.floor(lon / self.cell)), ()):
+            # _match(), inlined: this loop is the whole cost of a lookup
+            _, _, zone_lat, zone_lon, metres_per_lon_degree, radius_sq, polygon, bbox = zone
+            dy = (lat - zone_lat) * METRES_PER_DEGREE
+            dx = (lon - zone_lon) * metres_per_lon_degree
+            d_sq = dx * dx + dy * dy
+            if polygon is None:
+                if d_sq <= radius_sq:
+                    found.append((d_sq, zone))
+            elif bbox[0] <= lat <= bbox[1] and bbox[2] <= lon <= bbox[3] and point_in_polygon(lat, lon, polygon):
+                found.append((d_sq, zone))
+        found = heapq.nsmallest(limit, found, key=itemgetter(0)) if limit else sorted(found, key=itemgetter(0))
+        return [(math.sqrt(d_sq), zone) for d_sq, zone in found]
+
+    def can_serve(self, restaurant_id, lat, lon):
+        """True/False, or None when the restaurant has no location (no zone to check)."""
+        zone = self.zones.get(restaurant_id)
+        if zone is None:
+            return None
+        return self._match(zone, lat, lon) is not None
+
+    def estimate(self, restaurant_id, lat, lon):
+        """(distance_m, flight minutes) from the restaurant to the point, or None without a location."""
+        zone = self.zones.get(restaurant_id)
+        if zone is None:
+            return None
+        d = distance_m(zone.lat, zone.lon, lat, lon)
+        return d, flight_minutes(d)
+
+    def stats(self):
+        return {
+            "restaurants": len(self.zones),
+            "cells": len(self.grid),
+            "cell_entries": sum(len(v) for v in self.grid.values()),
+        }
+
+
+def build_index():
+    rows = (
+        Restaurant.objects.using(DEFAULT_DB_ALIAS)
+        .filter(latitude__isnull=False, longitude__isnull=False)
+        .values_list("id", "name", "latitude", "longitude", "delivery_radius_m", "delivery_zone")
+    )
+    return SpatialIndex((make_zone(*row) for row in rows.iterator(chunk_size=10000)), settings.GEO_GRID_CELL_DEGREES)
+
+
+class _IndexHolder:
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.built_at = 0.0
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def get(self):
+        if self.index is not None and time.monotonic() - self.checked_at < settings.GEO_INDEX_CHECK_SECONDS:
+            return self.index
+        with self.lock:
+            if self.index is not None and time.monotonic() - self.checked_at < settings.GEO_INDEX_CHECK_SECONDS:
+                return self.index
+            cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+            version = cache.get(VERSION_KEY)  # read before the rows, like the catalog cache
+            max_age = settings.GEO_INDEX_MAX_AGE_SECONDS
+            expired = max_age > 0 and time.monotonic() - self.built_at >= max_age
+            if self.index is None or version != self.version or expired:
+                t0 = time.perf_counter()
+                self.index = build_index()
+                self.version = version
+                self.built_at = time.monotonic()
+                logger.info(
+                    "Spatial index built: %d restaurants in %.0fms",
+                    len(self.index.zones), (time.perf_counter() - t0) * 1000,
+                )
+            self.checked_at = time.monotonic()
+            return self.index
+
+
+_holder = _IndexHolder()
+
+
+def spatial_index():
+    """This worker's current SpatialIndex, rebuilt when restaurants have changed."""
+    return _holder.get()
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def _restaurant_changed(sender, using, **kwargs):
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, time.time_ns(), timeout=None), using=using)
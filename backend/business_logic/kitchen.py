@@ -0,0 +1,203 @@
+"""
+Kitchen capacity model and queue-aware ready-time projection.
+
+A restaurant has `kitchen_stations` stations, each preparing one order at a
+time. An order's service time is the sum of quantity x Product.preparation_minutes
+over its items; if any item has no preparation time the kitchen's own estimate
+(OrderAnswer.projected_preparation_time_minutes) is used instead. Delay steps
+add their minutes on top.
+
+Open orders (accepted, not cancelled, no done/cancelled step) are scheduled
+first-come-first-served in order of acceptance onto the earliest free station,
+in one pass. An order that is overdue but not yet marked done keeps its
+station until now, so everything behind it moves back.
+
+The open-order queue of a restaurant is rebuilt after every accept, step and
+cancellation commits (refresh_queue) and kept in the shared cache, stamped
+with a per-restaurant version like the catalog cache; readers only run the
+cheap projection. Without a shared cache (KITCHEN_QUEUE_CACHE_ENABLED off)
+every read queries the open orders instead.
+
+simulate() runs the same scheduler over a recorded order stream (see the
+simulate_kitchen command) to compare accept policies.
+"""
+import heapq
+import statistics
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from business_logic.models import OrderAnswer, OrderProduct, PreparationStep, Restaurant
+
+Job = namedtuple("Job", ["order_id", "accepted_at", "service_minutes"])
+Projection = namedtuple("Projection", ["order_id", "position", "station", "start_at", "ready_at"])
+
+VERSION_KEY = "kitchen:v:{}"
+QUEUE_KEY = "kitchen:queue:{}"
+FINISHED = [PreparationStep.PreparationStatus.DONE, PreparationStep.PreparationStatus.CANCELLED]
+
+
+def service_minutes(items, projected_minutes, delay_minutes=0):
+    """items: [(quantity, preparation_minutes or None)]."""
+    if items and all(minutes is not None for _, minutes in items):
+        base = sum(quantity * minutes for quantity, minutes in items)
+    else:
+        base = projected_minutes
+    return base + delay_minutes
+
+
+def project(jobs, stations, now):
+    """Schedule `jobs` (sorted by accepted_at) FIFO onto `stations` parallel stations."""
+    if not jobs:
+        return []
+    free = [(jobs[0].accepted_at, i) for i in range(max(stations, 1))]
+    result = []
+    for position, job in enumerate(jobs, start=1):
+        free_at, station = heapq.heappop(free)
+        start = max(free_at, job.accepted_at)
+        ready = max(start + timedelta(minutes=job.service_minutes), now)
+        heapq.heappush(free, (ready, station))
+        result.append(Projection(job.order_id, position, station + 1, start, ready))
+    return result
+
+
+# --- Live queue ---------------------------------------------------------------
+
+def open_jobs(restaurant_id, using):
+    """Accepted, unfinished orders of a restaurant, oldest acceptance first (two queries)."""
+    delays = (
+        PreparationStep.objects
+        .filter(preparation__order_answer=OuterRef("pk"))
+        .values("preparation__order_answer")
+        .annotate(total=Sum("delaytime_minutes"))
+        .values("total")
+    )
+    answers = list(
+        OrderAnswer.objects.using(using)
+        .filter(status=OrderAnswer.OrderAnswerStatus.ACCEPTED, order__is_cancelled=False)
+        .filter(Exists(OrderProduct.objects.filter(order=OuterRef("order_id"), product__restaurant_id=restaurant_id)))
+        .exclude(Exists(PreparationStep.objects.filter(preparation__order_answer=OuterRef("pk"), status__in=FINISHED)))
+        .annotate(delay=Coalesce(Subquery(delays, output_field=IntegerField()), 0))
+        .order_by("created_at", "id")
+        .values_list("order_id", "created_at", "projected_preparation_time_minutes", "delay")
+    )
+    items = {}
+    for order_id, quantity, minutes in (
+        OrderProduct.objects.using(using)
+        .filter(order_id__in=[a[0] for a in answers])
+        .values_list("order_id", "quantity", "product__preparation_minutes")
+    ):
+        items.setdefault(order_id, []).append((quantity, minutes))
+    return [
+        Job(order_id, accepted_at, service_minutes(items.get(order_id, []), projected, delay))
+        for order_id, accepted_at, projected, delay in answers
+    ]
+
+
+def _current_version(restaurant_id):
+    key = VERSION_KEY.format(restaurant_id)
+    cache.add(key, time.time_ns(), timeout=None)
+    return cache.get(key)
+
+
+def _stations(restaurant_id):
+    return Restaurant.objects.filter(id=restaurant_id).values_list("kitchen_stations", flat=True).first() or 1
+
+
+def _rebuild(restaurant_id, using):
+    # Version first: a change committed while we read bumps it and makes this entry stale
+    version = _current_version(restaurant_id)
+    stations = _stations(restaurant_id)
+    entry = {"version": version, "stations": stations, "jobs": open_jobs(restaurant_id, using)}
+    cache.set(QUEUE_KEY.format(restaurant_id), entry, timeout=settings.KITCHEN_QUEUE_TTL_SECONDS)
+    return entry
+
+
+def refresh_queue(restaurant_id, using):
+    """Call inside the transaction that changed the queue; recomputes it once that commits."""
+    if not settings.KITCHEN_QUEUE_CACHE_ENABLED:
+        return
+    def _refresh():
+        cache.set(VERSION_KEY.format(restaurant_id), time.time_ns(), timeout=None)
+        _rebuild(restaurant_id, using)
+    transaction.on_commit(_refresh, using=using)
+
+
+def kitchen_queue(restaurant_id, using, now):
+    """Projected start and ready times for every open order of a restaurant, in queue order."""
+    if not settings.KITCHEN_QUEUE_CACHE_ENABLED:
+        stations = _stations(restaurant_id)
+        return stations, project(open_jobs(restaurant_id, using), stations, now)
+    found = cache.get_many([VERSION_KEY.format(restaurant_id), QUEUE_KEY.format(restaurant_id)])
+    entry = found.get(QUEUE_KEY.format(restaurant_id))
+    if entry is None or entry["version"] != found.get(VERSION_KEY.format(restaurant_id)):
+        entry = _rebuild(restaurant_id, using)
+    return entry["stations"], project(entry["jobs"], entry["stations"], now)
+
+
+# --- Offline simulation -------------------------------------------------------
+
+def parse_policy(spec):
+    """accept-all | max-queue:N (open orders) | max-wait:M (minutes until ready)."""
+    name, _, arg = spec.partition(":")
+    if name == "accept-all" and not arg:
+        return name, None
+    if name in ("max-queue", "max-wait") and arg.isdigit():
+        return name, int(arg)
+    raise ValueError(f"Unknown policy: {spec}")
+
+
+def simulate(orders, stations, policy):
+    """
+    Replay `orders` (sorted by arrival) through a kitchen with `stations` stations,
+    deciding on each order at arrival with `policy` (see parse_policy).
+    `orders` yields (arrival datetime, service minutes, value NOK).
+    """
+    name, limit = parse_policy(policy)
+    free = None  # heap of the times each station becomes free
+    waiting = []  # ready times of accepted orders that are not ready yet
+    stats = {"offered": 0, "accepted": 0, "rejected": 0, "revenue_NOK": 0, "lost_NOK": 0, "busy_minutes": 0.0}
+    lead_times = []
+    first = last = None
+
+    for arrival, minutes, value in orders:
+        if free is None:
+            first = last = arrival
+            free = [arrival] * max(stations, 1)
+        stats["offered"] += 1
+        while waiting and waiting[0] <= arrival:
+            heapq.heappop(waiting)
+        ready = max(free[0], arrival) + timedelta(minutes=minutes)
+
+        if (name == "max-queue" and len(waiting) >= limit) or (
+            name == "max-wait" and (ready - arrival).total_seconds() / 60 > limit
+        ):
+            stats["rejected"] += 1
+            stats["lost_NOK"] += value
+            continue
+
+        heapq.heapreplace(free, ready)
+        heapq.heappush(waiting, ready)
+        stats["accepted"] += 1
+        stats["revenue_NOK"] += value
+        stats["busy_minutes"] += minutes
+        lead_times.append((ready - arrival).total_seconds() / 60)
+        last = max(last, ready)
+
+    if lead_times:
+        q = statistics.quantiles(lead_times, n=100) if len(lead_times) > 1 else lead_times * 99
+        span = (last - first).total_seconds() / 60 or 1
+        stats.update({
+            "lead_time_p50_min": round(q[49], 1),
+            "lead_time_p95_min": round(q[94], 1),
+            "lead_time_max_min": round(max(lead_times), 1),
+            "utilization": round(stats["busy_minutes"] / (span * max(stations, 1)), 3),
+        })
+    stats["busy_minutes"] = round(stats["busy_minutes"], 1)
+    return stats
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from business_logic.archive import archivable_orders, archive_batch, archive_cutoff
+from business_logic.sharding import shard_aliases, use_shard
+
+
+class Command(BaseCommand):
+    help = "Move finished (delivered/rejected/cancelled) orders older than N days into ArchivedOrder."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS)
+        parser.add_argument("--batch-size", type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE)
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches (resume later)")
+        parser.add_argument("--dry-run", action="store_true", help="Only count archivable orders")
+
+    def handle(self, *args, **opts):
+        cutoff = archive_cutoff(opts["older_than_days"])
+        for alias in shard_aliases():
+            with use_shard(alias):
+                self._archive(alias, cutoff, opts)
+
+    def _archive(self, alias, cutoff, opts):
+        if opts["dry_run"]:
+            self.stdout.write(f"[{alias}] {archivable_orders(cutoff).count()} orders created before {cutoff.isoformat()} can be archived")
+            return
+
+        total = 0
+        batches = 0
+        while opts["max_batches"] is None or batches < opts["max_batches"]:
+            moved = archive_batch(cutoff, batch_size=opts["batch_size"])
+            if not moved:
+                break
+            total += moved
+            batches += 1
+            self.stdout.write(f"[{alias}] batch {batches}: archived {moved} orders")
+        self.stdout.write(self.style.SUCCESS(f"[{alias}] Archived {total} orders created before {cutoff.isoformat()}"))
@@ -0,0 +1,100 @@
+import math
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from business_logic.geo import METRES_PER_DEGREE, SpatialIndex, build_index, make_zone
+
+# Synthetic restaurants cluster around this many cities spread over Europe
+CITIES = 300
+REGION = ((40.0, 65.0), (-8.0, 30.0))  # (lat range, lon range)
+
+
+def _cities(rng):
+    return [(rng.uniform(*REGION[0]), rng.uniform(*REGION[1])) for _ in range(CITIES)]
+
+
+def _synthetic_zones(n, cities, rng):
+    for i in range(n):
+        if rng.random() < 0.85:
+            lat0, lon0 = rng.choice(cities)
+            lat, lon = rng.gauss(lat0, 0.06), rng.gauss(lon0, 0.1)
+        else:
+            lat, lon = rng.uniform(*REGION[0]), rng.uniform(*REGION[1])
+        radius = rng.choice([3000, 5000, 8000])
+        polygon = None
+        if rng.random() < 0.3:
+            dlat = radius / METRES_PER_DEGREE
+            dlon = dlat / math.cos(math.radians(lat))
+            polygon = [
+                (lat + dlat * math.sin(a) * rng.uniform(0.6, 1), lon + dlon * math.cos(a) * rng.uniform(0.6, 1))
+                for a in (k * math.pi / 4 for k in range(8))
+            ]
+        yield make_zone(i, f"bench-{i}", lat, lon, radius, polygon)
+
+
+def _points(n, cities, rng):
+    points = []
+    for _ in range(n):
+        if rng.random() < 0.9:
+            lat0, lon0 = rng.choice(cities)
+            points.append((rng.gauss(lat0, 0.08), rng.gauss(lon0, 0.15)))
+        else:
+            points.append((rng.uniform(*REGION[0]), rng.uniform(*REGION[1])))
+    return points
+
+
+class Command(BaseCommand):
+    help = "Measure delivery-zone lookups (which restaurants serve a point) against an in-memory spatial index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--restaurants", type=int, default=100000, help="Synthetic restaurants to index")
+        parser.add_argument("--lookups", type=int, default=1000000)
+        parser.add_argument("--cell", type=float, default=settings.GEO_GRID_CELL_DEGREES, help="Grid cell size in degrees")
+        parser.add_argument("--from-db", action="store_true", help="Index the real restaurants instead of synthetic ones")
+
+    def handle(self, *args, **opts):
+        rng = random.Random(42)
+        cities = _cities(rng)
+        t0 = time.perf_counter()
+        if opts["from_db"]:
+            index = build_index()
+        else:
+            index = SpatialIndex(_synthetic_zones(opts["restaurants"], cities, rng), opts["cell"])
+        build_ms = (time.perf_counter() - t0) * 1000
+        stats = index.stats()
+        self.stdout.write(
+            f"Indexed {stats['restaurants']} restaurants in {build_ms:.0f}ms "
+            f"({stats['cells']} cells, {stats['cell_entries']} entries)"
+        )
+
+        points = _points(opts["lookups"], cities, rng)
+        serving = index.serving
+        t0 = time.perf_counter()
+        found = sum(len(serving(lat, lon)) for lat, lon in points)
+        elapsed = time.perf_counter() - t0
+
+        # Per-call latency on a sample; the timer itself adds ~0.1µs
+        sample = []
+        for lat, lon in points[:100000]:
+            s = time.perf_counter_ns()
+            serving(lat, lon, limit=10)
+            sample.append((time.perf_counter_ns() - s) / 1000)
+        q = statistics.quantiles(sample, n=100)
+
+        ids = list(index.zones) or [None]
+        checks = [(rng.choice(ids), lat, lon) for lat, lon in points[:100000]]
+        t1 = time.perf_counter()
+        for restaurant_id, lat, lon in checks:
+            index.can_serve(restaurant_id, lat, lon)
+        check_us = (time.perf_counter() - t1) / len(checks) * 1e6
+
+        self.stdout.write(
+            f"{len(points)} lookups: {elapsed / len(points) * 1e6:.2f}µs avg, "
+            f"{len(points) / elapsed:,.0f}/s, {found / len(points):.1f} restaurants per point; "
+            f"p50={q[49]:.2f}µs p99={q[98]:.2f}µs max={max(sample):.0f}µs; "
+            f"single-restaurant zone check {check_us:.2f}µs"
+        )
@@ -0,0 +1,104 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+
+from core import payloads
+from core.views import _orders_columnar
+
+MENU = ["Margherita", "Pepperoni", "Quattro Formaggi", "Caesar salad", "Tiramisu", "Cola 0.5l", "Garlic bread",
+        "Lasagne", "Carbonara", "Pizza bianca", "Calzone", "Panna cotta"]
+
+
+def synthetic_payload(n_orders, rng):
+    """An orders_list payload with `n_orders` orders, shaped like the real one."""
+    now = timezone.now()
+    orders, in_progress = [], []
+    for i in range(n_orders):
+        created = now - timedelta(minutes=n_orders - i)
+        order = {
+            "id": 100000 + i,
+            "created_at": created,
+            "items": [
+                {"product_id": MENU.index(name) + 1, "product_name": name, "quantity": rng.randint(1, 3), "unit_price_NOK": 150 + 10 * MENU.index(name)}
+                for name in rng.sample(MENU, rng.randint(1, 4))
+            ],
+        }
+        if i < n_orders * 0.6:
+            order["delivery"] = {"id": 5000 + i, "estimated_pickup_time": created + timedelta(minutes=20),
+                                 "estimated_delivery_time": created + timedelta(minutes=32)}
+        orders.append(order)
+        if n_orders * 0.6 <= i < n_orders * 0.9:
+            in_progress.append({
+                **order,
+                "accepted_at": created + timedelta(minutes=1),
+                "projected_preparation_time_minutes": 15,
+                "total_delay_minutes": 0,
+                "queue_position": len(in_progress) + 1,
+                "station": len(in_progress) % 2 + 1,
+                "projected_start_at": created + timedelta(minutes=2),
+                "projected_ready_at": created + timedelta(minutes=17),
+            })
+    return {
+        "ok": True,
+        "all_orders": orders[::-1],
+        "new_orders": orders[::-1][: n_orders // 10],
+        "in_progress_orders": in_progress,
+        "awaiting_pickup_orders": orders[: int(n_orders * 0.6)][::-1],
+        "kitchen": {"stations": 2, "open_orders": len(in_progress), "clear_at": now + timedelta(minutes=40)},
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure bytes on the wire and CPU per poll of GET /api/orders/ for each negotiated "
+        "layout and encoding (core/payloads.py), on a synthetic payload."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=300, help="Orders in the payload")
+        parser.add_argument("--polls", type=int, default=200, help="Polls per mode")
+
+    def handle(self, *args, **opts):
+        payload = synthetic_payload(opts["orders"], random.Random(42))
+        factory = RequestFactory()
+        formats = [payloads.JSON, payloads.COLUMNAR] + ([payloads.MSGPACK] if payloads.msgpack else [])
+        encodings = [None, "gzip"] + (["br"] if payloads.brotli else [])
+        if not payloads.msgpack or not payloads.brotli:
+            self.stdout.write("Skipping modes whose optional package (msgpack, brotli) is not installed")
+
+        self.stdout.write(f"{opts['orders']} orders, {opts['polls']} polls per mode; CPU µs per poll")
+        self.stdout.write(f"{'mode':<34}{'bytes':>9}{'changed':>10}{'unchanged':>11}{'304':>8}")
+        for fmt in formats:
+            for encoding in encodings:
+                headers = {"HTTP_ACCEPT": fmt, "HTTP_ACCEPT_ENCODING": encoding or "identity"}
+                cache_key = f"bench:{fmt}:{encoding}"
+
+                def poll(**extra):
+                    return payloads.payload_response(factory.get("/api/orders/", **headers, **extra), payload, _orders_columnar, cache_key)
+
+                # changed: the payload differs from the cached one, so it is compressed again
+                t0 = time.process_time()
+                for _ in range(opts["polls"]):
+                    cache.delete(f"payload:{cache_key}:{payloads.FORMATS[fmt][1]}:{encoding}")
+                    response = poll()
+                changed = (time.process_time() - t0) / opts["polls"] * 1e6
+                # unchanged: the compressed body comes from the cache
+                t0 = time.process_time()
+                for _ in range(opts["polls"]):
+                    poll()
+                unchanged = (time.process_time() - t0) / opts["polls"] * 1e6
+                t0 = time.process_time()
+                for _ in range(opts["polls"]):
+                    not_modified = poll(HTTP_IF_NONE_MATCH=response["ETag"])
+                revalidated = (time.process_time() - t0) / opts["polls"] * 1e6
+                assert not_modified.status_code == 304
+
+                mode = fmt.split("/")[1] + (f" + {encoding}" if encoding else "")
+                self.stdout.write(
+                    f"{mode:<34}{len(response.content):>9,}{changed:>10.0f}{unchanged:>11.0f}{revalidated:>8.0f}"
+                )
@@ -0,0 +1,80 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from business_logic.models import Product, Restaurant
+from business_logic.search import search_products
+
+BENCH_PREFIX = "bench-search-"
+WORDS = [
+    "veggie", "roll", "salmon", "burger", "pizza", "margherita", "taco", "burrito", "noodle", "ramen",
+    "curry", "chicken", "tikka", "paneer", "falafel", "wrap", "sushi", "nigiri", "poke", "bowl",
+    "lasagne", "pasta", "carbonara", "risotto", "soup", "tomato", "pumpkin", "kebab", "gyro", "salad",
+    "caesar", "waffle", "brunost", "pancake", "fiskesuppe", "kjottkaker", "lapskaus", "rakfisk", "lefse", "bun",
+]
+
+
+def _typo(word):
+    if len(word) < 4:
+        return word
+    i = random.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1:]
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic products and report product search latency percentiles (Postgres only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Create this many synthetic products first")
+        parser.add_argument("--restaurants", type=int, default=1000)
+        parser.add_argument("--queries", type=int, default=1000)
+        parser.add_argument("--scope", choices=["restaurant", "all"], default="all")
+        parser.add_argument("--cleanup", action="store_true", help="Delete the synthetic restaurants and exit")
+
+    def handle(self, *args, **opts):
+        if opts["cleanup"]:
+            deleted, _ = Restaurant.objects.filter(name__startswith=BENCH_PREFIX).delete()
+            self.stdout.write(f"Deleted {deleted} rows")
+            return
+
+        random.seed(42)
+        if opts["seed"]:
+            self._seed(opts["seed"], opts["restaurants"])
+
+        restaurants = list(Restaurant.objects.filter(name__startswith=BENCH_PREFIX).values_list("id", flat=True))
+        timings = []
+        for _ in range(opts["queries"]):
+            word = random.choice(WORDS)
+            q = random.choice([word, word[:3], _typo(word), f"{word} {random.choice(WORDS)[:4]}"])
+            restaurant = random.choice(restaurants) if opts["scope"] == "restaurant" and restaurants else None
+            t0 = time.perf_counter()
+            search_products(q, restaurant=restaurant, limit=20)
+            timings.append((time.perf_counter() - t0) * 1000)
+
+        timings.sort()
+        q = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f"{len(timings)} queries over {Product.objects.count()} products (scope={opts['scope']}): "
+            f"p50={q[49]:.2f}ms p95={q[94]:.2f}ms p99={q[98]:.2f}ms max={timings[-1]:.2f}ms"
+        )
+
+    def _seed(self, n, n_restaurants):
+        restaurants = Restaurant.objects.bulk_create([
+            Restaurant(name=f"{BENCH_PREFIX}{i}", address="Benchmark") for i in range(n_restaurants)
+        ])
+        batch = []
+        for i in range(n):
+            name = " ".join(random.sample(WORDS, random.randint(1, 3))) + f" {i}"
+            batch.append(Product(
+                restaurant=restaurants[i % n_restaurants],
+                name=name,
+                description=" ".join(random.choices(WORDS, k=8)),
+                price_NOK=random.randint(50, 400),
+            ))
+            if len(batch) == 10000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+        self.stdout.write(f"Seeded {n} products across {n_restaurants} restaurants")
@@ -0,0 +1,100 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+PATHS = ["/api/ping/", "/api/ready/", "/api/orders/", "/accounts/login/"]
+
+# Runs in a fresh interpreter: import the WSGI entry point the way a gunicorn
+# worker does, then time the first and second request to each path, sent with
+# the session cookie of a logged-in user so the API views do their real work.
+CHILD = r"""
+import io, json, os, sys, time
+t0 = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+from project.wsgi import application
+from core.warmup import warm_worker
+warm_worker()
+boot_ms = (time.perf_counter() - t0) * 1000
+
+from django.conf import settings
+host = next((h for h in settings.ALLOWED_HOSTS if h != "*" and not h.startswith(".")), "localhost")
+paths, cookie = json.loads(sys.argv[1]), sys.argv[2]
+
+def call(path):
+    environ = {
+        "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "", "SERVER_NAME": host,
+        "SERVER_PORT": "80", "HTTP_HOST": host, "HTTP_COOKIE": cookie, "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr,
+        "wsgi.url_scheme": "http", "wsgi.version": (1, 0), "wsgi.multithread": False,
+        "wsgi.multiprocess": True, "wsgi.run_once": False,
+    }
+    status = []
+    t = time.perf_counter()
+    b"".join(application(environ, lambda s, h, exc_info=None: status.append(s)))
+    return (time.perf_counter() - t) * 1000, status[0].split()[0]
+
+result = {"boot_ms": boot_ms, "first_ms": {}, "second_ms": {}, "status": {}}
+for path in paths:
+    result["first_ms"][path], result["status"][path] = call(path)
+    result["second_ms"][path], _ = call(path)
+print(json.dumps(result))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure worker boot time and first-request latency in fresh processes, "
+        "with and without the warm-up (core/warmup.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Fresh processes per mode")
+        parser.add_argument("--path", action="append", help=f"Paths to request (default: {' '.join(PATHS)})")
+        parser.add_argument("--user", help="Username to send the requests as (default: the first restaurant user)")
+
+    def handle(self, *args, **opts):
+        paths = opts["path"] or PATHS
+        users = get_user_model().objects.all()
+        if opts["user"]:
+            user = users.filter(username=opts["user"]).first()
+        else:
+            user = users.filter(auth_user_restaurants__isnull=False).order_by("id").first()
+        if user is None:
+            raise CommandError("No such user; pass --user with a user linked to a restaurant")
+
+        # One session for every child process, created here so its setup is not timed
+        client = Client()
+        client.force_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        try:
+            self._bench(paths, cookie, opts["runs"])
+        finally:
+            client.logout()
+
+    def _bench(self, paths, cookie, n_runs):
+        for mode, enabled in (("cold", "0"), ("warm", "1")):
+            runs = [self._run(paths, cookie, enabled) for _ in range(n_runs)]
+            boot = statistics.median(r["boot_ms"] for r in runs)
+            self.stdout.write(f"{mode}: boot {boot:.0f}ms (median of {len(runs)})")
+            for path in paths:
+                first = statistics.median(r["first_ms"][path] for r in runs)
+                second = statistics.median(r["second_ms"][path] for r in runs)
+                self.stdout.write(
+                    f"  {path:<20} first {first:7.1f}ms  second {second:6.1f}ms  status {runs[-1]['status'][path]}"
+                )
+
+    def _run(self, paths, cookie, warmup_enabled):
+        env = {**os.environ, "WARMUP_ENABLED": warmup_enabled}
+        proc = subprocess.run(
+            [sys.executable, "-c", CHILD, json.dumps(paths), cookie],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise CommandError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "child process failed")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
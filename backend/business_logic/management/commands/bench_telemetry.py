@@ -0,0 +1,86 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from business_logic.models import Delivery, DeliveryTrackSegment, EndUser, Order, OrderProduct, Product, Restaurant
+from business_logic.telemetry import ingest, parse_points
+
+BENCH_RESTAURANT = "bench-telemetry"
+
+
+class Command(BaseCommand):
+    help = "Measure drone telemetry ingestion throughput (JSON decode, validation, packing, INSERT, cache update)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--deliveries", type=int, default=200, help="Drones flying at the same time")
+        parser.add_argument("--batch", type=int, default=5000, help="Points per request")
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--cleanup", action="store_true", help="Delete the synthetic deliveries and exit")
+
+    def handle(self, *args, **opts):
+        if opts["cleanup"]:
+            deleted, _ = EndUser.objects.filter(orders__order_products__product__restaurant__name=BENCH_RESTAURANT).delete()
+            Restaurant.objects.filter(name=BENCH_RESTAURANT).delete()
+            self.stdout.write(f"Deleted {deleted} rows")
+            return
+
+        random.seed(42)
+        delivery_ids = self._deliveries(opts["deliveries"])
+        drones = {d: [59.91 + random.uniform(-0.05, 0.05), 10.75 + random.uniform(-0.1, 0.1), 100, 5000] for d in delivery_ids}
+        t_ms = int(time.time() * 1000)
+
+        bodies = []
+        for _ in range(opts["requests"]):
+            points = []
+            for _ in range(opts["batch"]):
+                d = random.choice(delivery_ids)
+                lat, lon, battery, remaining = drones[d]
+                t_ms += 1
+                points.append([d, t_ms, round(lat, 7), round(lon, 7), battery, remaining])
+                drones[d] = [lat + 0.00001, lon + 0.00001, max(battery - 0.01, 0), max(remaining - 1, 0)]
+            bodies.append(json.dumps({"points": points}).encode())
+
+        segments_before = DeliveryTrackSegment.objects.count()
+        cpu = total = 0.0
+        for raw in bodies:
+            t0 = time.perf_counter()
+            by_delivery = parse_points(json.loads(raw))
+            t1 = time.perf_counter()
+            ingest(by_delivery)
+            t2 = time.perf_counter()
+            cpu += t1 - t0
+            total += t2 - t0
+
+        n = opts["requests"] * opts["batch"]
+        self.stdout.write(
+            f"{n} points in {opts['requests']} requests over {len(delivery_ids)} deliveries: "
+            f"decode+validate {n / cpu:,.0f} points/s, end-to-end {n / total:,.0f} points/s "
+            f"({total / opts['requests'] * 1000:.1f}ms per request), "
+            f"{DeliveryTrackSegment.objects.count() - segments_before} segment rows written"
+        )
+
+    def _deliveries(self, n):
+        existing = list(
+            Delivery.objects
+            .filter(order__order_products__product__restaurant__name=BENCH_RESTAURANT)
+            .values_list("id", flat=True)[:n]
+        )
+        if len(existing) >= n:
+            return existing
+        restaurant, _ = Restaurant.objects.get_or_create(name=BENCH_RESTAURANT, defaults={"address": "Benchmark"})
+        product, _ = Product.objects.get_or_create(restaurant=restaurant, name="Benchmark meal")
+        now = timezone.now()
+        created = []
+        for _ in range(n - len(existing)):
+            order = Order.objects.create(end_user=EndUser.objects.create())
+            OrderProduct.objects.create(order=order, product=product, unit_price_NOK=product.price_NOK)
+            created.append(Delivery.objects.create(
+                order=order,
+                estimated_pickup_time=now + timedelta(minutes=5),
+                estimated_delivery_time=now + timedelta(minutes=15),
+            ).id)
+        return existing + created
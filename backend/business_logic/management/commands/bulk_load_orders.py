@@ -0,0 +1,121 @@
+import random
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from business_logic.bulk_load import LOAD_CHUNK_ORDERS, ORDER_GRAPH, load_order_records, without_indexes
+from business_logic.export import read_ndjson
+from business_logic.kitchen import refresh_queue
+from business_logic.models import OrderAnswer, PreparationStep, Product
+from business_logic.sharding import shard_aliases, shard_for_restaurant
+
+
+def synthetic_records(products, n, days, seed=42):
+    """`n` export_orders-style records spread evenly over the last `days` days."""
+    rng = random.Random(seed)
+    start = timezone.now() - timedelta(days=days)
+    step = timedelta(days=days) / max(n, 1)
+    for i in range(n):
+        created_at = start + step * i
+        items = [
+            {"product_id": p.id, "product_name": p.name, "quantity": rng.randint(1, 2), "unit_price_NOK": p.price_NOK}
+            for p in rng.sample(products, min(len(products), rng.randint(1, 3)))
+        ]
+        roll = rng.random()
+        answers, delivery, cancelled = [], None, roll >= 0.95
+        if roll < 0.9 or cancelled:
+            accepted = roll < 0.8 or cancelled
+            answered = created_at + timedelta(minutes=rng.randint(1, 5))
+            minutes = rng.randint(5, 25)
+            steps = []
+            if accepted and rng.random() < 0.2:
+                steps.append({"status": PreparationStep.PreparationStatus.DELAYED, "delaytime_minutes": 10,
+                              "created_at": (answered + timedelta(minutes=minutes)).isoformat()})
+            if accepted:
+                done = answered + timedelta(minutes=minutes + 10 * len(steps))
+                steps.append({"status": PreparationStep.PreparationStatus.CANCELLED if cancelled else PreparationStep.PreparationStatus.DONE,
+                              "delaytime_minutes": 0, "created_at": done.isoformat()})
+                if not cancelled:
+                    delivery = {"estimated_pickup_time": (done + timedelta(minutes=5)).isoformat(),
+                                "estimated_delivery_time": (done + timedelta(minutes=15)).isoformat()}
+            answers.append({
+                "status": OrderAnswer.OrderAnswerStatus.ACCEPTED if accepted else OrderAnswer.OrderAnswerStatus.REJECTED,
+                "created_at": answered.isoformat(),
+                "projected_preparation_time_minutes": minutes,
+                "steps": steps,
+            })
+        yield {
+            "id": None,
+            "created_at": created_at.isoformat(),
+            "restaurant_id": products[0].restaurant_id,
+            "is_cancelled": cancelled,
+            "items": items,
+            "answers": answers,
+            "delivery": delivery,
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load orders with COPY (Postgres): replay an export_orders NDJSON file (--input) "
+        "or generate synthetic orders for a restaurant (--generate N)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--input", help="NDJSON (optionally .gz) from export_orders")
+        parser.add_argument("--generate", type=int, help="Generate this many synthetic orders (needs --restaurant)")
+        parser.add_argument("--days", type=float, default=1, help="Spread generated orders over the last N days")
+        parser.add_argument("--restaurant", type=int, help="Load every order into this restaurant, matching products by name")
+        parser.add_argument("--database", help="Target alias; default is the restaurant's shard, else 'default'")
+        parser.add_argument("--shift-days", type=float, default=0, help="Move replayed timestamps by N days")
+        parser.add_argument("--chunk", type=int, default=LOAD_CHUNK_ORDERS, help="Orders per COPY round")
+        parser.add_argument(
+            "--drop-indexes", action="store_true",
+            help="Drop secondary indexes during the load and rebuild them after; runs as one transaction and locks the tables",
+        )
+
+    def handle(self, *args, **opts):
+        restaurant_id = opts["restaurant"]
+        using = opts["database"] or (shard_for_restaurant(restaurant_id) if restaurant_id is not None else "default")
+        if using not in shard_aliases():
+            raise CommandError(f"Unknown database: {using}")
+
+        if opts["input"]:
+            records = read_ndjson(opts["input"])
+        elif opts["generate"]:
+            if restaurant_id is None:
+                raise CommandError("--generate needs --restaurant")
+            products = list(Product.objects.using(using).filter(restaurant_id=restaurant_id))
+            if not products:
+                raise CommandError(f"Restaurant {restaurant_id} has no products on {using}")
+            records = synthetic_records(products, opts["generate"], opts["days"])
+        else:
+            raise CommandError("Pass --input or --generate")
+
+        t0 = time.perf_counter()
+        with ExitStack() as stack:
+            if opts["drop_indexes"]:
+                stack.enter_context(transaction.atomic(using=using))
+                stack.enter_context(without_indexes(ORDER_GRAPH, using, log=self.stdout.write))
+            loaded, skipped = load_order_records(
+                records, using,
+                restaurant_id=restaurant_id,
+                shift=timedelta(days=opts["shift_days"]),
+                chunk_size=opts["chunk"],
+                log=self.stdout.write,
+            )
+        elapsed = time.perf_counter() - t0
+        if restaurant_id is not None:
+            refresh_queue(restaurant_id, using)
+
+        rows = sum(loaded.values())
+        for label, n in loaded.items():
+            self.stdout.write(f"  {label}: {n}")
+        self.stdout.write(
+            f"Loaded {rows} rows into {using} in {elapsed:.1f}s ({rows / max(elapsed, 1e-6) * 60:,.0f} rows/min)"
+            + (f", skipped {skipped} orders with unknown products" if skipped else "")
+        )
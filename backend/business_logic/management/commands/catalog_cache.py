@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from business_logic.catalog_cache import catalog, warm_up
+
+
+class Command(BaseCommand):
+    help = "Run the catalog cache warm-up a worker does at boot and report how much it loads and its memory footprint."
+
+    def handle(self, *args, **opts):
+        if not settings.CATALOG_CACHE_ENABLED:
+            self.stderr.write("CATALOG_CACHE_ENABLED is off (it defaults to on only with REDIS_URL); warming anyway.")
+            settings.CATALOG_CACHE_ENABLED = True
+        warm_up()
+        stats = catalog.stats()
+        self.stdout.write(
+            f"{stats['entries']}/{stats['max_entries']} products, ~{stats['approx_bytes'] / 1024 / 1024:.1f} MiB per worker "
+            f"(menus of restaurants with orders in the last {settings.CATALOG_WARMUP_DAYS} days)"
+        )
@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from business_logic.export import EXPORT_CHUNK_SIZE, export_stream, parse_bound
+from business_logic.sharding import shard_aliases, shard_for_restaurant, use_shard
+
+
+class Command(BaseCommand):
+    help = "Stream orders (with items, answers, steps and deliveries) as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+        parser.add_argument("--since", help="ISO date/datetime (inclusive)")
+        parser.add_argument("--until", help="ISO date/datetime (exclusive)")
+        parser.add_argument("--restaurant", type=int, default=None, help="Only orders for this restaurant id")
+        parser.add_argument("--no-archived", action="store_true", help="Skip orders in cold storage")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+        parser.add_argument("--output", "-o", default="-", help="File path, or - for stdout")
+
+    def handle(self, *args, **opts):
+        try:
+            since = parse_bound(opts["since"]) if opts["since"] else None
+            until = parse_bound(opts["until"]) if opts["until"] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if opts["restaurant"] is not None:
+            aliases = [shard_for_restaurant(opts["restaurant"])]
+        else:
+            aliases = shard_aliases()
+        if opts["format"] == "csv" and len(aliases) > 1:
+            raise CommandError("CSV exports across several shards need --restaurant")
+
+        out = sys.stdout.buffer if opts["output"] == "-" else open(opts["output"], "wb")
+        try:
+            for alias in aliases:
+                with use_shard(alias):
+                    # Concatenated gzip members form a valid gzip file
+                    for chunk in export_stream(
+                        opts["format"],
+                        gzip=opts["gzip"],
+                        restaurant_id=opts["restaurant"],
+                        since=since,
+                        until=until,
+                        include_archived=not opts["no_archived"],
+                        chunk_size=opts["chunk_size"],
+                    ):
+                        out.write(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+            else:
+                out.flush()
@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from business_logic.catalog_import import import_products, parse_rows
+from business_logic.models import Restaurant
+from business_logic.sharding import shard_for_restaurant, use_shard
+
+
+class Command(BaseCommand):
+    help = "Bulk import/upsert a restaurant menu from a CSV or JSON file (matched by product name)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--restaurant", type=int, required=True, help="Restaurant id")
+        parser.add_argument("--format", choices=["csv", "json"], default=None, help="Defaults to the file extension")
+
+    def handle(self, *args, **opts):
+        try:
+            restaurant = Restaurant.objects.get(id=opts["restaurant"])
+        except Restaurant.DoesNotExist:
+            raise CommandError(f"Restaurant not found: {opts['restaurant']}")
+
+        path = Path(opts["path"])
+        fmt = opts["format"] or ("csv" if path.suffix.lower() == ".csv" else "json")
+        try:
+            rows = parse_rows(path.read_bytes(), fmt)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        with use_shard(shard_for_restaurant(restaurant.id)):
+            result = import_products(restaurant, rows)
+        if result["errors"]:
+            for e in result["errors"]:
+                self.stderr.write(f"row {e['row']}: {e['error']}")
+            raise CommandError(f"{len(result['errors'])} invalid rows; nothing was imported")
+        self.stdout.write(self.style.SUCCESS(
+            f"{restaurant.name}: {result['created']} created, {result['updated']} updated"
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from business_logic.sharding import SHARD_ID_BLOCK, init_sequences, shard_aliases
+
+
+class Command(BaseCommand):
+    help = "Give every shard its own id range so rows keep their ids when restaurants move. Run after migrating the shards."
+
+    def handle(self, *args, **opts):
+        for index, alias in enumerate(shard_aliases()):
+            init_sequences(alias, index)
+            self.stdout.write(f"{alias}: ids from {index * SHARD_ID_BLOCK + 1}")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from business_logic.models import Restaurant
+from business_logic.sharding import move_restaurant, shard_aliases
+
+
+class Command(BaseCommand):
+    help = "Move a restaurant (products, orders, notifications, ...) to another shard while it stays online."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--restaurant", type=int, required=True, help="Restaurant id")
+        parser.add_argument("--to", required=True, help="Target database alias")
+        parser.add_argument("--keep-source", action="store_true", help="Do not delete the rows from the old shard")
+        parser.add_argument("--drain-seconds", type=float, default=2, help="Wait for in-flight writes after pausing them")
+
+    def handle(self, *args, **opts):
+        if opts["to"] not in shard_aliases():
+            raise CommandError(f"Unknown shard {opts['to']!r}; configured: {', '.join(shard_aliases())}")
+        try:
+            restaurant = Restaurant.objects.get(id=opts["restaurant"])
+        except Restaurant.DoesNotExist:
+            raise CommandError(f"Restaurant not found: {opts['restaurant']}")
+
+        try:
+            move_restaurant(
+                restaurant,
+                opts["to"],
+                keep_source=opts["keep_source"],
+                drain_seconds=opts["drain_seconds"],
+                log=self.stdout.write,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
@@ -0,0 +1,53 @@
+import signal
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from business_logic.outbox import process_batch, prune_processed
+from business_logic.sharding import shard_aliases, use_shard
+
+PRUNE_EVERY_SECONDS = 60
+
+
+class Command(BaseCommand):
+    help = "Process transactional outbox events (notifications, deliveries). Run as many as you need."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument("--poll-interval", type=float, default=settings.OUTBOX_POLL_INTERVAL_SECONDS)
+        parser.add_argument("--once", action="store_true", help="Drain pending events and exit")
+
+    def handle(self, *args, **opts):
+        self._stop = False
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        processed = 0
+        last_prune = 0
+        while not self._stop:
+            close_old_connections()
+            prune = time.monotonic() - last_prune > PRUNE_EVERY_SECONDS
+            busy = False
+            # Each shard has its own outbox table
+            for alias in shard_aliases():
+                with use_shard(alias):
+                    if prune:
+                        prune_processed(timezone.now() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS))
+                    claimed = process_batch(opts["batch_size"])
+                processed += claimed
+                busy = busy or claimed == opts["batch_size"]
+            if prune:
+                last_prune = time.monotonic()
+            if busy:
+                continue  # more is probably waiting
+            if opts["once"]:
+                break
+            time.sleep(opts["poll_interval"])
+        self.stdout.write(f"Processed {processed} outbox events")
+
+    def _request_stop(self, signum, frame):
+        self._stop = True
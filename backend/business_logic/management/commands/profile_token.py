@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = "Print a signed X-Profile-Token header value that makes the backend profile a request."
+
+    def handle(self, *args, **opts):
+        if not settings.PROFILE_DIR:
+            self.stderr.write("PROFILE_DIR is not set; the profiler is disabled on this instance.")
+        self.stdout.write(make_token())
+        self.stdout.write(f"Valid for {settings.PROFILE_TOKEN_MAX_AGE}s, e.g.: curl -H 'X-Profile-Token: <token>' ...")
@@ -0,0 +1,87 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.capture import read_capture
+from core.replay import HttpTransport, Replayer, ReplayUsers, TestClientTransport, compare, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay captured API traffic (CAPTURE_DIR, core/capture.py) against this build, in-process or over HTTP, "
+        "time-scaled, and report per-endpoint latency and errors; --compare diffs against an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("inputs", nargs="*", help="Capture files or directories (default: CAPTURE_DIR)")
+        parser.add_argument("--speed", type=float, default=1.0, help="Time scale, 1-50 (10 = ten times faster)")
+        parser.add_argument("--target", help="Base URL of a running stack, e.g. http://localhost; default is in-process")
+        parser.add_argument("--password", help="Password set on the replay users for --target logins")
+        parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at most")
+        parser.add_argument("--limit", type=int, help="Replay only the first N captured requests")
+        parser.add_argument("--no-admission", action="store_true", help="In-process: turn off admission control")
+        parser.add_argument("-o", "--output", help="Write the summary as JSON (input for --compare)")
+        parser.add_argument("--compare", help="Summary JSON of a baseline run to diff against")
+
+    def handle(self, *args, **opts):
+        if not 1 <= opts["speed"] <= 50:
+            raise CommandError("--speed must be between 1 and 50")
+        inputs = opts["inputs"] or ([settings.CAPTURE_DIR] if settings.CAPTURE_DIR else [])
+        if not inputs:
+            raise CommandError("Pass capture files or set CAPTURE_DIR")
+        baseline = None
+        if opts["compare"]:
+            with open(opts["compare"], encoding="utf-8") as f:
+                baseline = json.load(f)
+
+        if opts["target"]:
+            if not opts["password"]:
+                raise CommandError("--target needs --password (set on the replay users)")
+            transport = HttpTransport(opts["target"], opts["password"])
+        else:
+            settings.CAPTURE_DIR = ""  # the test clients load middleware after this: don't capture the replay
+            if opts["no_admission"]:
+                settings.ADMISSION_ENABLED = False
+            transport = TestClientTransport()
+        replayer = Replayer(transport, ReplayUsers(opts["password"]), speed=opts["speed"], concurrency=opts["concurrency"])
+
+        t0 = time.perf_counter()
+        results = replayer.run(read_capture(inputs), limit=opts["limit"])
+        elapsed = time.perf_counter() - t0
+        summary = summarize(results, replayer.skipped)
+        summary["speed"] = opts["speed"]
+        summary["elapsed_s"] = round(elapsed, 1)
+
+        self.stdout.write(
+            f"Replayed {len(results)} requests in {elapsed:.1f}s at {opts['speed']}x"
+            + (f"; skipped {dict(replayer.skipped)}" if replayer.skipped else "")
+        )
+        if baseline is None:
+            self.stdout.write(f"{'endpoint':<48}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>6}{'429/503':>8}{'mism':>6}{'lag99':>8}")
+            for endpoint, s in [*summary["endpoints"].items(), ("total", summary["total"])]:
+                if s["n"]:
+                    self.stdout.write(
+                        f"{endpoint[:47]:<48}{s['n']:>7}{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}"
+                        f"{s['errors']:>6}{s['throttled']:>8}{s['mismatched']:>6}{s['lag_p99_ms']:>8.0f}"
+                    )
+        else:
+            self.stdout.write(f"{'endpoint':<48}{'p50 base→new':>20}{'p99 base→new':>22}{'errors':>10}{'mism':>10}")
+            for endpoint, old, new in compare(baseline, summary):
+                if not old or not new or not old["n"] or not new["n"]:
+                    self.stdout.write(f"{endpoint[:47]:<48}  only in {'baseline' if old else 'this run'}")
+                    continue
+                self.stdout.write(
+                    f"{endpoint[:47]:<48}{_delta(old['p50_ms'], new['p50_ms']):>20}{_delta(old['p99_ms'], new['p99_ms']):>22}"
+                    f"{old['errors']:>5}→{new['errors']:<4}{old['mismatched']:>5}→{new['mismatched']:<4}"
+                )
+
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+
+
+def _delta(old, new):
+    change = (new - old) / old * 100 if old else 0
+    return f"{old:.1f}→{new:.1f} ({change:+.0f}%)"
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from business_logic.export import iter_order_records, parse_bound, read_ndjson
+from business_logic.kitchen import parse_policy, service_minutes, simulate
+from business_logic.models import OrderAnswer, Product, Restaurant
+from business_logic.sharding import shard_for_restaurant, use_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a recorded order stream through the kitchen capacity model and compare accept policies, "
+        "e.g. --policy accept-all --policy max-queue:6 --policy max-wait:30"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--input", help="NDJSON (optionally .gz) from export_orders; default reads the database")
+        parser.add_argument("--restaurant", type=int, help="Restaurant id (required without --input)")
+        parser.add_argument("--since", help="ISO date/datetime (inclusive)")
+        parser.add_argument("--until", help="ISO date/datetime (exclusive)")
+        parser.add_argument("--stations", type=int, help="Parallel stations; default is the restaurant's kitchen_stations")
+        parser.add_argument("--policy", action="append", help="accept-all | max-queue:N | max-wait:MINUTES (repeatable)")
+        parser.add_argument("--default-minutes", type=int, default=10, help="Service time when nothing better is recorded")
+
+    def handle(self, *args, **opts):
+        policies = opts["policy"] or ["accept-all"]
+        try:
+            for p in policies:
+                parse_policy(p)
+            since = parse_bound(opts["since"]) if opts["since"] else None
+            until = parse_bound(opts["until"]) if opts["until"] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if opts["input"]:
+            records = [
+                r for r in read_ndjson(opts["input"])
+                if opts["restaurant"] is None or r["restaurant_id"] == opts["restaurant"]
+            ]
+        elif opts["restaurant"] is not None:
+            with use_shard(shard_for_restaurant(opts["restaurant"])):
+                records = list(iter_order_records(restaurant_id=opts["restaurant"], since=since, until=until))
+        else:
+            raise CommandError("Pass --input or --restaurant")
+
+        stations = opts["stations"]
+        if stations is None:
+            restaurant_ids = {r["restaurant_id"] for r in records}
+            if len(restaurant_ids) != 1:
+                raise CommandError("--stations is required when the stream covers several restaurants")
+            stations = Restaurant.objects.filter(id=restaurant_ids.pop()).values_list("kitchen_stations", flat=True).first() or 2
+
+        orders = self._orders(records, since, until, opts["default_minutes"])
+        self.stdout.write(f"{len(orders)} orders, {stations} stations")
+        for policy in policies:
+            stats = simulate(orders, stations, policy)
+            self.stdout.write(f"{policy:>16}: " + " ".join(f"{k}={v}" for k, v in stats.items()))
+
+    def _orders(self, records, since, until, default_minutes):
+        product_ids = {i["product_id"] for r in records for i in r["items"]}
+        minutes = {}
+        for restaurant_id in {r["restaurant_id"] for r in records}:
+            with use_shard(shard_for_restaurant(restaurant_id)):
+                minutes.update(Product.objects.filter(id__in=product_ids).values_list("id", "preparation_minutes"))
+
+        orders = []
+        for r in records:
+            arrival = parse_datetime(r["created_at"])
+            if (since and arrival < since) or (until and arrival >= until):
+                continue
+            accepted = [a for a in r["answers"] if a["status"] == OrderAnswer.OrderAnswerStatus.ACCEPTED]
+            projected = accepted[0]["projected_preparation_time_minutes"] if accepted else default_minutes
+            delay = sum(s["delaytime_minutes"] for a in accepted for s in a["steps"])
+            items = [(i["quantity"], minutes.get(i["product_id"])) for i in r["items"]]
+            value = sum(i["quantity"] * i["unit_price_NOK"] for i in r["items"])
+            orders.append((arrival, service_minutes(items, projected, delay), value))
+        orders.sort(key=lambda o: o[0])
+        return orders
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.1 on 2026-10-19 16:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_logic', '0005_order_is_cancelled'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(unique=True)),
+                ('end_user_id', models.BigIntegerField()),
+                ('state', models.CharField(choices=[('d', 'Delivered'), ('r', 'Rejected'), ('c', 'Cancelled')], max_length=2)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('restaurant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='business_logic.restaurant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['restaurant', '-created_at'], name='archived_order_rest_created')],
+            },
+        ),
+    ]
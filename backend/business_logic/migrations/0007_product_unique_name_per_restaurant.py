@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:01
+
+from django.db import migrations, models
+
+
+def rename_duplicate_products(apps, schema_editor):
+    # Existing menus may already contain the same name twice; keep the oldest
+    # product as-is and suffix the others so the unique constraint can be added
+    # without touching any OrderProduct rows.
+    Product = apps.get_model("business_logic", "Product")
+    seen = set()
+    for p in Product.objects.order_by("restaurant_id", "name", "id").only("id", "restaurant_id", "name").iterator():
+        key = (p.restaurant_id, p.name)
+        if key in seen:
+            suffix = f" #{p.id}"
+            p.name = p.name[:200 - len(suffix)] + suffix
+            p.save(update_fields=["name"])
+        else:
+            seen.add(key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_logic', '0006_archivedorder'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_products, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'name'), name='uniq_product_name_per_restaurant'),
+        ),
+    ]
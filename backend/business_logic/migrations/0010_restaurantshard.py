@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_logic', '0009_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(default='default', max_length=64)),
+                ('is_moving', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='shard', to='business_logic.restaurant')),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_logic', '0010_restaurantshard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['restaurant', '-created_at'], name='notification_rest_created'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at'], name='order_created_desc'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['is_cancelled', '-created_at'], name='order_cancelled_created'),
+        ),
+        migrations.AddIndex(
+            model_name='orderanswer',
+            index=models.Index(fields=['status', '-created_at'], name='orderanswer_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='preparationstep',
+            index=models.Index(fields=['status', '-created_at'], name='prepstep_status_created'),
+        ),
+    ]
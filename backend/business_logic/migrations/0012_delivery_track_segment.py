@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_logic', '0011_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryTrackSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('point_count', models.PositiveIntegerField()),
+                ('points', models.BinaryField()),
+                ('delivery', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_segments', to='business_logic.delivery')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['delivery', '-ended_at'], name='track_segment_delivery_ended')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:17
+
+from django.db import migrations, models
+
+
+def merge_duplicate_answers(apps, schema_editor):
+    # Concurrent clicks could answer an order (and open a preparation) more than
+    # once. Keep the first answer and the first preparation, which is what won
+    # the race, and re-attach everything that hung off the duplicates to them.
+    OrderAnswer = apps.get_model("business_logic", "OrderAnswer")
+    Preparation = apps.get_model("business_logic", "Preparation")
+    PreparationStep = apps.get_model("business_logic", "PreparationStep")
+
+    keep = {}
+    for a in OrderAnswer.objects.order_by("order_id", "created_at", "id").only("id", "order_id").iterator():
+        if a.order_id not in keep:
+            keep[a.order_id] = a.id
+            continue
+        Preparation.objects.filter(order_answer_id=a.id).update(order_answer_id=keep[a.order_id])
+        a.delete()
+
+    keep = {}
+    for p in Preparation.objects.order_by("order_answer_id", "id").only("id", "order_answer_id").iterator():
+        if p.order_answer_id not in keep:
+            keep[p.order_answer_id] = p.id
+            continue
+        PreparationStep.objects.filter(preparation_id=p.id).update(preparation_id=keep[p.order_answer_id])
+        p.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_logic', '0012_delivery_track_segment'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='orderanswer',
+            constraint=models.UniqueConstraint(fields=('order',), name='uniq_answer_per_order'),
+        ),
+        migrations.AddConstraint(
+            model_name='preparation',
+            constraint=models.UniqueConstraint(fields=('order_answer',), name='uniq_preparation_per_answer'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_logic', '0013_one_answer_one_preparation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='preparation_minutes',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='kitchen_stations',
+            field=models.PositiveIntegerField(default=2),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_logic', '0014_kitchen_capacity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='dropoff_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='dropoff_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='delivery_radius_m',
+            field=models.PositiveIntegerField(default=5000),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='delivery_zone',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
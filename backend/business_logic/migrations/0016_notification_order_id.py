@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_logic', '0015_delivery_zones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='order_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('order_id',), name='uniq_notification_per_order'),
+        ),
+    ]
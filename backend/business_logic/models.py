@@ -1,5 +1,18 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
+from django.utils import timezone
+
+PRODUCT_SEARCH_CONFIG = "simple"  # menus mix Norwegian and English, so no stemming
+
+
+def product_search_vector():
+    # Used by both the GIN index on Product and product search; the expressions must stay identical
+    return (
+        SearchVector("name", weight="A", config=PRODUCT_SEARCH_CONFIG)
+        + SearchVector("description", weight="B", config=PRODUCT_SEARCH_CONFIG)
+    )
 
 
 class EndUser(models.Model):
@@ -13,8 +26,16 @@ class Product(models.Model):
     restaurant = models.ForeignKey("Restaurant", on_delete=models.CASCADE, related_name="products")
     description = models.TextField(max_length=1000, blank=True)
     price_NOK = models.PositiveIntegerField(default=200)
+    preparation_minutes = models.PositiveIntegerField(null=True, blank=True)  # kitchen time per unit; see business_logic/kitchen.py
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["restaurant", "name"], name="uniq_product_name_per_restaurant")]
+        indexes = [
+            GinIndex(fields=["name"], opclasses=["gin_trgm_ops"], name="product_name_trgm"),
+            GinIndex(product_search_vector(), name="product_search_vector"),
+        ]
+    
     def __str__(self):
         return self.name
 
@@ -22,6 +43,14 @@ class Order(models.Model):
     end_user = models.ForeignKey("EndUser", on_delete=models.CASCADE, related_name="orders")
     created_at = models.DateTimeField(auto_now_add=True)
     is_cancelled = models.BooleanField(default=False) # Either cancelled by the end user or by the restaurant
+    dropoff_latitude = models.FloatField(null=True, blank=True)  # where the drone delivers; see business_logic/geo.py
+    dropoff_longitude = models.FloatField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at"], name="order_created_desc"),
+            models.Index(fields=["is_cancelled", "-created_at"], name="order_cancelled_created"),
+        ]
     
     def __str__(self):
         return f"Order #{self.pk}"
@@ -37,7 +66,8 @@ class OrderProduct(models.Model):
         constraints = [models.UniqueConstraint(fields=["order","product"], name="uniq_order_product_once")]
     
     def __str__(self):
-        return f"Order #{self.order.pk} • {self.product.name}"
+        # order_id avoids loading the Order; list views select_related("product")
+        return f"Order #{self.order_id} • {self.product.name}"
 
 class OrderAnswer(models.Model):
     class OrderAnswerStatus(models.TextChoices):
@@ -48,12 +78,20 @@ class OrderAnswer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     projected_preparation_time_minutes = models.PositiveIntegerField(default=10)
     
+    class Meta:
+        # An order is answered once; kitchen views lock the Order row before answering
+        constraints = [models.UniqueConstraint(fields=["order"], name="uniq_answer_per_order")]
+        indexes = [models.Index(fields=["status", "-created_at"], name="orderanswer_status_created")]
+    
     def __str__(self):
         return f"OrderAnswer #{self.pk}"
 
 class Preparation(models.Model):
     order_answer = models.ForeignKey("OrderAnswer", on_delete=models.CASCADE, related_name="preparations")
     
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["order_answer"], name="uniq_preparation_per_answer")]
+    
     def __str__(self):
         return f"Preparation #{self.pk}"
 
@@ -67,6 +105,9 @@ class PreparationStep(models.Model):
     delaytime_minutes = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [models.Index(fields=["status", "-created_at"], name="prepstep_status_created")]
+    
     def __str__(self):
         return f"PreparationStep #{self.pk}"
 
@@ -79,9 +120,31 @@ class Delivery(models.Model):
     def __str__(self):
         return f"Delivery #{self.pk}"
 
+class DeliveryTrackSegment(models.Model):
+    """
+    One batch of drone telemetry for a delivery, packed into `points` (see
+    business_logic/telemetry.py). Append-only; ingestion never touches the
+    Delivery row itself.
+    """
+    delivery = models.ForeignKey("Delivery", on_delete=models.CASCADE, related_name="track_segments")
+    started_at = models.DateTimeField()  # time of the first point; points store offsets from it
+    ended_at = models.DateTimeField()
+    point_count = models.PositiveIntegerField()
+    points = models.BinaryField()
+
+    class Meta:
+        indexes = [models.Index(fields=["delivery", "-ended_at"], name="track_segment_delivery_ended")]
+
+    def __str__(self): return f"DeliveryTrackSegment #{self.pk} ({self.point_count} points)"
+
 class Restaurant(models.Model):
     name = models.CharField(max_length=200)
     address = models.CharField(max_length=255)
+    kitchen_stations = models.PositiveIntegerField(default=2)  # orders the kitchen prepares in parallel
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    delivery_radius_m = models.PositiveIntegerField(default=5000)  # used when delivery_zone is empty
+    delivery_zone = models.JSONField(default=list, blank=True)  # polygon [[lat, lon], ...]; see business_logic/geo.py
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -92,6 +155,11 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     read = models.BooleanField(default=False)
     message = models.TextField(max_length=1000)
+    order_id = models.BigIntegerField(null=True, blank=True)  # the order a notice is about; one notice per order
+    
+    class Meta:
+        indexes = [models.Index(fields=["restaurant", "-created_at"], name="notification_rest_created")]
+        constraints = [models.UniqueConstraint(fields=["order_id"], name="uniq_notification_per_order")]
     
     def __str__(self): return f"Notification #{self.pk}"
 
@@ -102,3 +170,66 @@ class AuthUserRestaurant(models.Model):
     class Meta:
         constraints = [models.UniqueConstraint(fields=["user"], name="unique_user_restaurant")]
     def __str__(self): return self.user.username
+
+class ArchivedOrder(models.Model):
+    """
+    Compact cold-storage copy of a finished Order. The hot Order row (and its
+    products, answers, preparations, steps and delivery) is deleted once this
+    row exists; everything needed for history/reporting lives in `payload`.
+    """
+    class TerminalState(models.TextChoices):
+        DELIVERED = "d", "Delivered"
+        REJECTED = "r", "Rejected"
+        CANCELLED = "c", "Cancelled"
+    order_id = models.BigIntegerField(unique=True)  # id of the original Order row
+    end_user_id = models.BigIntegerField()
+    restaurant = models.ForeignKey("Restaurant", on_delete=models.CASCADE, related_name="archived_orders", null=True, blank=True)
+    state = models.CharField(max_length=2, choices=TerminalState.choices)
+    created_at = models.DateTimeField()  # original Order.created_at
+    archived_at = models.DateTimeField(auto_now_add=True)
+    payload = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [models.Index(fields=["restaurant", "-created_at"], name="archived_order_rest_created")]
+
+    def __str__(self): return f"ArchivedOrder #{self.order_id}"
+
+class OutboxEvent(models.Model):
+    """
+    Domain event written in the same transaction as the change that caused it.
+    The outbox_worker command claims pending events and runs their side effects.
+    """
+    class Topic(models.TextChoices):
+        ORDER_CANCELLED = "order.cancelled", "Order cancelled"
+        PREPARATION_STEP_CREATED = "preparation_step.created", "Preparation step created"
+    topic = models.CharField(max_length=64, choices=Topic.choices)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now)  # pushed forward on retry
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["available_at", "id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="outbox_pending",
+            ),
+        ]
+
+    def __str__(self): return f"OutboxEvent #{self.pk} {self.topic}"
+
+class RestaurantShard(models.Model):
+    """
+    Shard map: which database alias holds a restaurant's products, orders and
+    notifications. Lives on the default database; restaurants without a row
+    stay on "default". See business_logic/sharding.py.
+    """
+    restaurant = models.OneToOneField("Restaurant", on_delete=models.CASCADE, related_name="shard")
+    alias = models.CharField(max_length=64, default="default")
+    is_moving = models.BooleanField(default=False)  # writes are paused while a rebalance finishes
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self): return f"{self.restaurant_id} → {self.alias}"
@@ -0,0 +1,202 @@
+"""
+Public order-status documents for customers.
+
+order_created hands the customer a status token: the order id signed with
+SECRET_KEY. GET /api/status/<token>/ needs no session. It returns a small
+JSON document describing where the order is (received, preparing, delayed,
+ready, rejected, cancelled; delivered once archived) with the kitchen's
+ready estimate and the drone's pickup and delivery ETAs. The status only
+moves on writes, so clients compare the ETAs with their clock for "picked
+up" and "arriving".
+
+The document is built once per change, not per request. post_save on Order,
+OrderAnswer, PreparationStep and Delivery rebuilds it after the transaction
+commits (a few primary-key queries on the order's shard), then stores it in
+the shared cache as ready-to-send bytes together with a strong ETag. Every
+customer poll is a single cache get: no database, and with If-None-Match
+usually no body either. Responses are public for ORDER_STATUS_MAX_AGE
+seconds, so nginx (frontend/nginx.conf) or a CDN answers the fan-out in
+front of Django.
+
+Writes that skip signals (queryset.update() in the admin, archival) call
+forget(). A missing entry is rebuilt on read by looking for the order on
+each shard and, for archived orders, in ArchivedOrder. COPY loads leave no
+entries behind, so their orders are built on first read too. An order found
+nowhere is remembered as missing for ORDER_STATUS_MISSING_TTL_SECONDS, so
+polls for it do not query every shard each time.
+
+Without a shared cache (no REDIS_URL) each process keeps its own documents
+and never sees other processes' writes; ORDER_STATUS_TTL_SECONDS then
+defaults to a few seconds instead of a day.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from business_logic.models import ArchivedOrder, Delivery, Order, OrderAnswer, PreparationStep
+from business_logic.sharding import shard_aliases
+
+STATUS_KEY = "order_status:{}"
+MISSING = "missing"  # cached in place of an entry for orders that do not exist
+
+_signer = signing.Signer(salt="business_logic.order_status")
+
+ARCHIVED_STATUS = {
+    ArchivedOrder.TerminalState.DELIVERED: "delivered",
+    ArchivedOrder.TerminalState.REJECTED: "rejected",
+    ArchivedOrder.TerminalState.CANCELLED: "cancelled",
+}
+
+
+def make_token(order_id):
+    return _signer.sign(str(order_id))
+
+
+def order_id_from_token(token):
+    """The order id inside a status token, or None if the token is forged or malformed."""
+    try:
+        return int(_signer.unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def document(order, answer=None, steps=(), delivery=None):
+    """The status document of an order, from its rows (steps oldest first)."""
+    status, ready_at = "received", None
+    delay = sum(s.delaytime_minutes for s in steps)
+    finished = next((s for s in steps if s.status != PreparationStep.PreparationStatus.DELAYED), None)
+    if order.is_cancelled or (finished and finished.status == PreparationStep.PreparationStatus.CANCELLED):
+        status = "cancelled"
+    elif answer is not None and answer.status == OrderAnswer.OrderAnswerStatus.REJECTED:
+        status = "rejected"
+    elif finished is not None or delivery is not None:
+        status, ready_at = "ready", finished.created_at if finished else None
+    elif answer is not None:
+        status = "delayed" if delay else "preparing"
+    if answer is not None and answer.status == OrderAnswer.OrderAnswerStatus.ACCEPTED and ready_at is None:
+        # The kitchen's own estimate; the queue-aware projection lives on the dashboard
+        ready_at = answer.created_at + timedelta(minutes=answer.projected_preparation_time_minutes + delay)
+    return {
+        "order_id": order.id,
+        "status": status,
+        "created_at": _iso(order.created_at),
+        "accepted_at": _iso(answer.created_at) if answer and answer.status == OrderAnswer.OrderAnswerStatus.ACCEPTED else None,
+        "delay_minutes": delay,
+        "projected_ready_at": _iso(ready_at) if status in ("preparing", "delayed", "ready") else None,
+        "pickup_eta": _iso(delivery.estimated_pickup_time) if delivery else None,
+        "delivery_eta": _iso(delivery.estimated_delivery_time) if delivery else None,
+    }
+
+
+def archived_document(archived):
+    return {
+        "order_id": archived.order_id,
+        "status": ARCHIVED_STATUS.get(archived.state, "delivered"),
+        "created_at": _iso(archived.created_at),
+        "accepted_at": None,
+        "delay_minutes": 0,
+        "projected_ready_at": None,
+        "pickup_eta": None,
+        "delivery_eta": None,
+    }
+
+
+def store(order_id, doc):
+    """Cache `doc` as response bytes plus a strong ETag; returns the entry."""
+    body = json.dumps(doc, cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+    entry = {"body": body, "etag": '"%s"' % hashlib.sha256(body).hexdigest()[:32]}
+    cache.set(STATUS_KEY.format(order_id), entry, timeout=settings.ORDER_STATUS_TTL_SECONDS)
+    return entry
+
+
+def _build(order_id, using):
+    order = Order.objects.using(using).filter(id=order_id).first()
+    if order is None:
+        archived = ArchivedOrder.objects.using(using).filter(order_id=order_id).first()
+        return archived_document(archived) if archived else None
+    answer = OrderAnswer.objects.using(using).filter(order_id=order_id).first()
+    steps = []
+    if answer is not None:
+        steps = list(
+            PreparationStep.objects.using(using)
+            .filter(preparation__order_answer=answer)
+            .order_by("created_at", "id")
+        )
+    delivery = Delivery.objects.using(using).filter(order_id=order_id).first()
+    return document(order, answer, steps, delivery)
+
+
+def refresh(order_id, using):
+    """Rebuild and cache the document of an order on `using`; returns the entry (None if unknown)."""
+    doc = _build(order_id, using)
+    if doc is None:
+        cache.delete(STATUS_KEY.format(order_id))
+        return None
+    return store(order_id, doc)
+
+
+def refresh_on_commit(order_id, using):
+    transaction.on_commit(lambda: refresh(order_id, using), using=using)
+
+
+def forget(order_ids, using):
+    """Drop cached documents once the current transaction commits; they are rebuilt on the next read."""
+    keys = [STATUS_KEY.format(order_id) for order_id in order_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys), using=using)
+
+
+def status_entry(order_id):
+    """{"body": bytes, "etag": str} for an order, from the cache or rebuilt on a miss; None if unknown."""
+    entry = cache.get(STATUS_KEY.format(order_id))
+    if entry == MISSING:
+        return None
+    if entry is not None:
+        return entry
+    for alias in shard_aliases():
+        entry = refresh(order_id, alias)
+        if entry is not None:
+            return entry
+    cache.set(STATUS_KEY.format(order_id), MISSING, timeout=settings.ORDER_STATUS_MISSING_TTL_SECONDS)
+    return None
+
+
+@receiver(post_save, sender=Order)
+def _order_saved(sender, instance, created, using, **kwargs):
+    if created:
+        # Nothing has happened to a new order yet: no queries needed
+        doc = document(instance)
+        transaction.on_commit(lambda: store(instance.id, doc), using=using)
+    else:
+        refresh_on_commit(instance.id, using)
+
+
+@receiver(post_save, sender=OrderAnswer)
+@receiver(post_save, sender=Delivery)
+def _order_row_saved(sender, instance, using, **kwargs):
+    refresh_on_commit(instance.order_id, using)
+
+
+@receiver(post_save, sender=PreparationStep)
+def _step_saved(sender, instance, using, **kwargs):
+    def _refresh():
+        order_id = (
+            PreparationStep.objects.using(using)
+            .filter(id=instance.id)
+            .values_list("preparation__order_answer__order_id", flat=True)
+            .first()
+        )
+        if order_id is not None:
+            refresh(order_id, using)
+    transaction.on_commit(_refresh, using=using)
@@ -0,0 +1,141 @@
+"""
+Transactional outbox.
+
+Write views call emit() inside their @transaction.atomic block, so an event
+exists if and only if the change that caused it was committed. The
+outbox_worker management command claims pending events in batches with
+SELECT ... FOR UPDATE SKIP LOCKED (so any number of workers can run side by
+side) and runs the registered handler for each one. A handler's writes and the
+"processed" mark commit together; handlers are still written to be idempotent.
+"""
+import logging
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from business_logic.geo import spatial_index
+from business_logic.models import (
+    Delivery,
+    Notification,
+    Order,
+    OutboxEvent,
+    PreparationStep,
+)
+from business_logic.sharding import current_shard
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(topic):
+    def register(fn):
+        HANDLERS[topic] = fn
+        return fn
+    return register
+
+
+def emit(topic, **payload):
+    """Append an event; call this inside the transaction that made the change."""
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(2 ** attempts, 300))
+
+
+def process_batch(batch_size=None):
+    """Claim and handle up to `batch_size` due events. Returns how many were claimed."""
+    if batch_size is None:
+        batch_size = settings.OUTBOX_BATCH_SIZE
+
+    with transaction.atomic(using=current_shard()):
+        now = timezone.now()
+        events = list(
+            OutboxEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, available_at__lte=now)
+            .order_by("available_at", "id")[:batch_size]
+        )
+        for event in events:
+            fn = HANDLERS.get(event.topic)
+            try:
+                if fn is None:
+                    raise LookupError(f"No handler for topic {event.topic!r}")
+                with transaction.atomic(using=current_shard()):  # savepoint: a failing handler leaves no partial writes
+                    fn(event.payload)
+            except Exception as e:
+                logger.exception("Outbox event %s (%s) failed", event.id, event.topic)
+                event.attempts += 1
+                event.last_error = f"{type(e).__name__}: {e}"
+                if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    event.processed_at = now  # give up; last_error stays for inspection
+                else:
+                    event.available_at = now + _retry_delay(event.attempts)
+                event.save(update_fields=["attempts", "last_error", "processed_at", "available_at"])
+                continue
+            event.processed_at = now
+            event.attempts += 1
+            event.save(update_fields=["attempts", "processed_at"])
+    return len(events)
+
+
+def prune_processed(older_than):
+    """Delete successfully handled events processed before `older_than`; failed ones are kept."""
+    deleted, _ = OutboxEvent.objects.filter(processed_at__lt=older_than, last_error="").delete()
+    return deleted
+
+
+@handler(OutboxEvent.Topic.ORDER_CANCELLED)
+def notify_order_cancelled(payload):
+    order = Order.objects.filter(id=payload["order_id"]).first()
+    if order is None:
+        return  # already archived
+    items = list(order.order_products.select_related("product__restaurant"))
+    if not items:
+        return
+    restaurant = items[0].product.restaurant
+    items_str = ", ".join([f"{op.quantity}× {op.product.name}" for op in items])
+    # An event handled twice (retried, or emitted by both the API and the admin) must not notify twice;
+    # the unique order_id holds even when two workers get here at once
+    Notification.objects.bulk_create(
+        [Notification(restaurant=restaurant, order_id=order.id, message=f"Order #{order.id} canceled for {items_str}")],
+        ignore_conflicts=True,
+    )
+
+
+@handler(OutboxEvent.Topic.PREPARATION_STEP_CREATED)
+def create_delivery_for_done_step(payload):
+    if payload["status"] != PreparationStep.PreparationStatus.DONE:
+        return
+    step = PreparationStep.objects.filter(id=payload["step_id"]).first()
+    if step is None:
+        return  # order was archived in the meantime
+    # Estimates are relative to when the kitchen marked the order done, not to when we got here
+    pickup = step.created_at + timedelta(minutes=5)
+    Delivery.objects.get_or_create(
+        order_id=payload["order_id"],
+        defaults={
+            "estimated_pickup_time": pickup,
+            "estimated_delivery_time": pickup + _flight_time(payload["order_id"]),
+        },
+    )
+
+
+def _flight_time(order_id):
+    """Drone flight to the order's drop-off point; 10 minutes when either end has no location."""
+    row = (
+        Order.objects.filter(id=order_id)
+        .values_list("dropoff_latitude", "dropoff_longitude", "order_products__product__restaurant_id")
+        .first()
+    )
+    if row is None or row[0] is None or row[2] is None:
+        return timedelta(minutes=10)
+    estimate = spatial_index().estimate(row[2], row[0], row[1])
+    if estimate is None:
+        return timedelta(minutes=10)
+    return timedelta(minutes=math.ceil(estimate[1]))
+
@@ -0,0 +1,68 @@
+"""
+Ranked product search over name and description.
+
+Matching combines Postgres full-text search with prefix terms ("veg" finds
+"Veggie Roll") and pg_trgm word similarity on the name for typo tolerance
+("vegie"). Both predicates are served by the GIN indexes on Product.
+Results are ordered by score, then id, and paged with a keyset cursor
+("<score>:<id>") so deep pages cost the same as the first one.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+from business_logic.models import PRODUCT_SEARCH_CONFIG, Product, product_search_vector
+
+SEARCH_MAX_LIMIT = 100
+
+
+def _prefix_query(q):
+    terms = re.findall(r"\w+", q.lower())
+    if not terms:
+        return None
+    # Only word characters reach the raw tsquery, so user input cannot break its syntax
+    return SearchQuery(" & ".join(f"{t}:*" for t in terms), search_type="raw", config=PRODUCT_SEARCH_CONFIG)
+
+
+def parse_cursor(value):
+    try:
+        score, last_id = value.split(":")
+        return float(score), int(last_id)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+
+def search_products(q, restaurant=None, limit=20, cursor=None):
+    """
+    Returns (products, next_cursor). Each product carries a `score` annotation.
+    `restaurant=None` searches across all restaurants.
+    """
+    query = _prefix_query(q)
+    if query is None:
+        return [], None
+
+    qs = Product.objects.alias(
+        document=product_search_vector(),
+        rank=SearchRank(product_search_vector(), query),
+        similarity=TrigramWordSimilarity(q, "name"),
+    ).annotate(
+        # real + real is a float4; as float8 the value in the cursor round-trips exactly,
+        # so rows tied with the last one on a page are compared equal, not skipped
+        score=Cast(F("rank") + F("similarity"), FloatField()),
+    ).filter(
+        Q(document=query) | Q(name__trigram_word_similar=q)
+    )
+    if restaurant is not None:
+        qs = qs.filter(restaurant=restaurant)
+    if cursor is not None:
+        score, last_id = cursor
+        qs = qs.filter(Q(score__lt=score) | Q(score=score, id__lt=last_id))
+
+    products = list(qs.select_related("restaurant").order_by("-score", "-id")[:limit])
+    next_cursor = None
+    if len(products) == limit:
+        last = products[-1]
+        next_cursor = f"{last.score!r}:{last.id}"
+    return products, next_cursor
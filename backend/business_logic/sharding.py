@@ -0,0 +1,410 @@
+"""
+Optional restaurant-based sharding.
+
+POSTGRES_SHARDS adds extra database aliases (settings.DATABASE_SHARDS). Every
+shard carries the full schema (`migrate --database <alias>`), but only holds
+the data of the restaurants mapped to it in RestaurantShard: products, end
+users, orders and everything hanging off them (including drone telemetry),
+notifications, archived orders and outbox events. Users, sessions,
+AuthUserRestaurant, the shard map and the Restaurant rows themselves stay on
+"default"; each shard keeps a copy of its restaurants' Restaurant rows so
+foreign keys hold.
+
+Per request, ShardMiddleware looks up the user's shard (one query, only when
+sharding is configured) and activates it; ShardRouter sends the sharded models
+to the active alias and @shard_atomic opens the view's transaction there.
+New orders are the exception: they go to the shard of the restaurant whose
+products were ordered (order_shard), which need not be the user's.
+Without POSTGRES_SHARDS all of this collapses to the default database.
+"""
+import tempfile
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.http import JsonResponse
+
+from business_logic.models import (
+    ArchivedOrder,
+    Delivery,
+    DeliveryTrackSegment,
+    EndUser,
+    Notification,
+    Order,
+    OrderAnswer,
+    OrderProduct,
+    OutboxEvent,
+    Preparation,
+    PreparationStep,
+    Product,
+    Restaurant,
+    RestaurantShard,
+)
+
+SHARDED_MODELS = {
+    EndUser,
+    Product,
+    Order,
+    OrderProduct,
+    OrderAnswer,
+    Preparation,
+    PreparationStep,
+    Delivery,
+    DeliveryTrackSegment,
+    Notification,
+    ArchivedOrder,
+    OutboxEvent,
+}
+
+# Each shard hands out ids from its own block so rows keep their ids when a
+# restaurant is moved between shards.
+SHARD_ID_BLOCK = 2 ** 48
+
+_current_shard = ContextVar("current_shard", default=DEFAULT_DB_ALIAS)
+
+
+def sharding_enabled():
+    return bool(settings.DATABASE_SHARDS)
+
+
+def shard_aliases():
+    return [DEFAULT_DB_ALIAS, *settings.DATABASE_SHARDS]
+
+
+def current_shard():
+    return _current_shard.get()
+
+
+@contextmanager
+def use_shard(alias):
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def shard_for_restaurant(restaurant_id):
+    if not sharding_enabled():
+        return DEFAULT_DB_ALIAS
+    alias = RestaurantShard.objects.filter(restaurant_id=restaurant_id).values_list("alias", flat=True).first()
+    return alias or DEFAULT_DB_ALIAS
+
+
+def order_shard(product_ids):
+    """
+    (alias, is_moving) of the shard an order for these products belongs on: that
+    of their restaurant, which need not be the ordering user's. The products are
+    looked up on the active shard first, then on the others. Raises ValueError
+    when they belong to restaurants on different shards.
+    """
+    if not sharding_enabled():
+        return DEFAULT_DB_ALIAS, False
+    missing = set(product_ids)
+    restaurant_ids = set()
+    for alias in sorted(shard_aliases(), key=lambda a: a != current_shard()):
+        for product_id, restaurant_id in Product.objects.using(alias).filter(id__in=missing).values_list("id", "restaurant_id"):
+            missing.discard(product_id)
+            restaurant_ids.add(restaurant_id)
+        if not missing:
+            break
+    if not restaurant_ids:
+        return current_shard(), False  # unknown products; the caller reports them
+    mapped = {
+        restaurant_id: (alias, is_moving)
+        for restaurant_id, alias, is_moving in
+        RestaurantShard.objects.filter(restaurant_id__in=restaurant_ids).values_list("restaurant_id", "alias", "is_moving")
+    }
+    states = {mapped.get(rid, (DEFAULT_DB_ALIAS, False)) for rid in restaurant_ids}
+    if len({alias for alias, _ in states}) > 1:
+        raise ValueError("An order's products must come from restaurants on the same shard")
+    return next(iter(states))[0], any(is_moving for _, is_moving in states)
+
+
+def moving_response():
+    """503 for writes to a restaurant while move_restaurant has paused them."""
+    response = JsonResponse({"error": "Restaurant is being moved, try again shortly"}, status=503)
+    response["Retry-After"] = "2"
+    return response
+
+
+def shard_atomic(view_func):
+    """Like @transaction.atomic, but on the shard activated for this request."""
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        with transaction.atomic(using=current_shard()):
+            return view_func(request, *args, **kwargs)
+    return _wrapped
+
+
+def copy_restaurant_row(restaurant, alias):
+    """Upsert the reference copy of a Restaurant on a shard."""
+    if alias == DEFAULT_DB_ALIAS:
+        return
+    Restaurant.objects.using(alias).bulk_create(
+        [Restaurant(
+            id=restaurant.id,
+            name=restaurant.name,
+            address=restaurant.address,
+            kitchen_stations=restaurant.kitchen_stations,
+            latitude=restaurant.latitude,
+            longitude=restaurant.longitude,
+            delivery_radius_m=restaurant.delivery_radius_m,
+            delivery_zone=restaurant.delivery_zone,
+            created_at=restaurant.created_at,
+        )],
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=["name", "address", "kitchen_stations", "latitude", "longitude", "delivery_radius_m", "delivery_zone"],
+    )
+
+
+class ShardRouter:
+    def db_for_read(self, model, **hints):
+        if model in SHARDED_MODELS:
+            return current_shard()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model in SHARDED_MODELS:
+            return current_shard()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Shards carry the full schema
+        return None
+
+
+class ShardMiddleware:
+    """Activate the logged-in user's shard; pause writes while their restaurant is being moved."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sharding_enabled() or not request.user.is_authenticated:
+            return self.get_response(request)
+
+        row = (
+            RestaurantShard.objects
+            .filter(restaurant__auth_user_restaurants__user=request.user)
+            .values_list("alias", "is_moving")
+            .first()
+        )
+        alias, is_moving = row or (DEFAULT_DB_ALIAS, False)
+        if is_moving and request.method not in ("GET", "HEAD", "OPTIONS"):
+            return moving_response()
+        with use_shard(alias):
+            return self.get_response(request)
+
+
+# --- Rebalancing -------------------------------------------------------------
+
+# Tables copied when a restaurant moves, in foreign-key order. Each entry maps to
+# a filter that selects the restaurant's rows given a subquery of its order ids.
+MOVE_PLAN = [
+    (Product, lambda rid, orders: Q(restaurant_id=rid)),
+    (EndUser, lambda rid, orders: Q(id__in=orders.values("end_user_id"))),
+    (Order, lambda rid, orders: Q(id__in=orders)),
+    (OrderProduct, lambda rid, orders: Q(order_id__in=orders)),
+    (OrderAnswer, lambda rid, orders: Q(order_id__in=orders)),
+    (Preparation, lambda rid, orders: Q(order_answer__order_id__in=orders)),
+    (PreparationStep, lambda rid, orders: Q(preparation__order_answer__order_id__in=orders)),
+    (Delivery, lambda rid, orders: Q(order_id__in=orders)),
+    (DeliveryTrackSegment, lambda rid, orders: Q(delivery__order_id__in=orders)),
+    (Notification, lambda rid, orders: Q(restaurant_id=rid)),
+    (ArchivedOrder, lambda rid, orders: Q(restaurant_id=rid) | Q(restaurant_id__isnull=True)),
+]
+MOVE_DELETE_CHUNK = 5000
+# Upsert target per table in the final pass; ArchivedOrder is identified by the order it archives
+MOVE_CONFLICT_COLUMN = {ArchivedOrder: "order_id"}
+
+
+def _restaurant_orders(alias, restaurant_id):
+    # Orders without lines belong to no restaurant; they go with whichever one
+    # moves first instead of staying behind on a shard that may be drained
+    return (
+        Order.objects.using(alias)
+        .filter(Q(order_products__product__restaurant_id=restaurant_id) | Q(order_products__isnull=True))
+        .values("id")
+        .distinct()
+    )
+
+
+def _shared_orders(alias, restaurant_id):
+    """Ids of the restaurant's orders that also have lines from other restaurants."""
+    lines = OrderProduct.objects.filter(order=OuterRef("pk"))
+    return list(
+        Order.objects.using(alias)
+        .filter(Exists(lines.filter(product__restaurant_id=restaurant_id)))
+        .filter(Exists(lines.exclude(product__restaurant_id=restaurant_id)))
+        .values_list("id", flat=True)[:10]
+    )
+
+
+def _check_movable(restaurant, alias):
+    shared = _shared_orders(alias, restaurant.id)
+    if shared:
+        # Their other lines point at products that stay behind, and deleting the
+        # source copy would take the order away from the other restaurant too
+        raise ValueError(
+            f"{restaurant} has orders with other restaurants' products (e.g. {', '.join(map(str, shared))}); "
+            "they cannot be split between shards"
+        )
+
+
+def _copy_table(model, qs, source, target, upsert):
+    """
+    Stream the rows selected by `qs` from `source` to `target` with COPY, going
+    through a temp table so rows that already exist are skipped (first pass)
+    or overwritten (final pass). Primary keys are preserved.
+    """
+    table = model._meta.db_table
+    fields = model._meta.concrete_fields
+    cols = ", ".join(connections[target].ops.quote_name(f.column) for f in fields)
+    sql, params = qs.values_list(*[f.attname for f in fields]).query.sql_with_params()
+
+    with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as buf:
+        with connections[source].cursor() as cur:
+            select = cur.mogrify(sql, params).decode()
+            cur.copy_expert(f"COPY ({select}) TO STDOUT", buf)
+        buf.seek(0)
+        if upsert:
+            key = MOVE_CONFLICT_COLUMN.get(model, "id")
+            updates = ", ".join(
+                f"{connections[target].ops.quote_name(f.column)} = EXCLUDED.{connections[target].ops.quote_name(f.column)}"
+                for f in fields if not f.primary_key and f.column != key
+            )
+            conflict = f"ON CONFLICT ({key}) DO UPDATE SET {updates}"
+        else:
+            conflict = "ON CONFLICT DO NOTHING"  # any unique constraint, not only the id
+        with connections[target].cursor() as cur:
+            cur.execute(f'CREATE TEMP TABLE "_move_{table}" (LIKE "{table}") ON COMMIT DROP')
+            cur.copy_expert(f'COPY "_move_{table}" ({cols}) FROM STDIN', buf)
+            cur.execute(f'INSERT INTO "{table}" ({cols}) SELECT {cols} FROM "_move_{table}" {conflict}')
+            return cur.rowcount
+
+
+def _copy_restaurant(restaurant, source, target, upsert, log):
+    orders = _restaurant_orders(source, restaurant.id)
+    with transaction.atomic(using=target):
+        for model, where in MOVE_PLAN:
+            qs = model.objects.using(source).filter(where(restaurant.id, orders))
+            n = _copy_table(model, qs, source, target, upsert)
+            log(f"  {model.__name__}: {n} rows")
+
+
+def _move_pending_events(order_ids, source, target):
+    # Events not yet handled on the source must run on the target instead
+    pending = [
+        e for e in OutboxEvent.objects.using(source).filter(processed_at__isnull=True)
+        if e.payload.get("order_id") in order_ids
+    ]
+    if pending:
+        OutboxEvent.objects.using(target).bulk_create(pending)
+        OutboxEvent.objects.using(source).filter(id__in=[e.id for e in pending]).delete()
+    return len(pending)
+
+
+def _delete_restaurant(restaurant, order_ids, alias):
+    order_ids = sorted(order_ids)
+    for i in range(0, len(order_ids), MOVE_DELETE_CHUNK):
+        chunk = order_ids[i:i + MOVE_DELETE_CHUNK]
+        with transaction.atomic(using=alias):
+            end_user_ids = list(Order.objects.using(alias).filter(id__in=chunk).values_list("end_user_id", flat=True))
+            # Deleting the EndUser cascades to its orders and everything below them
+            EndUser.objects.using(alias).filter(id__in=end_user_ids).delete()
+    with transaction.atomic(using=alias):
+        Notification.objects.using(alias).filter(restaurant_id=restaurant.id).delete()
+        ArchivedOrder.objects.using(alias).filter(Q(restaurant_id=restaurant.id) | Q(restaurant_id__isnull=True)).delete()
+        Product.objects.using(alias).filter(restaurant_id=restaurant.id).delete()
+        if alias != DEFAULT_DB_ALIAS:
+            # Drop the reference copy; on default the Restaurant row is the real one
+            Restaurant.objects.using(alias).filter(id=restaurant.id).delete()
+
+
+def move_restaurant(restaurant, target, keep_source=False, drain_seconds=2, log=print):
+    """
+    Move a restaurant's data to another shard while it keeps serving:
+      1. bulk copy everything (reads and writes continue on the source),
+      2. pause writes (is_moving -> 503 + Retry-After), wait for in-flight requests,
+      3. copy again, overwriting, to pick up rows created or changed during step 1,
+         and hand over unprocessed outbox events,
+      4. flip the shard map to the target and resume writes,
+      5. delete the restaurant's rows from the source (unless keep_source).
+    Raises ValueError, before anything is copied, when either shard's id
+    sequences were not set up with init_sequences or when some of the
+    restaurant's orders also hold other restaurants' products.
+    """
+    if target not in shard_aliases():
+        raise ValueError(f"Unknown shard: {target}")
+    shard, _ = RestaurantShard.objects.get_or_create(restaurant=restaurant)
+    source = shard.alias
+    if source == target:
+        log(f"{restaurant} is already on {target}")
+        return
+    for alias in (source, target):
+        # Copies keep their ids: without separate id blocks they would collide with unrelated rows
+        stray = uninitialized_sequences(alias)
+        if stray:
+            raise ValueError(f"Id sequences on {alias} are outside its block ({', '.join(stray)}); run init_shard_sequences")
+    _check_movable(restaurant, source)
+
+    copy_restaurant_row(restaurant, target)
+    log(f"Copying {restaurant} from {source} to {target}")
+    _copy_restaurant(restaurant, source, target, upsert=False, log=log)
+
+    RestaurantShard.objects.filter(pk=shard.pk).update(is_moving=True)
+    try:
+        time.sleep(drain_seconds)
+        log("Writes paused; copying changes")
+        _check_movable(restaurant, source)  # orders placed during the first pass
+        _copy_restaurant(restaurant, source, target, upsert=True, log=log)
+        order_ids = set(_restaurant_orders(source, restaurant.id).values_list("id", flat=True))
+        log(f"  moved {_move_pending_events(order_ids, source, target)} pending outbox events")
+        RestaurantShard.objects.filter(pk=shard.pk).update(alias=target, is_moving=False)
+    except Exception:
+        RestaurantShard.objects.filter(pk=shard.pk).update(is_moving=False)
+        raise
+    log(f"{restaurant} now lives on {target}")
+
+    if not keep_source:
+        _delete_restaurant(restaurant, order_ids, source)
+        log(f"Deleted {len(order_ids)} orders and related rows from {source}")
+
+
+def uninitialized_sequences(alias):
+    """Sharded tables on `alias` whose id sequence is outside the alias's block (see init_sequences)."""
+    base = shard_aliases().index(alias) * SHARD_ID_BLOCK
+    stray = []
+    with connections[alias].cursor() as cur:
+        for model in sorted(SHARDED_MODELS, key=lambda m: m._meta.db_table):
+            table = model._meta.db_table
+            cur.execute("SELECT pg_get_serial_sequence(%s, %s)", [table, "id"])
+            cur.execute(f"SELECT last_value FROM {cur.fetchone()[0]}")
+            if not base <= cur.fetchone()[0] < base + SHARD_ID_BLOCK:
+                stray.append(table)
+    return stray
+
+
+def init_sequences(alias, index):
+    """
+    Point the id sequences of the sharded tables on `alias` into its own block
+    [index * SHARD_ID_BLOCK, (index + 1) * SHARD_ID_BLOCK). Safe to re-run.
+    """
+    base = index * SHARD_ID_BLOCK
+    with connections[alias].cursor() as cur:
+        for model in sorted(SHARDED_MODELS, key=lambda m: m._meta.db_table):
+            table = model._meta.db_table
+            cur.execute(
+                f'SELECT setval(pg_get_serial_sequence(%s, %s), '
+                f'(SELECT COALESCE(MAX(id), %s) FROM "{table}" WHERE id >= %s AND id < %s) + 1, false)',
+                [table, "id", base, base, base + SHARD_ID_BLOCK],
+            )
@@ -0,0 +1,225 @@
+"""
+Drone telemetry ingestion and live tracking.
+
+Drones (or the fleet gateway relaying for them) POST batches of points:
+
+  [delivery_id, t_ms, lat, lon, battery_pct, remaining_m]
+
+t_ms is a Unix timestamp in milliseconds; remaining_m is the distance left to
+the drop-off as reported by the drone's navigation, or null. The points of one
+delivery in one batch become a single DeliveryTrackSegment row whose `points`
+column holds fixed-size little-endian records (POINT below, 17 bytes each), so
+a batch costs one INSERT per delivery and a Delivery row is never updated.
+
+The newest point of each delivery, plus a smoothed ground speed, is kept in the
+Django cache ("hot" state) and is what the tracking endpoint serves. If the
+cache has nothing (another process, eviction, restart) it is rebuilt from the
+delivery's newest segment.
+"""
+import struct
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from business_logic.geo import distance_m
+from business_logic.models import Delivery, DeliveryTrackSegment
+from business_logic.sharding import shard_aliases
+
+# ms offset from segment start, lat/lon in 1e-7 degrees, battery %, remaining metres
+POINT = struct.Struct("<IiiBI")
+COORD_SCALE = 10 ** 7
+UNKNOWN_DISTANCE = 0xFFFFFFFF
+MAX_SEGMENT_SPAN_MS = 0xFFFFFFFF
+MAX_ID = 2 ** 63 - 1  # bigint
+
+LATEST_KEY = "telemetry:latest:{}"
+SPEED_WINDOW_MS = 5000  # measure speed over at least this much movement time
+SPEED_SMOOTHING = 0.3  # weight of the newest measurement in the moving average
+MIN_MOVING_SPEED = 1.0  # m/s; below this the drone is hovering/landed and we keep the planned ETA
+
+
+def parse_points(body):
+    """
+    Validate a decoded request body and group its points by delivery.
+    Returns {delivery_id: [(t_ms, lat, lon, battery, remaining_m|None), ...]} sorted by time.
+    Raises ValueError naming the first bad point.
+    """
+    if not isinstance(body, dict) or not isinstance(body.get("points"), list):
+        raise ValueError('Body must be {"points": [[delivery_id, t_ms, lat, lon, battery_pct, remaining_m], ...]}')
+    points = body["points"]
+    if len(points) > settings.TELEMETRY_MAX_POINTS:
+        raise ValueError(f"At most {settings.TELEMETRY_MAX_POINTS} points per request")
+
+    # Bounded so that _from_ms() cannot overflow and ids fit the bigint lookup
+    now_ms = int(time.time() * 1000)
+    min_t, max_t = now_ms - settings.TELEMETRY_MAX_CLOCK_SKEW_SECONDS * 1000, now_ms + settings.TELEMETRY_MAX_CLOCK_SKEW_SECONDS * 1000
+    by_delivery = {}
+    for i, p in enumerate(points):
+        try:
+            delivery_id, t_ms, lat, lon, battery, *rest = p
+            remaining = rest[0] if rest else None
+            if (
+                type(delivery_id) is not int or not 0 < delivery_id <= MAX_ID
+                or type(t_ms) is not int or not min_t <= t_ms <= max_t
+                or not -90 <= lat <= 90 or not -180 <= lon <= 180
+                or not 0 <= battery <= 100
+                or (remaining is not None and not 0 <= remaining < UNKNOWN_DISTANCE)
+                or len(rest) > 1
+            ):
+                raise ValueError
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid point at index {i}")
+        by_delivery.setdefault(delivery_id, []).append(
+            (t_ms, float(lat), float(lon), int(battery), None if remaining is None else int(remaining))
+        )
+
+    for delivery_id, pts in by_delivery.items():
+        pts.sort(key=lambda p: p[0])
+        if pts[-1][0] - pts[0][0] > MAX_SEGMENT_SPAN_MS:
+            raise ValueError(f"Points for delivery {delivery_id} span more than 49 days")
+    return by_delivery
+
+
+def pack_points(points):
+    t0 = points[0][0]
+    pack = POINT.pack
+    return b"".join(
+        pack(
+            t - t0,
+            round(lat * COORD_SCALE),
+            round(lon * COORD_SCALE),
+            battery,
+            UNKNOWN_DISTANCE if remaining is None else remaining,
+        )
+        for t, lat, lon, battery, remaining in points
+    )
+
+
+def unpack_points(segment):
+    t0 = round(segment.started_at.timestamp() * 1000)
+    return [
+        (t0 + dt, lat / COORD_SCALE, lon / COORD_SCALE, battery, None if remaining == UNKNOWN_DISTANCE else remaining)
+        for dt, lat, lon, battery, remaining in POINT.iter_unpack(bytes(segment.points))
+    ]
+
+
+def _from_ms(t_ms):
+    return datetime.fromtimestamp(t_ms / 1000, tz=dt_timezone.utc)
+
+
+def _latest_state(points, previous=None):
+    """Hot state for a delivery from its newest points (sorted) and the previously cached state."""
+    t, lat, lon, battery, remaining = points[-1]
+    reference = None
+    for p in reversed(points[:-1]):
+        if t - p[0] >= SPEED_WINDOW_MS:
+            reference = p
+            break
+    if reference is None and previous is not None and previous["t"] < t:
+        reference = (previous["t"], previous["lat"], previous["lon"])
+    if reference is None and len(points) > 1 and points[0][0] < t:
+        reference = points[0]
+
+    speed = previous["speed_mps"] if previous else None
+    if reference is not None:
+        measured = distance_m(reference[1], reference[2], lat, lon) / ((t - reference[0]) / 1000)
+        speed = measured if speed is None else SPEED_SMOOTHING * measured + (1 - SPEED_SMOOTHING) * speed
+    return {"t": t, "lat": lat, "lon": lon, "battery": battery, "remaining_m": remaining, "speed_mps": speed}
+
+
+def _existing_deliveries(delivery_ids):
+    """Map each existing delivery id to the database alias that holds it."""
+    found = {}
+    remaining = set(delivery_ids)
+    for alias in shard_aliases():
+        for delivery_id in Delivery.objects.using(alias).filter(id__in=remaining).values_list("id", flat=True):
+            found[delivery_id] = alias
+        remaining.difference_update(found)
+        if not remaining:
+            break
+    return found
+
+
+def ingest(by_delivery):
+    """
+    Store parsed points (see parse_points) and refresh the hot state.
+    Returns (points stored, ids of deliveries that do not exist).
+    """
+    aliases = _existing_deliveries(by_delivery)
+    segments = {}
+    for delivery_id, pts in by_delivery.items():
+        if delivery_id not in aliases:
+            continue
+        segments.setdefault(aliases[delivery_id], []).append(DeliveryTrackSegment(
+            delivery_id=delivery_id,
+            started_at=_from_ms(pts[0][0]),
+            ended_at=_from_ms(pts[-1][0]),
+            point_count=len(pts),
+            points=pack_points(pts),
+        ))
+    for alias, rows in segments.items():
+        DeliveryTrackSegment.objects.using(alias).bulk_create(rows)
+
+    keys = {LATEST_KEY.format(delivery_id): delivery_id for delivery_id in aliases}
+    cached = cache.get_many(keys)
+    updates = {}
+    for key, delivery_id in keys.items():
+        pts = by_delivery[delivery_id]
+        previous = cached.get(key)
+        if previous is not None and previous["t"] >= pts[-1][0]:
+            continue  # a late batch; the cache already has something newer
+        updates[key] = _latest_state(pts, previous)
+    if updates:
+        cache.set_many(updates, timeout=settings.TELEMETRY_LATEST_TTL_SECONDS)
+
+    unknown = sorted(set(by_delivery) - aliases.keys())
+    return sum(len(by_delivery[d]) for d in aliases), unknown
+
+
+def latest_state(delivery_id):
+    """Newest known position of a delivery, from the cache or else its newest segment; None if no telemetry."""
+    key = LATEST_KEY.format(delivery_id)
+    state = cache.get(key)
+    if state is not None:
+        return state
+    segment = DeliveryTrackSegment.objects.filter(delivery_id=delivery_id).order_by("-ended_at").first()
+    if segment is None:
+        return None
+    state = _latest_state(unpack_points(segment))
+    cache.add(key, state, timeout=settings.TELEMETRY_LATEST_TTL_SECONDS)
+    return state
+
+
+def tracking(delivery):
+    """Current position and live ETA for a Delivery."""
+    state = latest_state(delivery.id)
+    data = {
+        "delivery_id": delivery.id,
+        "estimated_pickup_time": delivery.estimated_pickup_time.isoformat(),
+        "estimated_delivery_time": delivery.estimated_delivery_time.isoformat(),
+        "position": None,
+        "eta": delivery.estimated_delivery_time.isoformat(),
+        "eta_source": "estimate",
+    }
+    if state is None:
+        return data
+
+    seen_at = _from_ms(state["t"])
+    data["position"] = {
+        "lat": state["lat"],
+        "lon": state["lon"],
+        "battery_pct": state["battery"],
+        "remaining_m": state["remaining_m"],
+        "speed_mps": None if state["speed_mps"] is None else round(state["speed_mps"], 1),
+        "at": seen_at.isoformat(),
+        "stale": (datetime.now(dt_timezone.utc) - seen_at).total_seconds() > settings.TELEMETRY_STALE_SECONDS,
+    }
+    remaining, speed = state["remaining_m"], state["speed_mps"]
+    if remaining == 0:
+        data["eta"], data["eta_source"] = seen_at.isoformat(), "telemetry"
+    elif remaining is not None and speed is not None and speed >= MIN_MOVING_SPEED:
+        data["eta"] = (seen_at + timedelta(seconds=remaining / speed)).isoformat()
+        data["eta_source"] = "telemetry"
+    return data
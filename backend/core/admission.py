@@ -0,0 +1,204 @@
+"""
+Admission control for the API.
+
+Every /api/ view belongs to a lane: "poll" (dashboard refreshes), "kitchen"
+(order decisions and preparation steps) or "default". Mark views with
+@poll_lane / @kitchen_lane, or @admission_exempt for machine endpoints that
+authenticate separately.
+
+Two token buckets (GCRA, one timestamp per key in the Django cache) limit each
+lane per session and per restaurant; over the limit a request gets 429 with
+Retry-After. The cache must be shared between workers (REDIS_URL) for the
+limits to be global. A get/set race between workers can let the odd extra
+request through, which is fine here.
+
+On top of that each worker tracks load as moving averages of SQL statement
+latency and of the time requests waited in front of gunicorn (X-Request-Start,
+set by nginx). Pressure is the worse of the two relative to its threshold.
+Under pressure poll limits tighten and poll responses carry a longer
+X-Poll-Interval; beyond ADMISSION_SHED_PRESSURE polls are refused with 503,
+then default-lane requests at 1.5x that. Kitchen writes are never shed for
+load: they are rare, cheap and the whole point of the dashboard.
+"""
+import math
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import JsonResponse
+
+from business_logic.models import AuthUserRestaurant
+
+POLL = "poll"
+KITCHEN = "kitchen"
+DEFAULT = "default"
+EXEMPT = "exempt"
+
+SESSION_RESTAURANT_KEY = "_admission_restaurant_id"
+
+
+def _lane(name):
+    def decorator(view_func):
+        view_func.admission_lane = name
+        return view_func
+    return decorator
+
+
+poll_lane = _lane(POLL)
+kitchen_lane = _lane(KITCHEN)
+admission_exempt = _lane(EXEMPT)
+
+
+class _Ewma:
+    """
+    Moving average over samples that also decays towards 0 while no samples
+    arrive, so shedding stops once the traffic that was being measured is gone.
+    """
+
+    def __init__(self, alpha, tau):
+        self.alpha = alpha
+        self.tau = tau
+        self.value = 0.0
+        self.at = time.monotonic()
+
+    def add(self, sample):
+        self.value = self.get() * (1 - self.alpha) + sample * self.alpha
+        self.at = time.monotonic()
+
+    def get(self):
+        return self.value * math.exp(-(time.monotonic() - self.at) / self.tau)
+
+
+_db_ms = _Ewma(0.05, settings.ADMISSION_WINDOW_SECONDS)  # per SQL statement
+_queue_ms = _Ewma(0.2, settings.ADMISSION_WINDOW_SECONDS)  # per request
+
+
+def pressure():
+    """Load relative to the thresholds; below 1 means healthy."""
+    return max(
+        _db_ms.get() / settings.ADMISSION_DB_LATENCY_MS,
+        _queue_ms.get() / settings.ADMISSION_QUEUE_MS,
+    )
+
+
+def poll_interval(p=None):
+    """Seconds a well-behaved client should wait between polls at the current load."""
+    p = pressure() if p is None else p
+    return settings.ADMISSION_POLL_INTERVAL_SECONDS * min(max(p, 1.0), settings.ADMISSION_MAX_BACKOFF)
+
+
+def _record_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        _db_ms.add((time.perf_counter() - start) * 1000)
+
+
+def _record_queue_wait(request):
+    # nginx: proxy_set_header X-Request-Start "t=${msec}";
+    raw = request.headers.get("X-Request-Start", "")
+    try:
+        started = float(raw.removeprefix("t="))
+    except ValueError:
+        return
+    waited_ms = (time.time() - started) * 1000
+    # The header can come from a client or a skewed clock: drop what no real queue produces
+    if 0 <= waited_ms <= settings.ADMISSION_MAX_QUEUE_SAMPLE_MS:
+        _queue_ms.add(waited_ms)
+
+
+def _take(buckets):
+    """
+    Take one token from each (key, rate per second, burst) bucket.
+    Returns 0 if admitted, else the seconds until the fullest bucket has a token.
+    """
+    now = time.time()
+    stored = cache.get_many([key for key, _, _ in buckets])
+    updates = {}
+    for key, rate, burst in buckets:
+        interval = 1 / rate
+        tat = max(stored.get(key, now), now) + interval  # theoretical arrival time
+        wait = tat - now - burst * interval
+        if wait > 0:
+            return wait
+        updates[key] = tat
+    cache.set_many(updates, timeout=math.ceil(max(burst / rate for _, rate, burst in buckets)) + 1)
+    return 0
+
+
+def session_restaurant_id(request):
+    """
+    The logged-in user's restaurant id, or None. Remembered in the session so it
+    costs no query after the first request; "no restaurant" is not remembered,
+    so a user linked to one later is picked up without logging in again.
+    """
+    restaurant_id = request.session.get(SESSION_RESTAURANT_KEY)
+    if restaurant_id is None:
+        restaurant_id = AuthUserRestaurant.objects.filter(user=request.user).values_list("restaurant_id", flat=True).first()
+        if restaurant_id is not None:
+            request.session[SESSION_RESTAURANT_KEY] = restaurant_id
+    return restaurant_id
+
+
+def _client_key(request):
+    if request.session.session_key:
+        return f"s:{request.session.session_key}"
+    return f"ip:{request.headers.get('X-Real-IP') or request.META.get('REMOTE_ADDR', '')}"
+
+
+def _refuse(status, message, retry_after, lane):
+    response = JsonResponse({"error": message}, status=status)
+    response["Retry-After"] = str(max(math.ceil(retry_after), 1))
+    if lane == POLL:
+        response["X-Poll-Interval"] = f"{max(retry_after, poll_interval()):.1f}"
+    return response
+
+
+class AdmissionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.ADMISSION_ENABLED or not request.path.startswith("/api/"):
+            return self.get_response(request)
+        _record_queue_wait(request)
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(_record_query))
+            response = self.get_response(request)
+        if getattr(request, "admission_lane", None) == POLL and "X-Poll-Interval" not in response:
+            response["X-Poll-Interval"] = f"{poll_interval():.1f}"
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.ADMISSION_ENABLED or not request.path.startswith("/api/"):
+            return None
+        lane = getattr(view_func, "admission_lane", DEFAULT)
+        if lane == EXEMPT:
+            return None
+        request.admission_lane = lane
+
+        p = pressure()
+        if lane == POLL and p >= settings.ADMISSION_SHED_PRESSURE:
+            return _refuse(503, "Server busy, poll again later", poll_interval(p), lane)
+        if lane == DEFAULT and p >= settings.ADMISSION_SHED_PRESSURE * 1.5:
+            return _refuse(503, "Server busy, try again shortly", settings.ADMISSION_POLL_INTERVAL_SECONDS, lane)
+
+        rate, burst = settings.ADMISSION_SESSION_RATES[lane]
+        restaurant_rate, restaurant_burst = settings.ADMISSION_RESTAURANT_RATES[lane]
+        if lane == POLL and p > 1:
+            # Slow pollers down in step with the X-Poll-Interval hint
+            rate, restaurant_rate = rate / p, restaurant_rate / p
+        buckets = [(f"admission:{lane}:{_client_key(request)}", rate, burst)]
+        if request.user.is_authenticated:
+            restaurant_id = session_restaurant_id(request)
+            if restaurant_id is not None:
+                buckets.append((f"admission:{lane}:r:{restaurant_id}", restaurant_rate, restaurant_burst))
+
+        wait = _take(buckets)
+        if wait:
+            return _refuse(429, "Too many requests", wait, lane)
+        return None
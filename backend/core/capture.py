@@ -0,0 +1,240 @@
+"""
+Traffic capture for replay.
+
+Enabled by setting CAPTURE_DIR. Every /api/ request (minus CAPTURE_EXCLUDE)
+from a sampled client is appended as one compact NDJSON line to
+capture-<start>-<pid>.ndjson in that directory:
+
+  {"t": 1760000000123.4, "m": "POST", "p": "/api/order_created/", "q": "",
+   "e": "api/order_created/", "b": {...}, "u": 7, "r": 3, "s": 201, "ms": 12.3, "o": 981}
+
+  t   wall-clock start in epoch milliseconds     e   URL route (endpoint for reports)
+  b   request body (JSON only, sanitized)        u/r user id and that user's restaurant
+  s   response status, ms handling time          o   id of the order a request created
+  ref order id behind a status token; the token itself is not stored
+
+Sanitizing replaces the values of SENSITIVE_KEYS, rounds coordinates
+(COORDINATE_KEYS, e.g. a drop-off point) to COORDINATE_DECIMALS, about 100 m,
+and drops bodies that are not JSON or are larger than CAPTURE_MAX_BODY_BYTES
+("bn" keeps their size).
+Sampling is per client (user id, else session; status polls per token), not
+per request, so that a sampled tablet's stream is complete. Its accept and
+step clicks can then be replayed after the orders they refer to. Each worker
+writes its own file and starts a new one after CAPTURE_MAX_BYTES. Only the
+newest CAPTURE_MAX_FILES files are kept; the file a live worker may still be
+writing (its newest) is never removed. Without CAPTURE_DIR the middleware
+removes itself from the stack at startup.
+
+business_logic/management/commands/replay_traffic.py replays the files (core/replay.py).
+"""
+import hashlib
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from business_logic.export import read_ndjson
+from business_logic.order_status import order_id_from_token
+from core.admission import session_restaurant_id
+
+logger = logging.getLogger(__name__)
+
+SENSITIVE_KEYS = {
+    "password", "password1", "password2", "old_password", "new_password1", "new_password2",
+    "email", "token", "status_token", "csrfmiddlewaretoken",
+}
+REDACTED = "***"
+# A drop-off point is a customer's address; keep only the neighbourhood
+COORDINATE_KEYS = {"lat", "lon"}
+COORDINATE_DECIMALS = 3
+STATUS_PREFIX = "/api/status/"
+
+
+def _clean(key, value):
+    key = key.lower()
+    if key in SENSITIVE_KEYS:
+        return REDACTED
+    if key in COORDINATE_KEYS:
+        if isinstance(value, str):
+            try:
+                return str(round(float(value), COORDINATE_DECIMALS))
+            except ValueError:
+                return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return round(value, COORDINATE_DECIMALS)
+    return sanitize(value)
+
+
+def sanitize(value):
+    """
+    `value` with every SENSITIVE_KEYS entry, at any depth, replaced by REDACTED
+    and every COORDINATE_KEYS entry rounded to COORDINATE_DECIMALS.
+    """
+    if isinstance(value, dict):
+        return {k: _clean(k, v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [sanitize(v) for v in value]
+    return value
+
+
+def sampled(client_key, rate):
+    """Stable per-client decision, so every worker samples the same clients."""
+    if rate >= 1:
+        return True
+    digest = hashlib.blake2b(client_key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 < rate
+
+
+class CaptureWriter:
+    """Append-only NDJSON file per process, rotated by size; safe to share between threads."""
+
+    def __init__(self, directory, max_bytes, max_files):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._pid = None
+        self._size = 0
+
+    def _open(self):
+        name = f"capture-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.ndjson"
+        self._path = self.dir / name
+        self._file = open(self._path, "a", encoding="utf-8", buffering=1)
+        self._pid = os.getpid()
+        self._size = 0
+        self._prune()
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            # A forked worker must not keep writing to its parent's file
+            if self._file is None or self._pid != os.getpid() or self._size >= self.max_bytes:
+                if self._file is not None and self._pid == os.getpid():
+                    self._file.close()
+                self._open()
+            self._file.write(line)
+            self._size += len(line)
+
+    def _prune(self):
+        files = []
+        for f in self.dir.glob("capture-*.ndjson*"):
+            try:
+                files.append((f.stat().st_mtime, f))
+            except FileNotFoundError:
+                pass  # pruned by another worker
+        files.sort()
+        # A worker's newest file may still be open; older ones it has rotated away from
+        newest = {}
+        for _, f in files:
+            newest[_file_pid(f)] = f
+        in_use = {f for pid, f in newest.items() if pid is not None and _alive(pid)} | {self._path}
+        closed = [f for _, f in files if f not in in_use]
+        for old in closed[:max(len(files) - self.max_files, 0)]:
+            old.unlink(missing_ok=True)
+
+
+def _file_pid(path):
+    """The pid in capture-<start>-<pid>.ndjson, or None for a name not written by CaptureWriter."""
+    try:
+        return int(path.name.split(".")[0].rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+
+class CaptureMiddleware:
+    def __init__(self, get_response):
+        if not settings.CAPTURE_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.writer = CaptureWriter(settings.CAPTURE_DIR, settings.CAPTURE_MAX_BYTES, settings.CAPTURE_MAX_FILES)
+        self.exclude = tuple(settings.CAPTURE_EXCLUDE)
+
+    def _client(self, request):
+        if request.path.startswith(STATUS_PREFIX):
+            return request.path  # customers polling one order; leaves their session alone
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"u:{user.id}"
+        return f"s:{request.session.session_key or request.META.get('REMOTE_ADDR', '')}"
+
+    def __call__(self, request):
+        path = request.path
+        if (
+            not path.startswith("/api/") or path.startswith(self.exclude)
+            or not sampled(self._client(request), settings.CAPTURE_SAMPLE_RATE)
+        ):
+            return self.get_response(request)
+
+        record = {"t": round(time.time() * 1000, 1), "m": request.method, "p": path, "q": request.META.get("QUERY_STRING", "")}
+        self._body(request, record)  # read before the view consumes the stream
+        start = time.perf_counter()
+        response = self.get_response(request)
+        record["ms"] = round((time.perf_counter() - start) * 1000, 2)
+        try:
+            self._finish(request, response, record)
+            self.writer.write(record)
+        except Exception:
+            logger.exception("Could not capture request")
+        return response
+
+    def _body(self, request, record):
+        if request.method in ("GET", "HEAD"):
+            return
+        record["b"] = None
+        try:
+            size = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            size = 0
+        if size and size <= settings.CAPTURE_MAX_BODY_BYTES and request.content_type == "application/json":
+            try:
+                record["b"] = sanitize(json.loads(request.body))
+            except ValueError:
+                pass
+        if record["b"] is None and size:
+            record["bn"] = size
+
+    def _finish(self, request, response, record):
+        match = getattr(request, "resolver_match", None)
+        record["e"] = match.route if match is not None else None
+        record["s"] = response.status_code
+        if record["q"]:
+            record["q"] = urlencode([(k, _clean(k, v)) for k, v in parse_qsl(record["q"])])
+        if record["p"].startswith(STATUS_PREFIX):
+            # The token is the customer's credential: keep the order it points at instead
+            record["ref"] = order_id_from_token(record["p"][len(STATUS_PREFIX):].rstrip("/"))
+            record["p"] = STATUS_PREFIX
+            return
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            record["u"] = user.id
+            record["r"] = session_restaurant_id(request)
+        if record["e"] == "api/order_created/" and response.status_code == 201:
+            record["o"] = json.loads(response.content)["order"]["id"]
+
+
+def read_capture(paths):
+    """Records from capture files (or directories of them), merged in start-time order."""
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob("capture-*.ndjson*")) if path.is_dir() else [path])
+    return heapq.merge(*(read_ndjson(str(f)) for f in files), key=lambda r: r["t"])
@@ -0,0 +1,91 @@
+"""
+Optional read-replica routing.
+
+When POSTGRES_REPLICA_HOST is set, settings add a "replica" database alias and
+ReplicaRouter. Views wrapped in @replica_reads then serve GET/HEAD requests
+from the replica; everything else (and anything inside a transaction) stays on
+the primary.
+
+Read-your-writes: after any unsafe request (POST/PATCH/...) ReplicaPinMiddleware
+sets a short-lived cookie, and while it is valid that browser's reads go to the
+primary, so a worker never sees a dashboard that is missing the click they just
+made because the replica is lagging behind.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = "replica"
+PIN_COOKIE = "db_pin_primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_use_replica = ContextVar("use_replica", default=False)
+
+
+def replica_enabled():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _pinned_to_primary(request):
+    try:
+        return int(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def replica_reads(view_func):
+    """Serve this (read-only) view from the replica unless the client was just pinned to the primary."""
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        if not replica_enabled() or request.method not in ("GET", "HEAD") or _pinned_to_primary(request):
+            return view_func(request, *args, **kwargs)
+        token = _use_replica.set(True)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return _wrapped
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Reads inside a transaction must see that transaction's writes
+        if _use_replica.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication; other aliases (shards) are not ours to decide
+        if db == REPLICA_ALIAS:
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Pin a client's reads to the primary for REPLICA_PIN_SECONDS after it writes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if replica_enabled() and request.method not in SAFE_METHODS:
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                PIN_COOKIE,
+                str(int(time.time()) + seconds),
+                max_age=seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,207 @@
+"""
+Content-negotiated, compressed responses for the dashboard polls.
+
+GET /api/orders/ and GET /api/notifications/ are polled every second per tab.
+payload_response() picks the representation from the request headers.
+
+Accept chooses the layout:
+  - application/json (default, unchanged): one object per order, ISO timestamps;
+  - application/vnd.drone.columnar+json: one array per field, timestamps as
+    epoch milliseconds, product names sent once in a dictionary and referenced
+    by index (see table() and Dictionary);
+  - application/msgpack: the columnar layout as MessagePack (needs `msgpack`).
+
+Accept-Encoding chooses br (needs `brotli`) or gzip. Bodies smaller than
+PAYLOAD_COMPRESS_MIN_BYTES go out uncompressed.
+
+Every response carries a strong ETag: a digest of the encoded body, suffixed
+per content encoding. A poll whose If-None-Match still matches gets a 304.
+Compression is the expensive part of a poll, so the compressed body is kept
+in the shared cache next to the ETag it was made from, one entry per
+restaurant, view, layout and encoding. While the payload does not change,
+repeated polls from any worker reuse those bytes instead of compressing
+again.
+"""
+import gzip
+import hashlib
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import msgpack
+except ImportError:  # optional: without it, msgpack requests get JSON
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # optional: without it, only gzip is offered
+    brotli = None
+
+JSON = "application/json"
+COLUMNAR = "application/vnd.drone.columnar+json"
+MSGPACK = "application/msgpack"
+
+# Accept value -> (content type, short name used in cache keys)
+FORMATS = {
+    JSON: (JSON, "json"),
+    COLUMNAR: (COLUMNAR, "columnar"),
+    MSGPACK: (MSGPACK, "msgpack"),
+    "application/x-msgpack": (MSGPACK, "msgpack"),
+}
+
+
+def _weighted(header):
+    """[(value, q)] from an Accept-style header, in header order."""
+    result = []
+    for part in header.split(","):
+        value, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if value:
+            result.append((value.lower(), q))
+    return result
+
+
+def negotiate_format(request):
+    """(content type, short name) of the best supported layout; JSON unless asked otherwise."""
+    best, best_q = FORMATS[JSON], 0.0
+    for value, q in _weighted(request.headers.get("Accept", "")):
+        fmt = FORMATS.get(value)
+        if fmt is None or q <= best_q or (fmt[0] == MSGPACK and msgpack is None):
+            continue
+        best, best_q = fmt, q
+    return best
+
+
+def negotiate_encoding(request):
+    """"br", "gzip" or None, by the client's q-values; br wins ties."""
+    accepted = dict(_weighted(request.headers.get("Accept-Encoding", "")))
+    options = [("br", accepted.get("br", 0.0)), ("gzip", accepted.get("gzip", 0.0))]
+    if brotli is None:
+        options = options[1:]
+    name, q = max(options, key=lambda o: o[1])  # max() keeps the first of equal q-values
+    return name if q > 0 else None
+
+
+# --- Columnar layout ----------------------------------------------------------
+
+def epoch_ms(value):
+    return int(value.timestamp() * 1000)
+
+
+def plain(value):
+    """`value` with datetimes as epoch milliseconds, for the compact layouts."""
+    if isinstance(value, datetime):
+        return epoch_ms(value)
+    if isinstance(value, dict):
+        return {k: plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    return value
+
+
+class Dictionary:
+    """Distinct values in first-seen order; rows refer to them by index."""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def ref(self, value):
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+
+def table(records, converters=None):
+    """
+    Columnar form of a list of dicts: {field: [value per record]}. Nested dicts
+    are flattened to "outer.inner" fields, a field missing from a record is null
+    there, and converters maps a field to a function applied to its values.
+    """
+    converters = converters or {}
+    columns = {}
+    for n, record in enumerate(records):
+        flat = {}
+        for key, value in record.items():
+            if isinstance(value, dict) and key not in converters:
+                for inner, v in value.items():
+                    flat[f"{key}.{inner}"] = v
+            else:
+                flat[key] = value
+        for key in flat:
+            if key not in columns:
+                columns[key] = [None] * n
+        for key, column in columns.items():
+            value = flat.get(key)
+            if key in converters and value is not None:
+                value = converters[key](value)
+            column.append(plain(value))
+    return columns
+
+
+# --- Responses ----------------------------------------------------------------
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _encode(name, payload, columnar):
+    if name == "json":
+        return json.dumps(payload, default=_json_default).encode()
+    compact = columnar(payload)
+    if name == "msgpack":
+        return msgpack.packb(compact, use_bin_type=True)
+    return json.dumps(compact, separators=(",", ":")).encode()
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.PAYLOAD_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.PAYLOAD_GZIP_LEVEL, mtime=0)
+
+
+def payload_response(request, payload, columnar, cache_key):
+    """
+    Encode `payload` (dicts, lists, datetimes) as the client asked. `columnar(payload)`
+    returns its columnar layout; `cache_key` names this payload's compressed-body
+    cache entries (e.g. "orders:<restaurant_id>").
+    """
+    content_type, name = negotiate_format(request)
+    body = _encode(name, payload, columnar)
+    encoding = negotiate_encoding(request) if len(body) >= settings.PAYLOAD_COMPRESS_MIN_BYTES else None
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+    if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+        response = HttpResponse(status=304)
+    else:
+        if encoding:
+            key = f"payload:{cache_key}:{name}:{encoding}"
+            cached = cache.get(key)
+            if cached is not None and cached[0] == etag:
+                body = cached[1]
+            else:
+                body = compress(body, encoding)
+                cache.set(key, (etag, body), timeout=settings.PAYLOAD_CACHE_TTL_SECONDS)
+        response = HttpResponse(body, content_type=content_type)
+        if encoding:
+            response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+    return response
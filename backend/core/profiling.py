@@ -0,0 +1,179 @@
+"""
+On-demand request profiler.
+
+Enabled by setting PROFILE_DIR. A request is profiled when it carries a valid
+X-Profile-Token header (mint one with `manage.py profile_token`) or when it
+falls into the PROFILE_SAMPLE_RATE fraction of traffic. For a profiled request
+we sample the handling thread's stack every PROFILE_INTERVAL_MS from a helper
+thread and record every SQL statement with its duration, then write:
+
+  <id>.collapsed.txt  folded stacks ("a;b;c 12"), loadable in speedscope or flamegraph.pl
+  <id>.json           summary: timing, SQL count/time, slowest queries, hottest frames
+
+Only the newest PROFILE_MAX_FILES profiles are kept. Without PROFILE_DIR the
+middleware removes itself from the stack at startup, so it costs nothing.
+"""
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "HTTP_X_PROFILE_TOKEN"
+PROFILE_SALT = "core.profiling"
+
+
+def make_token():
+    return signing.TimestampSigner(salt=PROFILE_SALT).sign("profile")
+
+
+def _valid_token(value):
+    try:
+        signing.TimestampSigner(salt=PROFILE_SALT).unsign(value, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+        return True
+    except signing.BadSignature:
+        return False
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    for marker in ("site-packages/", "backend/"):
+        if marker in filename:
+            filename = filename.split(marker, 1)[1]
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into folded-stack counts."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True, name="request-profiler")
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class SQLRecorder:
+    """connection.execute_wrapper hook recording statement text and duration (not parameters)."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "db": context["connection"].alias,
+                "sql": sql,
+                "ms": round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PROFILE_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.dir = Path(settings.PROFILE_DIR)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _wanted(self, request):
+        token = request.META.get(PROFILE_HEADER)
+        if token:
+            return _valid_token(token)
+        rate = settings.PROFILE_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self._wanted(request):
+            return self.get_response(request)
+
+        sampler = StackSampler(threading.get_ident(), settings.PROFILE_INTERVAL_MS / 1000)
+        recorder = SQLRecorder()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(recorder))
+            sampler.start()
+            start = time.perf_counter()
+            try:
+                response = self.get_response(request)
+            finally:
+                wall_ms = (time.perf_counter() - start) * 1000
+                sampler.stop()
+
+        try:
+            self._write(request, response, wall_ms, sampler.stacks, recorder.queries)
+        except Exception:
+            logger.exception("Could not write request profile")
+        return response
+
+    def _write(self, request, response, wall_ms, stacks, queries):
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self_time = Counter()
+        for folded, n in stacks.items():
+            self_time[folded.rsplit(";", 1)[-1]] += n
+
+        summary = {
+            "id": profile_id,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "wall_ms": round(wall_ms, 3),
+            "samples": sum(stacks.values()),
+            "interval_ms": settings.PROFILE_INTERVAL_MS,
+            "sql_count": len(queries),
+            "sql_ms": round(sum(q["ms"] for q in queries), 3),
+            "slowest_sql": sorted(queries, key=lambda q: q["ms"], reverse=True)[:10],
+            "repeated_sql": [
+                {"sql": sql, "count": n}
+                for sql, n in Counter(q["sql"] for q in queries).most_common(5) if n > 1
+            ],
+            "top_self_frames": [{"frame": f, "samples": n} for f, n in self_time.most_common(15)],
+        }
+        self._atomic_write(f"{profile_id}.collapsed.txt", "".join(f"{k} {v}\n" for k, v in stacks.items()))
+        self._atomic_write(f"{profile_id}.json", json.dumps(summary, indent=2))
+        self._prune()
+        response["X-Profile-Id"] = profile_id
+
+    def _atomic_write(self, name, text):
+        tmp = self.dir / f".{name}.tmp"
+        tmp.write_text(text)
+        os.replace(tmp, self.dir / name)
+
+    def _prune(self):
+        summaries = sorted(self.dir.glob("*.json"), key=lambda f: f.stat().st_mtime)
+        excess = len(summaries) - settings.PROFILE_MAX_FILES
+        for old in summaries[:max(excess, 0)]:
+            old.unlink(missing_ok=True)
+            (self.dir / old.name.replace(".json", ".collapsed.txt")).unlink(missing_ok=True)
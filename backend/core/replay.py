@@ -0,0 +1,280 @@
+"""
+Time-scaled replay of captured traffic (core/capture.py).
+
+Replayer re-issues a capture against this build. A transport sends each
+request: TestClientTransport runs it in-process through Django's test client,
+HttpTransport sends it over HTTP to a running stack. Request i starts
+(t_i - t_0) / speed after the first one. A thread pool sends them, so slow
+responses delay later requests only through the pool size. The report shows
+any such delay as lag.
+
+Causal order is kept in two ways. Requests of one client (a captured user,
+or the customer behind a status token) run one after another, in capture
+order. A request that names an order created earlier in the capture first
+waits for that order_created to be replayed. It then uses the new order's id,
+in `order_id` bodies and /api/orders/<id>/ paths, or its new status token.
+
+Captured users are replayed as local users "replay-<id>", linked to the same
+restaurant id; the restaurant and the products in the captured bodies must
+exist locally (e.g. from a dump or bulk_load_orders). Requests whose body was
+not captured, or whose order cannot be mapped, are skipped and counted.
+
+summarize() turns the results into per-endpoint latency percentiles and error
+counts. compare() puts two summaries (two builds) side by side.
+"""
+import http.cookiejar
+import json
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client
+
+from business_logic.models import AuthUserRestaurant, Restaurant
+from core.capture import STATUS_PREFIX
+
+ORDER_PATH = re.compile(r"^/api/orders/(\d+)/")
+
+Result = namedtuple("Result", ["endpoint", "status", "captured_status", "ms", "lag_ms"])
+
+
+class ReplayUsers:
+    """Local stand-ins for captured users, created on first use; safe to share between threads."""
+
+    def __init__(self, password=None):
+        self.password = password
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, restaurant_id):
+        """The local user replaying `user_id`, or None when its restaurant does not exist here."""
+        with self._lock:
+            if user_id not in self._users:
+                self._users[user_id] = self._create(user_id, restaurant_id)
+            return self._users[user_id]
+
+    def _create(self, user_id, restaurant_id):
+        if restaurant_id is None or not Restaurant.objects.filter(id=restaurant_id).exists():
+            return None
+        user, _ = get_user_model().objects.get_or_create(username=f"replay-{user_id}")
+        if self.password:
+            user.set_password(self.password)
+            user.save(update_fields=["password"])
+        AuthUserRestaurant.objects.update_or_create(user=user, defaults={"restaurant_id": restaurant_id})
+        return user
+
+
+class TestClientTransport:
+    """In-process: one logged-in test client per user."""
+
+    def __init__(self):
+        host = next((h for h in settings.ALLOWED_HOSTS if h != "*" and not h.startswith(".")), "testserver")
+        self.host = host
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, user):
+        key = user.id if user is not None else None
+        with self._lock:
+            if key not in self._clients:
+                client = Client(HTTP_HOST=self.host)
+                if user is not None:
+                    client.force_login(user)
+                self._clients[key] = client
+            return self._clients[key]
+
+    def request(self, user, method, path, query, body):
+        client = self._client(user)
+        data = json.dumps(body) if body is not None else None
+        kwargs = {"content_type": "application/json"} if data is not None else {}
+        url = f"{path}?{query}" if query else path
+        response = client.generic(method, url, data or "", **kwargs)
+        return response.status_code, response.content
+
+
+class HttpTransport:
+    """Over HTTP: one cookie jar per user, logged in through /accounts/login/."""
+
+    def __init__(self, base_url, password):
+        self.base_url = base_url.rstrip("/")
+        self.password = password
+        self._openers = {}
+        self._lock = threading.Lock()
+
+    def _csrf(self, jar):
+        return next((c.value for c in jar if c.name == settings.CSRF_COOKIE_NAME), "")
+
+    def _opener(self, user):
+        key = user.id if user is not None else None
+        with self._lock:
+            if key not in self._openers:
+                jar = http.cookiejar.CookieJar()
+                opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+                if user is not None:
+                    login = f"{self.base_url}/accounts/login/"
+                    opener.open(login).read()
+                    form = urlencode({"username": user.username, "password": self.password, "csrfmiddlewaretoken": self._csrf(jar)})
+                    opener.open(urllib.request.Request(login, form.encode(), headers={"Referer": login})).read()
+                self._openers[key] = (opener, jar)
+            return self._openers[key]
+
+    def request(self, user, method, path, query, body):
+        opener, jar = self._opener(user)
+        url = f"{self.base_url}{path}" + (f"?{query}" if query else "")
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json", "X-CSRFToken": self._csrf(jar), "Referer": self.base_url + "/"}
+        try:
+            with opener.open(urllib.request.Request(url, data, headers=headers, method=method)) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class Replayer:
+    def __init__(self, transport, users, speed=1.0, concurrency=8):
+        self.transport = transport
+        self.users = users
+        self.speed = speed
+        self.concurrency = concurrency
+        self.order_ids = {}  # captured order id -> replayed order id
+        self.tokens = {}     # captured order id -> replayed status token
+        self.skipped = Counter()
+        self.results = []
+        self._lock = threading.Lock()
+
+    def run(self, records, limit=None):
+        creators = {}  # captured order id -> future of its order_created
+        last = {}      # client -> future of its previous request
+        futures = []
+        t0 = start = None
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            for n, record in enumerate(records):
+                if limit is not None and n >= limit:
+                    break
+                if record.get("bn") is not None and record.get("b") is None:
+                    self.skipped["body not captured"] += 1
+                    continue
+                if t0 is None:
+                    t0, start = record["t"], time.monotonic()
+                due = start + (record["t"] - t0) / 1000 / self.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+                client = ("u", record["u"]) if record.get("u") is not None else ("ref", record.get("ref"))
+                depends = [last.get(client)] + [creators.get(i) for i in self._referenced(record)]
+                future = pool.submit(self._send, record, due, [f for f in depends if f is not None])
+                last[client] = future
+                if record.get("o") is not None:
+                    creators[record["o"]] = future
+                futures.append(future)
+            wait(futures)
+        return self.results
+
+    @staticmethod
+    def _referenced(record):
+        ids = []
+        body = record.get("b")
+        if isinstance(body, dict) and isinstance(body.get("order_id"), int):
+            ids.append(body["order_id"])
+        match = ORDER_PATH.match(record["p"])
+        if match:
+            ids.append(int(match.group(1)))
+        if record.get("ref") is not None:
+            ids.append(record["ref"])
+        return ids
+
+    def _rewrite(self, record):
+        """(path, body) with captured order ids replaced; None when a status token cannot be mapped."""
+        path, body = record["p"], record.get("b")
+        if path == STATUS_PREFIX:
+            token = self.tokens.get(record.get("ref"))
+            if token is None:
+                return None
+            path = f"{STATUS_PREFIX}{token}/"
+        match = ORDER_PATH.match(path)
+        if match:
+            old = int(match.group(1))
+            path = path.replace(f"/{old}/", f"/{self.order_ids.get(old, old)}/", 1)
+        if isinstance(body, dict) and body.get("order_id") in self.order_ids:
+            body = {**body, "order_id": self.order_ids[body["order_id"]]}
+        return path, body
+
+    def _send(self, record, due, depends):
+        for f in depends:
+            f.exception()  # wait; a failed predecessor does not stop this request
+        lag_ms = max(time.monotonic() - due, 0) * 1000
+        rewritten = self._rewrite(record)
+        if rewritten is None:
+            with self._lock:
+                self.skipped["order not replayed"] += 1
+            return
+        user = None
+        if record.get("u") is not None:
+            user = self.users.get(record["u"], record.get("r"))
+            if user is None:
+                with self._lock:
+                    self.skipped["restaurant missing"] += 1
+                return
+        path, body = rewritten
+        t = time.perf_counter()
+        try:
+            status, content = self.transport.request(user, record["m"], path, record.get("q", ""), body)
+        except Exception:
+            status, content = 0, b""
+        ms = (time.perf_counter() - t) * 1000
+        if record.get("o") is not None and status == 201:
+            order = json.loads(content)["order"]
+            with self._lock:
+                self.order_ids[record["o"]] = order["id"]
+                self.tokens[record["o"]] = order.get("status_token")
+        with self._lock:
+            self.results.append(Result(f"{record['m']} {record.get('e') or record['p']}", status, record.get("s"), ms, lag_ms))
+
+
+def _pct(values, p):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+def summarize(results, skipped=None):
+    """{"endpoints": {endpoint: stats}, "total": stats, "skipped": {...}} for a replay run."""
+    def stats(rows):
+        ms = sorted(r.ms for r in rows)
+        return {
+            "n": len(rows),
+            "p50_ms": round(_pct(ms, 50), 2),
+            "p95_ms": round(_pct(ms, 95), 2),
+            "p99_ms": round(_pct(ms, 99), 2),
+            "errors": sum(1 for r in rows if r.status == 0 or r.status >= 500),
+            "throttled": sum(1 for r in rows if r.status in (429, 503)),
+            # e.g. a 201 in production that is a 404 here
+            "mismatched": sum(1 for r in rows if r.captured_status and r.status // 100 != r.captured_status // 100),
+            "lag_p99_ms": round(_pct(sorted(r.lag_ms for r in rows), 99), 2),
+        }
+
+    by_endpoint = {}
+    for r in results:
+        by_endpoint.setdefault(r.endpoint, []).append(r)
+    return {
+        "endpoints": {e: stats(rows) for e, rows in sorted(by_endpoint.items())},
+        "total": stats(results) if results else {"n": 0},
+        "skipped": dict(skipped or {}),
+    }
+
+
+def compare(base, new):
+    """Rows of (endpoint, base stats, new stats) for the endpoints in either summary, "total" last."""
+    endpoints = sorted(set(base["endpoints"]) | set(new["endpoints"]))
+    rows = [(e, base["endpoints"].get(e), new["endpoints"].get(e)) for e in endpoints]
+    rows.append(("total", base["total"], new["total"]))
+    return rows
@@ -10,17 +10,38 @@ from business_logic.models import (
     PreparationStep,
     Delivery,
     Notification,
+    OutboxEvent,
 )
+from business_logic.archive import order_history
+from business_logic.export import export_stream, parse_bound
+from business_logic.catalog_cache import get_products
+from business_logic.catalog_import import import_products, parse_rows
+from business_logic.geo import flight_minutes, parse_point, parse_radius, parse_zone, spatial_index
+from business_logic.search import SEARCH_MAX_LIMIT, parse_cursor, search_products
+from business_logic.kitchen import kitchen_queue, refresh_queue
+from business_logic.order_status import make_token, order_id_from_token, status_entry
+from business_logic.outbox import emit
+from business_logic.telemetry import ingest, parse_points, tracking
+from business_logic.sharding import copy_restaurant_row, current_shard, moving_response, order_shard, shard_atomic, use_shard
+from core.admission import admission_exempt, kitchen_lane, poll_lane
+from core.db_routing import replica_reads
+from core.payloads import Dictionary, payload_response, plain, table
+from core.warmup import readiness
+import hmac
 import json
 import uuid
 from django.shortcuts import render, redirect
 from django.contrib.auth.forms import UserCreationForm
-from django.db import transaction, IntegrityError
-from django.http import JsonResponse, HttpResponseRedirect, HttpResponseBadRequest, HttpResponseNotAllowed
+from django.db import transaction, IntegrityError, OperationalError, connections, router
+from django.db.models import Sum
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, HttpResponseRedirect, HttpResponseBadRequest, HttpResponseNotAllowed
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST, require_GET
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.middleware.csrf import get_token
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta
 
 @require_GET
@@ -29,6 +50,17 @@ def ping(request):
     get_token(request)
     return JsonResponse({"message": "Hello, drones! Backend is alive."})
 
+@admission_exempt
+@require_GET
+def ready(request):
+    """
+    GET /api/ready/
+    Readiness probe: 200 once this worker has warmed up and the database and
+    cache answer, else 503. Unlike ping it is never rate limited.
+    """
+    ok, details = readiness()
+    return JsonResponse({"ready": ok, **details}, status=200 if ok else 503)
+
 def signup(request):
     if request.method == "POST":
         form = UserCreationForm(request.POST)
@@ -83,6 +115,58 @@ def _json(request):
 def _bad(msg, status=400):
     return JsonResponse({"error": msg}, status=status)
 
+def _restaurant_dict(restaurant):
+    return {
+        "id": restaurant.id,
+        "name": restaurant.name,
+        "address": restaurant.address,
+        "kitchen_stations": restaurant.kitchen_stations,
+        "latitude": restaurant.latitude,
+        "longitude": restaurant.longitude,
+        "delivery_radius_m": restaurant.delivery_radius_m,
+        "delivery_zone": restaurant.delivery_zone,
+        "created_at": restaurant.created_at.isoformat(),
+    }
+
+def _locked_order(order_id):
+    """
+    Fetch an Order and lock its row until the view's transaction ends, so
+    concurrent kitchen actions on one order run one after the other. Waits at
+    most ORDER_LOCK_TIMEOUT_MS; raises OperationalError (LockNotAvailable)
+    after that.
+    """
+    connection = connections[router.db_for_write(Order)]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = %s", [f"{settings.ORDER_LOCK_TIMEOUT_MS}ms"])
+    return Order.objects.select_for_update().get(id=order_id)
+
+def _order_restaurant_id(order):
+    return order.order_products.values_list("product__restaurant_id", flat=True).first()
+
+# SQLSTATE for LockNotAvailable, raised when lock_timeout expires
+LOCK_NOT_AVAILABLE = "55P03"
+
+def _order_busy(error):
+    """
+    409 for a lock timeout from _locked_order. Any other OperationalError
+    (lost connection, statement timeout, ...) is re-raised untouched.
+    """
+    if getattr(error.__cause__, "pgcode", None) != LOCK_NOT_AVAILABLE:
+        raise error
+    response = _bad("Order is being updated from another device, try again", status=409)
+    response["Retry-After"] = "1"
+    return response
+
+def _answer_dict(ans):
+    return {
+        "id": ans.id,
+        "order_id": ans.order_id,
+        "status": ans.status,
+        "created_at": ans.created_at.isoformat(),
+    }
+
+@replica_reads
 @login_required
 @require_GET
 def product_list(request):
@@ -109,6 +193,7 @@ def product_list(request):
                 "restaurant_id": restaurant.id,
                 "restaurant_name": restaurant.name,
                 "price_NOK": p.price_NOK,
+                "preparation_minutes": p.preparation_minutes,
                 "description": p.description,
                 "created_at": p.created_at.isoformat(),
             }
@@ -119,7 +204,7 @@ def product_list(request):
 
 @login_required
 @require_POST
-@transaction.atomic
+@shard_atomic
 def product_create(request):
     """
     POST /api/product_create
@@ -127,7 +212,8 @@ def product_create(request):
     {
       "name": "Veggie Roll",
       "description": "…",            // optional
-      "price_NOK": 189               // integer (NOK)
+      "price_NOK": 189,              // integer (NOK)
+      "preparation_minutes": 6       // optional, kitchen time per unit
     }
     restaurant_id is automatically determined from the logged-in user.
     product_id is auto-generated if not provided.
@@ -143,6 +229,9 @@ def product_create(request):
 
     if not name or not isinstance(price_NOK, int):
         return _bad("name and integer price_NOK are required")
+    preparation_minutes = body.get("preparation_minutes")
+    if preparation_minutes is not None and (not isinstance(preparation_minutes, int) or preparation_minutes < 0):
+        return _bad("preparation_minutes must be a non-negative integer")
 
     # 1) find user's restaurant
     try:
@@ -158,6 +247,7 @@ def product_create(request):
             restaurant=restaurant,
             description=description,
             price_NOK=price_NOK,
+            preparation_minutes=preparation_minutes,
         )
     except IntegrityError as e:
         return _bad(f"Error creating product: {str(e)}", status=409)
@@ -171,6 +261,7 @@ def product_create(request):
                 "restaurant_id": restaurant.id,
                 "restaurant_name": restaurant.name,
                 "price_NOK": p.price_NOK,
+                "preparation_minutes": p.preparation_minutes,
                 "description": p.description,
                 "created_at": p.created_at.isoformat(),
             },
@@ -183,7 +274,6 @@ def product_create(request):
 
 @require_POST
 @login_required
-@transaction.atomic
 def order_created(request):
     """
     Body:
@@ -191,9 +281,11 @@ def order_created(request):
       "products": [
          {"product_id": 1, "quantity": 2, "unit_price_NOK": 199},
          {"product_id": 2, "quantity": 1}  // unit_price_NOK optional -> default from Product
-      ]
+      ],
+      "dropoff": {"lat": 59.91, "lon": 10.75}  // optional; must be inside the restaurant's delivery zone
     }
     Creates a new order with auto-generated IDs for a new EndUser.
+    The response carries the customer's status_token for GET /api/status/<token>/.
     """
     try:
         body = _json(request)
@@ -202,61 +294,103 @@ def order_created(request):
 
     products = body.get("products", [])
 
-    # Create EndUser (auto-generates ID)
-    end_user = EndUser.objects.create()
-
-    # Create Order (auto-generates ID)
-    order = Order.objects.create(end_user=end_user)
-
-    # Attach products
-    item_results = []
+    # Validate rows and resolve products (from the catalog cache) before writing anything
+    rows = []
     for item in products:
-        pid = item.get("product_id")
+        try:
+            pid = int(item.get("product_id") or 0)
+        except (TypeError, ValueError):
+            pid = 0
         if not pid:
-            transaction.set_rollback(True)
             return _bad("Each product row must include product_id (integer)")
-        try:
-            product = Product.objects.get(id=pid)
-        except Product.DoesNotExist:
-            transaction.set_rollback(True)
-            return _bad(f"Product not found: {pid}", status=404)
-
         qty = int(item.get("quantity", 1))
         if qty < 1:
-            transaction.set_rollback(True)
             return _bad("quantity must be >= 1")
+        rows.append((pid, qty, item))
 
+    # The order is written where its restaurant lives, not on the ordering user's shard
+    try:
+        alias, is_moving = order_shard(pid for pid, _, _ in rows)
+    except ValueError as e:
+        return _bad(str(e))
+    if is_moving:
+        return moving_response()
+    with use_shard(alias), transaction.atomic(using=alias):
+        return _create_order(request, body, rows)
+
+
+def _create_order(request, body, rows):
+    catalog = get_products(pid for pid, _, _ in rows)
+    for pid, _, _ in rows:
+        if pid not in catalog:
+            return _bad(f"Product not found: {pid}", status=404)
+
+    # Drop-off point, checked against the in-memory zone index (no query)
+    lat = lon = estimate = None
+    if body.get("dropoff") is not None:
+        dropoff = body["dropoff"]
+        if not isinstance(dropoff, dict):
+            return _bad("dropoff must be an object with lat and lon")
+        try:
+            lat, lon = parse_point(dropoff.get("lat"), dropoff.get("lon"))
+        except ValueError as e:
+            return _bad(str(e))
+        index = spatial_index()
+        for restaurant_id in {catalog[pid].restaurant_id for pid, _, _ in rows}:
+            if index.can_serve(restaurant_id, lat, lon) is False:
+                return _bad("Drop-off point is outside the restaurant's delivery zone")
+            estimate = estimate or index.estimate(restaurant_id, lat, lon)
+
+    # Create EndUser (auto-generates ID)
+    end_user = EndUser.objects.create()
+
+    # Create Order (auto-generates ID)
+    order = Order.objects.create(end_user=end_user, dropoff_latitude=lat, dropoff_longitude=lon)
+
+    # Attach products
+    order_products = []
+    item_results = []
+    for pid, qty, item in rows:
+        product = catalog[pid]
         unit_price = item.get("unit_price_NOK", product.price_NOK)
-        op = OrderProduct.objects.create(
+        order_products.append(OrderProduct(
             order=order,
-            product=product,
+            product_id=product.id,
             quantity=qty,
             unit_price_NOK=unit_price,
-        )
+        ))
         item_results.append({
             "product_id": product.id,
             "product_name": product.name,
             "quantity": qty,
             "unit_price_NOK": unit_price,
         })
+    OrderProduct.objects.bulk_create(order_products)
 
     # Ensure the CSRF cookie exists for subsequent POSTs from the SPA
     get_token(request)
 
+    status_token = make_token(order.id)
     return JsonResponse({
         "ok": True,
         "order": {
             "id": order.id,
             "end_user_id": end_user.id,
-            "created_at": order.created_at.isoformat()
+            "created_at": order.created_at.isoformat(),
+            "status_token": status_token,
+            "status_url": f"/api/status/{status_token}/",
         },
         "items": item_results,
+        "delivery_estimate": {
+            "distance_m": round(estimate[0]),
+            "flight_minutes": round(estimate[1], 1),
+        } if estimate else None,
     }, status=201)
 
 
 @require_POST
 @login_required
-@transaction.atomic
+@shard_atomic
 def order_cancelled(request):
     """
     Body: { "order_id": 123 }  // integer ID
@@ -272,23 +406,20 @@ def order_cancelled(request):
         return _bad("order_id is required")
 
     try:
-        order = Order.objects.get(id=order_id)
+        order = _locked_order(order_id)
     except Order.DoesNotExist:
         return _bad(f"Order not found: {order_id}", status=404)
+    except OperationalError as e:
+        return _order_busy(e)
 
     # Mark as cancelled (idempotent)
     if not order.is_cancelled:
         order.is_cancelled = True
         order.save(update_fields=["is_cancelled"])
 
-        # Create notification for the restaurant
-        first_op = order.order_products.select_related("product__restaurant").first()
-        if first_op is not None and getattr(first_op.product, "restaurant", None) is not None:
-            restaurant = first_op.product.restaurant
-            items = list(order.order_products.select_related("product").all())
-            items_str = ", ".join([f"{op.quantity}× {op.product.name}" for op in items]) or "order items"
-            msg = f"Order #{order.id} canceled for {items_str}"
-            Notification.objects.create(restaurant=restaurant, message=msg)
+        # The restaurant notification is built by the outbox worker
+        emit(OutboxEvent.Topic.ORDER_CANCELLED, order_id=order.id)
+        refresh_queue(_order_restaurant_id(order), current_shard())
 
     return JsonResponse({"ok": True, "cancelled_order_id": order_id, "is_cancelled": True})
 
@@ -301,6 +432,8 @@ def _create_order_answer(request, status_code: str):
     {
       "order_id": 123  // integer ID
     }
+    An order is answered once. Repeating the same answer returns the existing
+    one (200); a different answer, or answering a cancelled order, is a 409.
     """
     try:
         body = _json(request)
@@ -312,15 +445,29 @@ def _create_order_answer(request, status_code: str):
         return _bad("order_id is required")
 
     try:
-        order = Order.objects.get(id=order_id)
+        order = _locked_order(order_id)
     except Order.DoesNotExist:
         return _bad(f"Order not found: {order_id}", status=404)
+    except OperationalError as e:
+        return _order_busy(e)
+
+    # Also send a CSRF cookie for subsequent SPA writes
+    get_token(request)
+
+    existing = order.order_answers.first()
+    if existing is not None:
+        if existing.status != status_code:
+            return JsonResponse({
+                "error": f"Order was already {existing.get_status_display().lower()}",
+                "order_answer": _answer_dict(existing),
+            }, status=409)
+        return JsonResponse({"ok": True, "order_answer": _answer_dict(existing)})
+    if order.is_cancelled:
+        return _bad("Order is cancelled", status=409)
 
-    projected_minutes = None
     try:
-        body = _json(request)
         projected_minutes = int(body.get("projected_preparation_time_minutes")) if body.get("projected_preparation_time_minutes") is not None else None
-    except Exception:
+    except (TypeError, ValueError):
         projected_minutes = None
 
     kwargs = {"order": order, "status": status_code}
@@ -328,36 +475,57 @@ def _create_order_answer(request, status_code: str):
         kwargs["projected_preparation_time_minutes"] = projected_minutes
 
     ans = OrderAnswer.objects.create(**kwargs)
+    if status_code == OrderAnswer.OrderAnswerStatus.ACCEPTED:
+        refresh_queue(_order_restaurant_id(order), current_shard())
 
-    # Also send a CSRF cookie for subsequent SPA writes
-    get_token(request)
-
-    return JsonResponse({
-        "ok": True,
-        "order_answer": {
-            "id": ans.id,
-            "order_id": order.id,
-            "status": ans.status,
-            "created_at": ans.created_at.isoformat(),
-        }
-    }, status=201)
+    return JsonResponse({"ok": True, "order_answer": _answer_dict(ans)}, status=201)
 
 
+@kitchen_lane
 @require_POST
 @login_required
-@transaction.atomic
+@shard_atomic
 def preparation_accepted(request):
     # status "a" in your choices
     return _create_order_answer(request, OrderAnswer.OrderAnswerStatus.ACCEPTED)
 
 
+@kitchen_lane
 @require_POST
 @login_required
-@transaction.atomic
+@shard_atomic
 def preparation_rejected(request):
     return _create_order_answer(request, OrderAnswer.OrderAnswerStatus.REJECTED)
 
 
+@login_required
+@require_GET
+def restaurants_nearby(request):
+    """
+    GET /api/restaurants/nearby/?lat=59.91&lon=10.75&limit=10
+    Restaurants whose delivery zone covers the point, nearest first, with
+    drone distance and flight time. Served from the in-memory zone index.
+    """
+    try:
+        lat, lon = parse_point(request.GET.get("lat"), request.GET.get("lon"))
+        limit = min(max(int(request.GET.get("limit", 10)), 1), 100)
+    except ValueError as e:
+        return _bad(str(e))
+    return JsonResponse({
+        "ok": True,
+        "restaurants": [
+            {
+                "id": zone.restaurant_id,
+                "name": zone.name,
+                "distance_m": round(distance),
+                "flight_minutes": round(flight_minutes(distance), 1),
+            }
+            for distance, zone in spatial_index().serving(lat, lon, limit=limit)
+        ],
+    })
+
+
+@replica_reads
 @login_required
 @require_GET
 def restaurant_info(request):
@@ -377,12 +545,7 @@ def restaurant_info(request):
     return JsonResponse({
         "ok": True,
         "is_admin": request.user.is_staff or request.user.is_superuser,
-        "restaurant": {
-            "id": restaurant.id,
-            "name": restaurant.name,
-            "address": restaurant.address,
-            "created_at": restaurant.created_at.isoformat(),
-        },
+        "restaurant": _restaurant_dict(restaurant),
         "employees": [
             {
                 "id": emp.user.id,
@@ -395,12 +558,15 @@ def restaurant_info(request):
     })
 
 
+@poll_lane
+@replica_reads
 @login_required
 @require_GET
 def notifications_list(request):
     """
     GET /api/notifications/
     Returns notifications for the authenticated user's restaurant
+    (layout and compression negotiated, see core/payloads.py)
     """
     try:
         user_restaurant = AuthUserRestaurant.objects.get(user=request.user)
@@ -409,23 +575,28 @@ def notifications_list(request):
         return _bad("User is not linked to any restaurant", status=404)
 
     notifs = restaurant.notifications.order_by("-created_at")[0:50]
-    return JsonResponse({
+    payload = {
         "ok": True,
         "notifications": [
             {
                 "id": n.id,
                 "message": n.message,
                 "read": n.read,
-                "created_at": n.created_at.isoformat(),
+                "created_at": n.created_at,
             }
             for n in notifs
         ]
-    })
+    }
+    return payload_response(request, payload, _notifications_columnar, f"notifications:{restaurant.id}")
+
+
+def _notifications_columnar(payload):
+    return {"ok": True, "notifications": table(payload["notifications"])}
 
 
 @login_required
 @require_POST
-@transaction.atomic
+@shard_atomic
 def notification_mark_read(request, notification_id: int):
     try:
         user_restaurant = AuthUserRestaurant.objects.get(user=request.user)
@@ -446,7 +617,7 @@ def notification_mark_read(request, notification_id: int):
 
 @login_required
 @require_POST
-@transaction.atomic
+@shard_atomic
 def notifications_mark_all_read(request):
     try:
         user_restaurant = AuthUserRestaurant.objects.get(user=request.user)
@@ -466,7 +637,12 @@ def restaurant_update(request):
     Body:
     {
       "name": "New Restaurant Name",     // optional
-      "address": "New Address 123"       // optional
+      "address": "New Address 123",      // optional
+      "kitchen_stations": 3,             // optional, orders prepared in parallel
+      "latitude": 59.91,                 // optional, with longitude; null clears both
+      "longitude": 10.75,
+      "delivery_radius_m": 5000,         // optional, used when delivery_zone is empty
+      "delivery_zone": [[59.9, 10.7], [59.95, 10.7], [59.95, 10.8]]  // optional polygon, [] clears
     }
     Updates restaurant info for the authenticated user's restaurant
     Only allowed for admin users (staff or superuser)
@@ -502,19 +678,47 @@ def restaurant_update(request):
             return _bad("address must be a string")
         restaurant.address = address
 
+    if "kitchen_stations" in body:
+        stations = body["kitchen_stations"]
+        if not isinstance(stations, int) or stations < 1:
+            return _bad("kitchen_stations must be a positive integer")
+        restaurant.kitchen_stations = stations
+        alias = current_shard()
+        transaction.on_commit(lambda: refresh_queue(restaurant.id, alias))
+
+    if "latitude" in body or "longitude" in body:
+        if body.get("latitude") is None and body.get("longitude") is None:
+            restaurant.latitude = restaurant.longitude = None
+        else:
+            try:
+                restaurant.latitude, restaurant.longitude = parse_point(body.get("latitude"), body.get("longitude"))
+            except ValueError as e:
+                return _bad(str(e))
+
+    if "delivery_radius_m" in body:
+        try:
+            restaurant.delivery_radius_m = parse_radius(body["delivery_radius_m"])
+        except ValueError as e:
+            return _bad(str(e))
+
+    if "delivery_zone" in body:
+        try:
+            restaurant.delivery_zone = parse_zone(body["delivery_zone"])
+        except ValueError as e:
+            return _bad(str(e))
+
     restaurant.save()
+    # Keep the reference copy on the restaurant's shard in sync
+    copy_restaurant_row(restaurant, current_shard())
 
     return JsonResponse({
         "ok": True,
-        "restaurant": {
-            "id": restaurant.id,
-            "name": restaurant.name,
-            "address": restaurant.address,
-            "created_at": restaurant.created_at.isoformat(),
-        }
+        "restaurant": _restaurant_dict(restaurant),
     })
 
 
+@poll_lane
+@replica_reads
 @login_required
 @require_GET
 def orders_list(request):
@@ -524,6 +728,8 @@ def orders_list(request):
     - all_orders
     - in_progress_orders (has an accepted OrderAnswer)
     - awaiting_pickup_orders (has a PreparationStep with status DONE)
+    In-progress orders carry queue-aware projected ready times (business_logic/kitchen.py).
+    Accept/Accept-Encoding select a columnar or MessagePack layout and gzip/br (core/payloads.py).
     """
     # Identify restaurant for current user
     try:
@@ -569,7 +775,7 @@ def orders_list(request):
         ]
         data = {
             "id": o.id,
-            "created_at": o.created_at.isoformat(),
+            "created_at": o.created_at,
             "items": items,
         }
         # Attach delivery info if exists (avoid DoesNotExist from one-to-one access)
@@ -579,8 +785,9 @@ def orders_list(request):
             d = None
         if d is not None:
             data["delivery"] = {
-                "estimated_pickup_time": d.estimated_pickup_time.isoformat(),
-                "estimated_delivery_time": d.estimated_delivery_time.isoformat(),
+                "id": d.id,
+                "estimated_pickup_time": d.estimated_pickup_time,
+                "estimated_delivery_time": d.estimated_delivery_time,
             }
         if include_accepted_at:
             ans = (
@@ -590,7 +797,7 @@ def orders_list(request):
                 .first()
             )
             if ans:
-                data["accepted_at"] = ans.created_at.isoformat()
+                data["accepted_at"] = ans.created_at
                 data["projected_preparation_time_minutes"] = getattr(ans, "projected_preparation_time_minutes", None)
                 # Sum delay minutes across all steps for preparations under this answer
                 total_delay = 0
@@ -599,20 +806,70 @@ def orders_list(request):
                 data["total_delay_minutes"] = total_delay
         return data
 
-    return JsonResponse(
-        {
-            "ok": True,
-            "all_orders": [serialize_order(o) for o in base_qs],
-            "new_orders": [serialize_order(o) for o in new_orders_qs],
-            "in_progress_orders": [serialize_order(o, include_accepted_at=True) for o in in_progress_qs],
-            "awaiting_pickup_orders": [serialize_order(o) for o in awaiting_pickup_qs],
-        }
-    )
+    # Queue-aware ready times for everything the kitchen is working on. The clock is
+    # floored to KITCHEN_CLOCK_SECONDS so polls within one step get the same payload (and ETag).
+    now = timezone.now()
+    now -= timedelta(seconds=now.timestamp() % settings.KITCHEN_CLOCK_SECONDS)
+    stations, queue = kitchen_queue(restaurant.id, current_shard(), now)
+    projections = {p.order_id: p for p in queue}
+
+    in_progress = []
+    for o in in_progress_qs:
+        data = serialize_order(o, include_accepted_at=True)
+        p = projections.get(o.id)
+        if p is not None:
+            data["queue_position"] = p.position
+            data["station"] = p.station
+            data["projected_start_at"] = p.start_at
+            data["projected_ready_at"] = p.ready_at
+        in_progress.append(data)
+
+    payload = {
+        "ok": True,
+        "all_orders": [serialize_order(o) for o in base_qs],
+        "new_orders": [serialize_order(o) for o in new_orders_qs],
+        "in_progress_orders": in_progress,
+        "awaiting_pickup_orders": [serialize_order(o) for o in awaiting_pickup_qs],
+        "kitchen": {
+            "stations": stations,
+            "open_orders": len(queue),
+            "clear_at": max((p.ready_at for p in queue), default=now),
+        },
+    }
+    return payload_response(request, payload, _orders_columnar, f"orders:{restaurant.id}")
+
 
+_ORDER_FIELDS = {"id", "created_at", "items", "delivery"}
 
+
+def _orders_columnar(payload):
+    """
+    Columnar layout of the orders_list payload. Orders are listed once, in
+    all_orders; the other groups hold their ids plus, for in-progress orders,
+    the kitchen fields. Items are [product, quantity, unit_price_NOK] rows,
+    where product indexes the "products" dictionary.
+    """
+    products = Dictionary()
+
+    def items(rows):
+        return [[products.ref((i["product_id"], i["product_name"])), i["quantity"], i["unit_price_NOK"]] for i in rows]
+
+    in_progress = [{k: v for k, v in o.items() if k == "id" or k not in _ORDER_FIELDS} for o in payload["in_progress_orders"]]
+    return {
+        "ok": True,
+        "all_orders": table(payload["all_orders"], {"items": items}),
+        "new_orders": {"id": [o["id"] for o in payload["new_orders"]]},
+        "in_progress_orders": table(in_progress),
+        "awaiting_pickup_orders": {"id": [o["id"] for o in payload["awaiting_pickup_orders"]]},
+        "products": {"id": [p[0] for p in products.values], "name": [p[1] for p in products.values]},
+        "kitchen": plain(payload["kitchen"]),
+    }
+
+
+@kitchen_lane
 @require_POST
 @login_required
-@transaction.atomic
+@shard_atomic
 def preparation_step_create(request):
     """
     POST /api/preparation_step/
@@ -639,11 +896,13 @@ def preparation_step_create(request):
     if delay_minutes < 0:
         return _bad("delaytime_minutes must be >= 0")
 
-    # Find order
+    # Find order; the row lock serializes steps for the same order
     try:
-        order = Order.objects.get(id=order_id)
+        order = _locked_order(order_id)
     except Order.DoesNotExist:
         return _bad(f"Order not found: {order_id}", status=404)
+    except OperationalError as e:
+        return _order_busy(e)
 
     # Ensure the order belongs to the current user's restaurant
     try:
@@ -665,26 +924,29 @@ def preparation_step_create(request):
     if not ans:
         return _bad("Order is not in progress (no accepted answer)", status=409)
 
-    # Find or create preparation
+    # Find or create preparation (one per answer)
     prep = ans.preparations.first()
     if prep is None:
         prep = Preparation.objects.create(order_answer=ans)
+    else:
+        finished = (
+            prep.steps
+            .filter(status__in=[PreparationStep.PreparationStatus.DONE, PreparationStep.PreparationStatus.CANCELLED])
+            .first()
+        )
+        if finished is not None:
+            return JsonResponse({
+                "error": f"Preparation is already {finished.get_status_display().lower()}",
+                "step": {"id": finished.id, "status": finished.status, "created_at": finished.created_at.isoformat()},
+            }, status=409)
 
     step = PreparationStep.objects.create(preparation=prep, status=status, delaytime_minutes=delay_minutes)
 
-    # If marked as DONE, ensure a Delivery exists with estimated timestamps
-    if status == PreparationStep.PreparationStatus.DONE:
-        # Ensure delivery exists; create with estimated times if missing
-        pickup_time = timezone.now() + timedelta(minutes=5)
-        delivery_time = timezone.now() + timedelta(minutes=15)
-        Delivery.objects.get_or_create(
-            order=order,
-            defaults={
-                "estimated_pickup_time": pickup_time,
-                "estimated_delivery_time": delivery_time,
-            },
-        )
-    elif status == PreparationStep.PreparationStatus.CANCELLED:
+    # Side effects (e.g. the Delivery for a DONE step) are run by the outbox worker
+    emit(OutboxEvent.Topic.PREPARATION_STEP_CREATED, order_id=order.id, step_id=step.id, status=step.status)
+    refresh_queue(restaurant.id, current_shard())
+
+    if status == PreparationStep.PreparationStatus.CANCELLED:
         # Mark the order as cancelled as part of prep flow
         if not order.is_cancelled:
             order.is_cancelled = True
@@ -694,9 +956,12 @@ def preparation_step_create(request):
     get_token(request)
 
     # compute updated total delay minutes
-    total_delay = 0
-    for p in ans.preparations.all():
-        total_delay += sum(s.delaytime_minutes for s in p.steps.all())
+    total_delay = (
+        PreparationStep.objects
+        .filter(preparation__order_answer=ans)
+        .aggregate(total=Sum("delaytime_minutes"))["total"]
+        or 0
+    )
 
     return JsonResponse({
         "ok": True,
@@ -708,4 +973,240 @@ def preparation_step_create(request):
             "delaytime_minutes": step.delaytime_minutes,
         },
         "total_delay_minutes": total_delay,
-    }, status=201)
\ No newline at end of file
+    }, status=201)
+
+@replica_reads
+@login_required
+@require_GET
+def orders_history(request):
+    """
+    GET /api/orders/history/?before=<iso datetime>&before_id=<order id>&limit=50
+    Newest-first order history for the authenticated user's restaurant,
+    including orders that have been moved to cold storage (ArchivedOrder).
+    Page by passing `next_before` and `next_before_id` from the previous page.
+    """
+    try:
+        user_restaurant = AuthUserRestaurant.objects.select_related("restaurant").get(user=request.user)
+        restaurant = user_restaurant.restaurant
+    except AuthUserRestaurant.DoesNotExist:
+        return _bad("User is not linked to any restaurant", status=404)
+
+    before = None
+    if request.GET.get("before"):
+        before = parse_datetime(request.GET["before"])
+        if before is None:
+            return _bad("before must be an ISO 8601 datetime")
+    try:
+        before_id = int(request.GET["before_id"]) if request.GET.get("before_id") else None
+        limit = min(max(int(request.GET.get("limit", 50)), 1), 200)
+    except ValueError:
+        return _bad("before_id and limit must be integers")
+
+    orders = order_history(restaurant, before=before, before_id=before_id, limit=limit)
+    more = len(orders) == limit
+    return JsonResponse({
+        "ok": True,
+        "orders": orders,
+        "next_before": orders[-1]["created_at"] if more else None,
+        "next_before_id": orders[-1]["id"] if more else None,
+    })
+
+
+@login_required
+@require_GET
+def orders_export(request):
+    """
+    GET /api/orders/export/?format=ndjson|csv&since=<iso>&until=<iso>&gzip=1
+    Streams every order of the authenticated user's restaurant, archived and
+    live, oldest first, with items, answers, steps and delivery. Memory use is
+    constant.
+    """
+    try:
+        user_restaurant = AuthUserRestaurant.objects.get(user=request.user)
+    except AuthUserRestaurant.DoesNotExist:
+        return _bad("User is not linked to any restaurant", status=404)
+
+    fmt = request.GET.get("format", "ndjson")
+    if fmt not in {"ndjson", "csv"}:
+        return _bad("format must be one of: ndjson, csv")
+    try:
+        since = parse_bound(request.GET["since"]) if request.GET.get("since") else None
+        until = parse_bound(request.GET["until"]) if request.GET.get("until") else None
+    except ValueError as e:
+        return _bad(str(e))
+    use_gzip = request.GET.get("gzip") == "1"
+
+    content_type = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson"
+    if use_gzip:
+        # Served as a .gz file (not Content-Encoding) so downloads stay compressed on disk
+        content_type = "application/gzip"
+    alias = current_shard()
+
+    def stream():
+        # The body is produced after the view returns, so re-activate the shard here
+        with use_shard(alias):
+            yield from export_stream(fmt, gzip=use_gzip, restaurant_id=user_restaurant.restaurant_id, since=since, until=until)
+
+    response = StreamingHttpResponse(stream(), content_type=content_type)
+    filename = f"orders-{user_restaurant.restaurant_id}.{fmt}" + (".gz" if use_gzip else "")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+@require_POST
+def product_import(request):
+    """
+    POST /api/products/import/
+    Body: CSV (Content-Type: text/csv) with a header row "name,price_NOK,description",
+    or JSON: { "products": [ {"name": "Veggie Roll", "price_NOK": 189, "description": "…"}, … ] }
+    Upserts by name within the logged-in user's restaurant. All rows are validated
+    first; if any row is invalid nothing is written and per-row errors are returned.
+    """
+    try:
+        user_restaurant = AuthUserRestaurant.objects.select_related("restaurant").get(user=request.user)
+        restaurant = user_restaurant.restaurant
+    except AuthUserRestaurant.DoesNotExist:
+        return _bad("User is not linked to any restaurant", status=404)
+
+    fmt = "csv" if request.content_type in {"text/csv", "application/csv"} else "json"
+    try:
+        rows = parse_rows(request.body, fmt)
+    except (ValueError, UnicodeDecodeError) as e:
+        return _bad(str(e))
+
+    result = import_products(restaurant, rows)
+    if result["errors"]:
+        return JsonResponse({"ok": False, "error": "Invalid rows", "errors": result["errors"]}, status=400)
+
+    return JsonResponse({
+        "ok": True,
+        "restaurant_id": restaurant.id,
+        "created": result["created"],
+        "updated": result["updated"],
+    })
+
+
+@replica_reads
+@login_required
+@require_GET
+def product_search(request):
+    """
+    GET /api/products/search/?q=veg&scope=restaurant|all&limit=20&cursor=<next_cursor>
+    Ranked, prefix- and typo-tolerant search over product name and description.
+    scope=restaurant (default) searches the logged-in user's restaurant only.
+    """
+    q = request.GET.get("q", "").strip()
+    if not q:
+        return _bad("q is required")
+
+    restaurant = None
+    if request.GET.get("scope", "restaurant") != "all":
+        try:
+            user_restaurant = AuthUserRestaurant.objects.select_related("restaurant").get(user=request.user)
+            restaurant = user_restaurant.restaurant
+        except AuthUserRestaurant.DoesNotExist:
+            return _bad("User is not linked to any restaurant", status=404)
+
+    try:
+        limit = min(max(int(request.GET.get("limit", 20)), 1), SEARCH_MAX_LIMIT)
+        cursor = parse_cursor(request.GET["cursor"]) if request.GET.get("cursor") else None
+    except ValueError as e:
+        return _bad(str(e))
+
+    products, next_cursor = search_products(q, restaurant=restaurant, limit=limit, cursor=cursor)
+    return JsonResponse({
+        "ok": True,
+        "products": [
+            {
+                "id": p.id,
+                "name": p.name,
+                "restaurant_id": p.restaurant_id,
+                "restaurant_name": p.restaurant.name,
+                "price_NOK": p.price_NOK,
+                "description": p.description,
+                "created_at": p.created_at.isoformat(),
+                "score": p.score,
+            }
+            for p in products
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+@admission_exempt
+@csrf_exempt
+@require_POST
+def telemetry_ingest(request):
+    """
+    POST /api/telemetry/
+    Header: Authorization: Bearer <TELEMETRY_INGEST_KEY>
+    Body: { "points": [ [delivery_id, t_ms, lat, lon, battery_pct, remaining_m|null], ... ] }
+    Appends drone positions (one compact segment row per delivery per request)
+    and refreshes each delivery's live position. Points for unknown deliveries
+    are dropped and their ids returned.
+    """
+    key = settings.TELEMETRY_INGEST_KEY
+    if not key:
+        return _bad("Telemetry ingestion is not configured", status=503)
+    auth = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(auth.encode(), f"Bearer {key}".encode()):
+        return _bad("Invalid telemetry key", status=401)
+
+    try:
+        by_delivery = parse_points(_json(request))
+    except ValueError as e:
+        return _bad(str(e))
+
+    stored, unknown = ingest(by_delivery)
+    return JsonResponse({"ok": True, "stored": stored, "unknown_delivery_ids": unknown}, status=202)
+
+
+@poll_lane
+@login_required
+@require_GET
+def order_tracking(request, order_id: int):
+    """
+    GET /api/orders/<order_id>/tracking/
+    Latest drone position and live ETA for an order of the user's restaurant.
+    Falls back to the planned delivery time while there is no usable telemetry.
+    """
+    try:
+        user_restaurant = AuthUserRestaurant.objects.get(user=request.user)
+    except AuthUserRestaurant.DoesNotExist:
+        return _bad("User is not linked to any restaurant", status=404)
+
+    delivery = (
+        Delivery.objects
+        .filter(order_id=order_id, order__order_products__product__restaurant_id=user_restaurant.restaurant_id)
+        .first()
+    )
+    if delivery is None:
+        return _bad(f"No delivery for order {order_id}", status=404)
+
+    return JsonResponse({"ok": True, "order_id": order_id, **tracking(delivery)})
+
+
+@admission_exempt
+@require_GET
+def order_status(request, token: str):
+    """
+    GET /api/status/<token>/
+    Public status of one order for its customer, keyed by the token from
+    order_created. The document is precomputed on writes (business_logic/order_status.py),
+    so this is one cache read; responses carry a strong ETag (If-None-Match -> 304)
+    and may be cached publicly for ORDER_STATUS_MAX_AGE seconds.
+    """
+    order_id = order_id_from_token(token)
+    entry = status_entry(order_id) if order_id is not None else None
+    if entry is None:
+        return _bad("Unknown order", status=404)
+
+    etags = [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]
+    if entry["etag"] in etags or "*" in etags:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(entry["body"], content_type="application/json")
+    response["ETag"] = entry["etag"]
+    response["Cache-Control"] = f"public, max-age={settings.ORDER_STATUS_MAX_AGE}, stale-while-revalidate={settings.ORDER_STATUS_MAX_AGE}"
+    return response
@@ -0,0 +1,133 @@
+"""
+Worker warm-up and readiness.
+
+project/wsgi.py calls warm_up() right after building the application. It
+primes what the first requests would otherwise pay for:
+  - the URL resolver: every pattern's regex compiled, the reverse map built;
+  - templates: the project's templates loaded and compiled;
+  - application caches: the catalog cache and the delivery-zone index.
+Then it closes every database and cache connection it opened. Under gunicorn
+with preload_app (gunicorn.conf.py), warm_up() runs once in the master. The
+primed state is inherited by every worker it forks, including replacements
+after a worker is recycled, and no socket is shared across fork.
+
+Each worker then runs warm_worker() from gunicorn's post_worker_init hook. It
+opens this worker's database connections (kept between requests by
+CONN_MAX_AGE) before the worker takes its first request. GET /api/ready/
+reports whether warm-up has run, plus a live check of the database and the
+cache, so load balancers and compose healthchecks only route to warm
+workers. GET /api/ping/ stays a plain liveness check.
+
+A failing phase is logged and skipped: a cold cache is slower, not broken.
+"""
+import logging
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import NoReverseMatch, Resolver404, get_resolver, reverse
+
+logger = logging.getLogger(__name__)
+
+_state = {"warmed": False, "phases_ms": {}}
+
+
+def _urls():
+    resolver = get_resolver()
+    # A path that matches nothing is tried against every pattern, compiling each regex
+    for path in ("/__warmup__/", "/api/__warmup__/", "/admin/__warmup__/", "/accounts/__warmup__/"):
+        try:
+            resolver.resolve(path)
+        except Resolver404:
+            pass
+    try:
+        reverse("admin:index")  # builds the reverse map
+    except NoReverseMatch:
+        pass
+    return len(resolver.url_patterns)
+
+
+def _templates():
+    loaded = 0
+    for directory in map(Path, settings.TEMPLATES[0]["DIRS"]):
+        for path in sorted(directory.rglob("*.html")):
+            try:
+                get_template(str(path.relative_to(directory)))
+                loaded += 1
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                logger.warning("Warm-up could not load template %s", path)
+    return loaded
+
+
+def _catalog():
+    from business_logic.catalog_cache import warm_up as warm_catalog
+    return warm_catalog()
+
+
+def _geo():
+    from business_logic.geo import spatial_index
+    return len(spatial_index().zones)
+
+
+PHASES = [("urls", _urls), ("templates", _templates), ("catalog", _catalog), ("geo", _geo)]
+
+
+def _run(name, fn):
+    t0 = time.perf_counter()
+    try:
+        fn()
+    except Exception:
+        logger.exception("Warm-up phase %s failed", name)
+    _state["phases_ms"][name] = round((time.perf_counter() - t0) * 1000, 1)
+
+
+def close_connections():
+    """Drop database and cache connections so none is shared with forked workers."""
+    connections.close_all()
+    for c in caches.all(initialized_only=True):
+        c.close()
+
+
+def warm_up():
+    """Prime this process before it serves traffic. Never raises."""
+    if settings.WARMUP_ENABLED:
+        for name, fn in PHASES:
+            _run(name, fn)
+        close_connections()
+    _state["warmed"] = True
+    logger.info("Warm-up done in %.0fms: %s", sum(_state["phases_ms"].values()), _state["phases_ms"])
+
+
+def _connect():
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def warm_worker():
+    """Per-worker part (gunicorn post_worker_init, after fork): open this worker's connections."""
+    if settings.WARMUP_ENABLED:
+        _run("connections", _connect)
+
+
+def readiness():
+    """(ready, details) for the /api/ready/ probe: warmed up, database and cache answering."""
+    checks = {"warm": _state["warmed"]}
+    try:
+        with connections["default"].cursor() as cur:
+            cur.execute("SELECT 1")
+        checks["database"] = True
+    except Exception:
+        logger.exception("Readiness: database check failed")
+        checks["database"] = False
+    try:
+        cache.get("ready:probe")
+        checks["cache"] = True
+    except Exception:
+        logger.exception("Readiness: cache check failed")
+        checks["cache"] = False
+    return all(checks.values()), {"checks": checks, "pid": os.getpid(), "warmup_ms": dict(_state["phases_ms"])}
@@ -0,0 +1,21 @@
+"""
+Gunicorn settings, read from the working directory when gunicorn starts.
+
+With preload_app the application (and core/warmup.py's warm-up) is loaded
+once in the master, then forked: workers start warm, including the ones that
+replace recycled workers. The warm-up closes its connections before the
+fork, and post_worker_init opens each worker's own.
+"""
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "3"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+# Recycle workers now and then (0 = never); cheap with preload_app
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+
+def post_worker_init(worker):
+    from core.warmup import warm_worker
+    warm_worker()
@@ -15,17 +15,23 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "business_logic.apps.BusinessLogicConfig"
 ]
 
 MIDDLEWARE = [
+    "core.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.capture.CaptureMiddleware",
+    "core.admission.AdmissionMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "business_logic.sharding.ShardMiddleware",
+    "core.db_routing.ReplicaPinMiddleware",
 ]
 
 ROOT_URLCONF = "project.urls"
@@ -52,11 +58,138 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "drone_pass"),
         "HOST": os.getenv("POSTGRES_HOST", "localhost"),
         "PORT": int(os.getenv("POSTGRES_PORT", "5432")),
+        # Keep connections between requests; gunicorn workers open them at boot (core/warmup.py)
+        "CONN_MAX_AGE": int(os.getenv("POSTGRES_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+DATABASE_ROUTERS = []
+
+# Optional restaurant shards (see business_logic/sharding.py), e.g.
+# POSTGRES_SHARDS="shard1=db-shard1:5432 shard2=db-shard2:5432"
+DATABASE_SHARDS = []
+for spec in os.getenv("POSTGRES_SHARDS", "").replace(",", " ").split():
+    alias, _, hostport = spec.partition("=")
+    host, _, port = hostport.partition(":")
+    DATABASES[alias] = {**DATABASES["default"], "HOST": host, "PORT": int(port or "5432")}
+    DATABASE_SHARDS.append(alias)
+if DATABASE_SHARDS:
+    DATABASE_ROUTERS.append("business_logic.sharding.ShardRouter")
+
+# Optional read replica for GET endpoints (see core/db_routing.py)
+if os.getenv("POSTGRES_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("POSTGRES_REPLICA_HOST"),
+        "PORT": int(os.getenv("POSTGRES_REPLICA_PORT", "5432")),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS.append("core.db_routing.ReplicaRouter")
+
+# Shared cache (rate limits, live telemetry). Without REDIS_URL each worker process has its own.
+if os.getenv("REDIS_URL"):
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": os.getenv("REDIS_URL")}}
+
+# Prime URL conf, templates and caches when a worker boots (core/warmup.py)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+
+# Per-worker product catalog cache for order ingestion (business_logic/catalog_cache.py).
+# Needs the shared cache for invalidation, so it is off without REDIS_URL.
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "1" if os.getenv("REDIS_URL") else "0") == "1"
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "50000"))
+CATALOG_WARMUP_DAYS = int(os.getenv("CATALOG_WARMUP_DAYS", "7"))  # preload menus of restaurants with orders this recent
+
+# Cached open-order queue per restaurant (business_logic/kitchen.py); rebuilt on every kitchen event.
+# Needs the shared cache for invalidation, so it is off without REDIS_URL.
+KITCHEN_QUEUE_CACHE_ENABLED = os.getenv("KITCHEN_QUEUE_CACHE_ENABLED", "1" if os.getenv("REDIS_URL") else "0") == "1"
+KITCHEN_QUEUE_TTL_SECONDS = int(os.getenv("KITCHEN_QUEUE_TTL_SECONDS", "3600"))
+KITCHEN_CLOCK_SECONDS = int(os.getenv("KITCHEN_CLOCK_SECONDS", "10"))  # resolution of projected times in GET /api/orders/
+
+# Negotiated layouts and compression for dashboard polls (core/payloads.py). Compressed
+# bodies are cached per restaurant with the ETag they belong to.
+PAYLOAD_COMPRESS_MIN_BYTES = int(os.getenv("PAYLOAD_COMPRESS_MIN_BYTES", "1024"))
+PAYLOAD_GZIP_LEVEL = int(os.getenv("PAYLOAD_GZIP_LEVEL", "6"))
+PAYLOAD_BROTLI_QUALITY = int(os.getenv("PAYLOAD_BROTLI_QUALITY", "5"))
+PAYLOAD_CACHE_TTL_SECONDS = int(os.getenv("PAYLOAD_CACHE_TTL_SECONDS", "300"))
+
+# Public order-status documents (business_logic/order_status.py). MAX_AGE is how long
+# nginx/CDNs and browsers may reuse a response; the cached document itself is rebuilt on writes.
+ORDER_STATUS_MAX_AGE = int(os.getenv("ORDER_STATUS_MAX_AGE", "5"))
+# Without REDIS_URL other processes' writes never reach this worker's copy, so it must expire quickly
+ORDER_STATUS_TTL_SECONDS = int(os.getenv("ORDER_STATUS_TTL_SECONDS", "86400" if os.getenv("REDIS_URL") else "5"))
+ORDER_STATUS_MISSING_TTL_SECONDS = int(os.getenv("ORDER_STATUS_MISSING_TTL_SECONDS", "5"))  # remembers unknown orders
+
+# Admission control for /api/ (core/admission.py). Rates are (requests per second, burst) per lane,
+# overridable per lane, e.g. ADMISSION_SESSION_RATES="poll=8/16 kitchen=5/20". A dashboard tab
+# polls two endpoints every second, so the session poll rate leaves room for a few tabs.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_SESSION_RATES = {"poll": (8, 16), "kitchen": (5, 20), "default": (5, 20)}
+ADMISSION_RESTAURANT_RATES = {"poll": (30, 60), "kitchen": (20, 40), "default": (20, 40)}
+for _name, _rates in (("ADMISSION_SESSION_RATES", ADMISSION_SESSION_RATES), ("ADMISSION_RESTAURANT_RATES", ADMISSION_RESTAURANT_RATES)):
+    for spec in os.getenv(_name, "").replace(",", " ").split():
+        lane, _, rate = spec.partition("=")
+        per_second, _, burst = rate.partition("/")
+        _rates[lane] = (float(per_second), int(burst or float(per_second) * 2))
+ADMISSION_POLL_INTERVAL_SECONDS = float(os.getenv("ADMISSION_POLL_INTERVAL_SECONDS", "1"))
+ADMISSION_MAX_BACKOFF = float(os.getenv("ADMISSION_MAX_BACKOFF", "10"))  # max poll interval multiplier
+ADMISSION_DB_LATENCY_MS = float(os.getenv("ADMISSION_DB_LATENCY_MS", "50"))  # avg SQL statement time
+ADMISSION_QUEUE_MS = float(os.getenv("ADMISSION_QUEUE_MS", "250"))  # avg wait in front of gunicorn
+ADMISSION_MAX_QUEUE_SAMPLE_MS = float(os.getenv("ADMISSION_MAX_QUEUE_SAMPLE_MS", "60000"))  # larger X-Request-Start waits are ignored
+ADMISSION_SHED_PRESSURE = float(os.getenv("ADMISSION_SHED_PRESSURE", "3"))
+ADMISSION_WINDOW_SECONDS = float(os.getenv("ADMISSION_WINDOW_SECONDS", "5"))
+
+# Outbox worker (python manage.py outbox_worker)
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "0.5"))
+OUTBOX_RETENTION_HOURS = int(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+
+# Drone telemetry (business_logic/telemetry.py); ingestion is disabled unless a key is set
+TELEMETRY_INGEST_KEY = os.getenv("TELEMETRY_INGEST_KEY", "")
+TELEMETRY_MAX_POINTS = int(os.getenv("TELEMETRY_MAX_POINTS", "20000"))  # per request
+TELEMETRY_LATEST_TTL_SECONDS = int(os.getenv("TELEMETRY_LATEST_TTL_SECONDS", "3600"))
+TELEMETRY_STALE_SECONDS = int(os.getenv("TELEMETRY_STALE_SECONDS", "30"))
+TELEMETRY_MAX_CLOCK_SKEW_SECONDS = int(os.getenv("TELEMETRY_MAX_CLOCK_SKEW_SECONDS", "86400"))  # points further from now are rejected
+
+# Delivery zones and nearest-restaurant lookup (business_logic/geo.py)
+GEO_GRID_CELL_DEGREES = float(os.getenv("GEO_GRID_CELL_DEGREES", "0.05"))
+GEO_INDEX_CHECK_SECONDS = float(os.getenv("GEO_INDEX_CHECK_SECONDS", "1"))  # how often workers look for restaurant changes
+# Without REDIS_URL the version stamp is per process and misses other processes' writes: rebuild this often instead
+GEO_INDEX_MAX_AGE_SECONDS = float(os.getenv("GEO_INDEX_MAX_AGE_SECONDS", "0" if os.getenv("REDIS_URL") else "60"))
+GEO_DRONE_SPEED_MPS = float(os.getenv("GEO_DRONE_SPEED_MPS", "15"))  # cruise speed for delivery estimates
+# Every worker indexes every zone, so one oversized zone would stall them all
+GEO_MAX_RADIUS_M = int(os.getenv("GEO_MAX_RADIUS_M", "50000"))
+GEO_MAX_ZONE_DEGREES = float(os.getenv("GEO_MAX_ZONE_DEGREES", "1"))  # largest lat or lon span of a zone polygon
+GEO_MAX_ZONE_CELLS = int(os.getenv("GEO_MAX_ZONE_CELLS", "10000"))  # grid cells one zone may fill; larger ones are clipped
+
+# On-demand request profiler (core/profiling.py); disabled unless PROFILE_DIR is set
+PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_TOKEN_MAX_AGE = int(os.getenv("PROFILE_TOKEN_MAX_AGE", "3600"))
+
+# Traffic capture for replay_traffic (core/capture.py); disabled unless CAPTURE_DIR is set
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "")
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "1"))  # fraction of clients (users/sessions) captured
+CAPTURE_EXCLUDE = os.getenv("CAPTURE_EXCLUDE", "/api/ping/ /api/ready/ /api/telemetry/").split()
+CAPTURE_MAX_BODY_BYTES = int(os.getenv("CAPTURE_MAX_BODY_BYTES", "65536"))
+CAPTURE_MAX_BYTES = int(os.getenv("CAPTURE_MAX_BYTES", str(64 * 1024 * 1024)))  # per file, then a new file
+CAPTURE_MAX_FILES = int(os.getenv("CAPTURE_MAX_FILES", "50"))
+
+# After a write, that client's reads stay on the primary for this long (read-your-writes)
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
 CSRF_TRUSTED_ORIGINS = os.getenv("DJANGO_CSRF_TRUSTED_ORIGINS", "").split()
 
+# Kitchen actions lock the order row; give up with 409 after waiting this long
+ORDER_LOCK_TIMEOUT_MS = int(os.getenv("ORDER_LOCK_TIMEOUT_MS", "2000"))
+
+# Finished orders (delivered/rejected/cancelled) older than this are moved to ArchivedOrder
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "90"))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv("ORDER_ARCHIVE_BATCH_SIZE", "500"))
+
 LANGUAGE_CODE = "en-us"
 TIME_ZONE = "UTC"
 USE_I18N = True
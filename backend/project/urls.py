@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
-from core.views import ping, signup, me, protected_data, order_created, order_cancelled, preparation_accepted, preparation_rejected, product_create, product_list, restaurant_info, restaurant_update, orders_list, preparation_step_create, notifications_list, notification_mark_read, notifications_mark_all_read
+from core.views import ping, ready, signup, me, protected_data, order_created, order_cancelled, preparation_accepted, preparation_rejected, product_create, product_list, restaurant_info, restaurant_update, restaurants_nearby, orders_list, preparation_step_create, notifications_list, notification_mark_read, notifications_mark_all_read, orders_history, orders_export, product_import, product_search, telemetry_ingest, order_tracking, order_status
 from django.views.generic.base import RedirectView
 
 urlpatterns = [
@@ -10,6 +10,7 @@ urlpatterns = [
 
 
     path("api/ping/", ping),
+    path("api/ready/", ready),
     path("api/me/", me),                                     # example: current user (requires login)
     path("api/protected-data/", protected_data),
 
@@ -19,9 +20,17 @@ urlpatterns = [
     path("api/preparation_rejected/", preparation_rejected),
     path("api/products/", product_list),
     path("api/product_create/", product_create),
+    path("api/products/import/", product_import),
+    path("api/products/search/", product_search),
     path("api/restaurant/", restaurant_info),
     path("api/restaurant/update/", restaurant_update),
+    path("api/restaurants/nearby/", restaurants_nearby),
     path("api/orders/", orders_list),
+    path("api/orders/history/", orders_history),
+    path("api/orders/export/", orders_export),
+    path("api/orders/<int:order_id>/tracking/", order_tracking),
+    path("api/telemetry/", telemetry_ingest),
+    path("api/status/<str:token>/", order_status),           # public, for customers
     path("api/preparation_step/", preparation_step_create),
     path("api/notifications/", notifications_list),
     path("api/notifications/mark-read/<int:notification_id>/", notification_mark_read),
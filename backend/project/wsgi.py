@@ -3,3 +3,7 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
 application = get_wsgi_application()
+
+# URL conf, templates and application caches; safe under gunicorn preload_app (see core/warmup.py)
+from core.warmup import warm_up  # noqa: E402
+warm_up()
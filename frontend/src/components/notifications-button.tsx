@@ -2,6 +2,7 @@ import { Button } from "@/components/ui/button"
 import { DropdownMenu, DropdownMenuContent, DropdownMenuLabel, DropdownMenuSeparator, DropdownMenuTrigger } from "@/components/ui/dropdown-menu"
 import { Bell } from "lucide-react"
 import { useEffect, useState } from "react"
+import { pollInterval } from "@/poll"
 
 type NotificationItem = { id: number; message: string; created_at: string; read: boolean }
 
@@ -12,15 +13,18 @@ export default function NotificationsButton() {
   const [error, setError] = useState<string | null>(null)
   const [hasUnread, setHasUnread] = useState(false)
 
-  async function fetchNotifications() {
+  async function fetchNotifications(): Promise<number> {
     try {
       const r = await fetch("/api/notifications/", { credentials: "include" })
-      if (!r.ok) return
+      if (!r.ok) return pollInterval(r)
       const data = await r.json()
       const list: NotificationItem[] = data.notifications || []
       setItems(list)
       setHasUnread(list.some(n => !n.read))
-    } catch {}
+      return pollInterval(r)
+    } catch {
+      return 1
+    }
   }
 
   useEffect(() => {
@@ -51,8 +55,13 @@ export default function NotificationsButton() {
   }, [open])
 
   useEffect(() => {
-    let timer = setInterval(() => { fetchNotifications() }, 1000)
-    return () => clearInterval(timer)
+    let timer: ReturnType<typeof setTimeout>
+    let stopped = false
+    const schedule = (seconds: number) => {
+      if (!stopped) timer = setTimeout(() => fetchNotifications().then(schedule), seconds * 1000)
+    }
+    schedule(1)
+    return () => { stopped = true; clearTimeout(timer) }
   }, [])
 
   const markOne = async (id: number) => {
@@ -13,6 +13,7 @@ import {
     AlertDialogTitle,
 } from "@/components/ui/alert-dialog";
 import { csrftoken } from "@/csrf";
+import { pollInterval } from "@/poll";
 
 interface ApiOrderItem {
     product_id: number;
@@ -162,10 +163,14 @@ export default function Dashboard() {
     const [delayOrderId, setDelayOrderId] = useState<number | null>(null);
     const [delayMinutes, setDelayMinutes] = useState<string>("5");
 
-    const fetchOrders = (showLoading: boolean = true) => {
+    const fetchOrders = (showLoading: boolean = true): Promise<number> => {
         if (showLoading) setLoading(true);
-        fetch("/api/orders/", { credentials: "include" })
-            .then((r) => (r.ok ? r.json() : Promise.reject(r)))
+        let interval = 1;
+        return fetch("/api/orders/", { credentials: "include" })
+            .then((r) => {
+                interval = pollInterval(r);
+                return r.ok ? r.json() : Promise.reject(r);
+            })
             .then((data) => {
                 setNoRestaurant(false);
                 setNewOrders(data.new_orders || []);
@@ -180,7 +185,8 @@ export default function Dashboard() {
                     console.error("Failed to load orders", e);
                 }
             })
-            .finally(() => { if (showLoading) setLoading(false); });
+            .finally(() => { if (showLoading) setLoading(false); })
+            .then(() => interval);
     };
 
     const openDelayDialog = (orderId: number) => {
@@ -217,9 +223,15 @@ export default function Dashboard() {
     }, []);
 
     // Poll hvert sekund for å holde listene oppdatert uten å vise "Loading"-skjerm
+    // Backend kan be oss polle sjeldnere via X-Poll-Interval når den er under last
     useEffect(() => {
-        const id = setInterval(() => fetchOrders(false), 1000);
-        return () => clearInterval(id);
+        let timer: ReturnType<typeof setTimeout>;
+        let stopped = false;
+        const schedule = (seconds: number) => {
+            if (!stopped) timer = setTimeout(() => fetchOrders(false).then(schedule), seconds * 1000);
+        };
+        schedule(1);
+        return () => { stopped = true; clearTimeout(timer); };
     }, []);
 
     const [acceptDialogOpen, setAcceptDialogOpen] = useState(false);
@@ -249,6 +261,15 @@ export default function Dashboard() {
                 },
                 body: JSON.stringify({ order_id: acceptOrderId, projected_preparation_time_minutes: minutes }),
             });
+            if (res.status === 409) {
+                // Another tablet got there first; show what happened and resync
+                const err = await res.json().catch(() => ({}));
+                alert(err.error || "Order was updated from another device");
+                setAcceptDialogOpen(false);
+                setAcceptOrderId(null);
+                fetchOrders();
+                return;
+            }
             if (!res.ok) {
                 const err = await res.json().catch(() => ({}));
                 throw new Error(err.error || "Failed to accept order");
@@ -273,6 +294,12 @@ export default function Dashboard() {
                 },
                 body: JSON.stringify({ order_id: orderId }),
             });
+            if (res.status === 409) {
+                const err = await res.json().catch(() => ({}));
+                alert(err.error || "Order was updated from another device");
+                fetchOrders();
+                return;
+            }
             if (!res.ok) {
                 const err = await res.json().catch(() => ({}));
                 throw new Error(err.error || "Failed to decline order");
@@ -295,6 +322,12 @@ export default function Dashboard() {
                 },
                 body: JSON.stringify({ order_id: orderId, status, delaytime_minutes }),
             });
+            if (res.status === 409) {
+                const err = await res.json().catch(() => ({}));
+                alert(err.error || "Order was updated from another device");
+                fetchOrders();
+                return;
+            }
             if (!res.ok) {
                 const err = await res.json().catch(() => ({}));
                 throw new Error(err.error || "Failed to create preparation step");
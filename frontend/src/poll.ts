@@ -0,0 +1,5 @@
+// Seconds to wait before the next poll: the backend raises X-Poll-Interval under load (see core/admission.py)
+export function pollInterval(r: Response, fallback = 1): number {
+    const hint = parseFloat(r.headers.get("X-Poll-Interval") || r.headers.get("Retry-After") || "");
+    return Number.isFinite(hint) && hint > 0 ? hint : fallback;
+}